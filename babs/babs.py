@@ -10,6 +10,9 @@ import numpy as np
 import glob
 import shutil
 import tempfile
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import yaml
 from filelock import Timeout, FileLock
 
@@ -29,18 +32,45 @@ from babs.utils import (get_immediate_subdirectories,
                         generate_cmd_datalad_run,
                         generate_cmd_determine_zipfilename,
                         get_list_sub_ses,
-                        submit_one_job,
+                        submit_array_jobs,
+                        get_job_id_str,
+                        kill_jobs,
                         create_job_status_csv,
-                        read_job_status_csv,
+                        add_missing_job_status_columns,
                         report_job_status,
                         request_job_status,
                         request_all_job_status,
-                        calcu_runtime,
-                        get_last_line,
+                        install_output_ria_push_journal,
+                        get_output_ria_job_branches,
+                        get_if_job_requested,
+                        plan_job_status_actions,
+                        apply_job_status_plan,
+                        read_log_files_cache,
+                        write_log_files_cache,
                         get_config_keywords_alert,
-                        get_alert_message_in_log_files,
+                        inspect_job_log_files,
                         get_username,
-                        check_job_account)
+                        check_job_account_bulk,
+                        resolve_job_status_conflicts)
+from babs.job_status_store import get_job_status_store
+from babs.job_status_table import (JobStatusTable,
+                                   build_job_key_index,
+                                   find_job_keys)
+from babs.job_status_snapshot import JobStatusSnapshot
+from babs.job_status_summary import write_job_status_summary
+from babs.job_submission import submit_jobs
+from babs.submit_job_template import quote_arg
+from babs.job_stats import (get_job_attempts,
+                            summarize_job_attempts,
+                            report_job_stats)
+from babs.job_order import add_input_sizes_to_sub_list, order_jobs
+from babs.constants import (ACTION_MARK_FAILED,
+                            ACTION_RESUBMIT,
+                            ACTION_KILL_RESUBMIT,
+                            JOB_STATUS_SUMMARY_PATH_REL,
+                            JOB_STATUS_LOCK_TIMEOUT_FINAL,
+                            JOB_SUBMIT_SAVE_INTERVAL,
+                            ROLLING_SUBMIT_MAX_FAILED_CYCLES)
 
 # import pandas as pd
 
@@ -48,7 +78,7 @@ from babs.utils import (get_immediate_subdirectories,
 class BABS():
     """The BABS class is for babs projects of BIDS Apps"""
 
-    def __init__(self, project_root, type_session, type_system):
+    def __init__(self, project_root, type_session, type_system, job_status_backend="csv"):
         '''
         Parameters:
         ------------
@@ -58,6 +88,9 @@ class BABS():
             whether the input dataset is "multi-ses" or "single-ses"
         type_system: str
             the type of job scheduling system, "sge" or "slurm"
+        job_status_backend: str
+            where to save the job status table, "csv", "sqlite" or "events".
+            See `job_status_store.py`.
 
         Attributes:
         ---------------
@@ -103,6 +136,35 @@ class BABS():
         job_status_path_abs: str
             Absolute path of `job_status_path_abs`.
             Example: '/path/to/analysis/code/job_status.csv'
+        log_cache_path_rel: str
+            Path to the cache of jobs' log files used by `babs-status`,
+            i.e., `job_status_log_cache.json`.
+            This is relative to `analysis` folder.
+        log_cache_path_abs: str
+            Absolute path of `log_cache_path_rel`.
+            Example: '/path/to/analysis/code/job_status_log_cache.json'
+        job_account_cache_path_rel: str
+            Path to the cache of job account used by `babs-status --job-account`,
+            i.e., `job_account_cache.json`.
+            This is relative to `analysis` folder.
+        job_account_cache_path_abs: str
+            Absolute path of `job_account_cache_path_rel`.
+            Example: '/path/to/analysis/code/job_account_cache.json'
+        journal_cache_path_rel: str
+            Path to the cache of reading the journal of pushes in output RIA,
+            i.e., `output_ria_journal_cache.json`.
+            This is relative to `analysis` folder.
+        journal_cache_path_abs: str
+            Absolute path of `journal_cache_path_rel`.
+            Example: '/path/to/analysis/code/output_ria_journal_cache.json'
+        job_status_backend: str
+            where to save the job status table, "csv", "sqlite" or "events".
+        job_status_store: class `JobStatusStoreCsv`, `JobStatusStoreSqlite`
+            or `JobStatusStoreEvents`
+            to load and save the job status table.
+        job_key_index: dict or None
+            hash index of the job status table, see `get_job_key_index()`.
+            None until it's needed.
         '''
 
         # validation:
@@ -141,6 +203,90 @@ class BABS():
         self.job_status_path_abs = op.join(self.analysis_path,
                                            self.job_status_path_rel)
 
+        self.log_cache_path_rel = 'code/job_status_log_cache.json'
+        self.log_cache_path_abs = op.join(self.analysis_path,
+                                          self.log_cache_path_rel)
+
+        self.job_account_cache_path_rel = 'code/job_account_cache.json'
+        self.job_account_cache_path_abs = op.join(self.analysis_path,
+                                                  self.job_account_cache_path_rel)
+
+        self.journal_cache_path_rel = 'code/output_ria_journal_cache.json'
+        self.journal_cache_path_abs = op.join(self.analysis_path,
+                                              self.journal_cache_path_rel)
+
+        self.job_status_summary_path_rel = JOB_STATUS_SUMMARY_PATH_REL
+        self.job_status_summary_path_abs = op.join(self.analysis_path,
+                                                   self.job_status_summary_path_rel)
+
+        # only one `babs-submit --max-in-flight` at a time:
+        self.rolling_submit_lock_path_rel = 'code/babs_submit_rolling.lock'
+        self.rolling_submit_lock_path_abs = op.join(self.analysis_path,
+                                                    self.rolling_submit_lock_path_rel)
+
+        self.job_status_backend = job_status_backend
+        self.job_status_store = get_job_status_store(job_status_backend, self.analysis_path)
+        self.job_key_index = None
+
+    def get_job_key_index(self):
+        """
+        This is to get the hash index of the job status table on (sub_id, ses_id),
+        see `build_job_key_index()`. It's built at the first call and kept,
+        as the rows of the table don't change once the table is created
+        (only their values do).
+
+        Returns:
+        -----------
+        job_key_index: dict
+            key: (sub_id, ses_id), where ses_id is None for single-ses;
+            value: index of the row in the job status table
+        """
+        if self.job_key_index is None:
+            if self.type_session == "single-ses":
+                columns = ["sub_id"]
+            elif self.type_session == "multi-ses":
+                columns = ["sub_id", "ses_id"]
+            self.job_key_index = build_job_key_index(
+                self.job_status_store.read_columns(columns), self.type_session)
+        return self.job_key_index
+
+    def find_jobs(self, df_job_specific):
+        """
+        This is to find the rows of requested jobs in the job status table,
+        e.g., for `babs-submit --job` and `babs-status --resubmit-job`,
+        with one hash lookup per job.
+
+        Parameters:
+        -----------
+        df_job_specific: pd.DataFrame
+            list of requested jobs; columns: 'sub_id' (and 'ses_id', if multi-ses)
+
+        Returns:
+        -----------
+        list_index: list
+            for each requested job (in the same order),
+            the index of its row in the job status table; None if it's not in the table
+        """
+        return find_job_keys(self.get_job_key_index(), df_job_specific, self.type_session)
+
+    def snapshot(self):
+        """
+        This is to get a read-only view of the job status table, without the lock,
+        e.g., for dashboards and downstream pipelines. It's consistent (one version of
+        the table) and immutable, see `job_status_snapshot.py`. The job queue, output RIA
+        and log files are not checked, i.e., it's the job status as of the last
+        `babs-submit` or `babs-status`.
+
+        Returns:
+        -----------
+        snapshot: class `JobStatusSnapshot`
+        """
+        if not self.job_status_store.exists():
+            raise Exception("The job status table has not been created yet."
+                            + " Please run `babs-submit` or `babs-status` first.")
+        df_job, version = self.job_status_store.read_consistent()
+        return JobStatusSnapshot(df_job, version, self.type_session)
+
     def datalad_save(self, path, message=None):
         """
         Save the current status of datalad dataset `analysis`
@@ -292,6 +438,8 @@ class BABS():
                                     + self.type_session + "'\n")
         babs_proj_config_file.write("type_system: '"
                                     + self.type_system + "'\n")
+        babs_proj_config_file.write("job_status_backend: '"
+                                    + self.job_status_backend + "'\n")
         babs_proj_config_file.write("input_ds:\n")   # input dataset's name(s)
         for i_ds in range(0, input_ds.num_ds):
             babs_proj_config_file.write("  - " + input_ds.df["name"][i_ds] + "\n")
@@ -451,6 +599,8 @@ class BABS():
         # Determine the list of subjects to analyze: -----------------------------
         print("\nDetermining the list of subjects (and sessions) to analyze...")
         _ = get_list_sub_ses(input_ds, container.config, self)
+        # estimate the size of input data of each job, for `babs-submit --order`:
+        add_input_sizes_to_sub_list(input_ds, self)
         self.datalad_save(path="code/*.csv",
                           message="Record of inclusion/exclusion of participants")
 
@@ -543,10 +693,16 @@ class BABS():
         # to check this symbolic link, just: $ ls -l <output_ria/alias/data>
         #   it should point to /full/path/output_ria/xxx/xxx-xxx-xxx-xxx
 
+        # Record pushes of jobs' branches into a journal in output RIA,
+        #   so that `babs-status` does not need to list all branches:
+        print("Installing a hook in output RIA to record pushes of jobs' results...")
+        install_output_ria_push_journal(self.output_ria_data_dir)
+
         # SUCCESS!
         print("\n`babs-init` was successful!")
 
-    def babs_submit(self, count=1, df_job_specified=None):
+    def babs_submit(self, count=1, df_job_specified=None, array=False, array_chunk_size=None,
+                    jobs=1, rate=None, order="row"):
         """
         This function submits jobs and prints out job status.
 
@@ -560,6 +716,18 @@ class BABS():
             list of specified job(s) to submit.
             columns: 'sub_id' (and 'ses_id', if multi-ses)
             If `--job` was not specified in `babs-submit`, it will be None.
+        array: bool
+            whether to submit the jobs as tasks of array job(s), see `submit_array_jobs()`
+        array_chunk_size: int or None
+            max number of tasks in one array job; None for no limit
+        jobs: int
+            max number of jobs to submit in parallel, see `submit_jobs()` in `job_submission.py`
+        rate: float or None
+            max number of job submissions started per second; None for no limit
+        order: str
+            order of submitting jobs, e.g., 'largest' for the largest input size first.
+            See `SUBMIT_ORDERS` in `job_order.py`.
+            If `count` is given, the first `count` jobs in this order are submitted.
         """
 
         count_report_progress = 10
@@ -572,146 +740,319 @@ class BABS():
         # `create_job_status_csv(self)` has been called in `babs_status()`
         #   in `core_functions.py`
 
-        # Load the csv file
-        lock_path = self.job_status_path_abs + ".lock"
-        lock = FileLock(lock_path)
+        # Load the job status table, without the lock:
+        #   the changes will be saved with `commit()`, which merges them
+        #   if the table is saved by another process (e.g., `babs-status`) in the meantime.
+        #   The table is kept in the compact form, and updated in place:
+        df_job, job_status_version = self.job_status_store.read_with_version()
+        add_missing_job_status_columns(df_job)   # if the table was created by an older BABS
+        job_table = JobStatusTable(df_job)
+        df_job = job_table.df   # for reading only
+
+        if array and (self.type_system != "sge"):
+            raise Exception("Submitting array jobs is only supported on SGE clusters for now.")
+
+        # See if user has specified list of jobs to submit:
+        if df_job_specified is not None:
+            print("Will only submit specified jobs...")
+            # find the indices in the full `df_job`, with the hash index:
+            #   all of them are in `df_job`, as checked by `check_df_job_specific()`
+            list_index_specified = self.find_jobs(df_job_specified)
+            list_index_to_submit = []
+            for j_job in range(0, df_job_specified.shape[0]):
+                i_job = list_index_specified[j_job]
+
+                # check if the job has already been submitted:
+                if not df_job["has_submitted"][i_job]:  # to run
+                    list_index_to_submit.append(i_job)
+                else:
+                    to_print = "The job for " + df_job_specified.at[j_job, 'sub_id']
+                    if self.type_session == "multi-ses":
+                        to_print += ", " + df_job_specified.at[j_job, 'ses_id']
+                    to_print += " has already been submitted," \
+                        + " so it won't be submitted again." \
+                        + " If you want to resubmit it," \
+                        + " please use `babs-status --resubmit`"
+                    print(to_print)
+            list_index_to_submit = order_jobs(df_job, list_index_to_submit, order,
+                                              self.job_status_store)
+
+        else:    # did not specify jobs to submit,
+            #   so submit by order in full list `df_job`, max = `count`:
+            # babs-submit is only responsible for submitting jobs that haven't run yet
+            list_index_to_submit = \
+                df_job.index[~df_job["has_submitted"].to_numpy(dtype=bool)].tolist()
+            list_index_to_submit = order_jobs(df_job, list_index_to_submit, order,
+                                              self.job_status_store)
+            if count >= 0:
+                list_index_to_submit = list_index_to_submit[:count]
+            # Check if there is still jobs to submit:
+            if len(list_index_to_submit) == 0:   # all submitted
+                print("All jobs have already been submitted. "
+                      + "Use `babs-status` to check job status.")
+
+        list_sub = df_job.loc[list_index_to_submit, "sub_id"].tolist()
+        if self.type_session == "multi-ses":
+            list_ses = df_job.loc[list_index_to_submit, "ses_id"].tolist()
+        else:
+            list_ses = [None] * len(list_index_to_submit)
+        list_sub_ses_to_submit = list(zip(list_sub, list_ses))
+
+        # Submit all of them, and record them in `job_table`:
+        state = {"job_table": job_table, "job_status_version": job_status_version,
+                 "time_saved": time.monotonic()}
+        # each job is kept once it's submitted, and the table is saved from time to time,
+        #   so that job IDs of submitted jobs are not lost if this is interrupted,
+        #   or if a later submission failed:
+        list_submitted = []   # (index, job_id, task_id, log_filename, time submitted),
+        # ^^ not in `job_table` yet
+        num_submitted = [0]
+
+        def record_pending():
+            self.record_submitted_jobs(state["job_table"],
+                                       [x[0] for x in list_submitted],
+                                       [x[1] for x in list_submitted],
+                                       [x[2] for x in list_submitted],
+                                       [x[3] for x in list_submitted],
+                                       [x[4] for x in list_submitted])
+            list_submitted.clear()
+
+        def on_submitted(i, result):
+            # `result`: (job_id, task_id, log_filename) of a task of an array job,
+            #   or (job_id, job_id_str, log_filename) of a job:
+            task_id = result[1] if array else -1   # -1: not a task of an array job
+            list_submitted.append((list_index_to_submit[i], result[0], task_id, result[2],
+                                   round(time.time(), 3)))
+            num_submitted[0] += 1
+            # if it's several times of `count_report_progress`:
+            if (not array) and (num_submitted[0] % count_report_progress == 0):
+                print('So far ' + str(num_submitted[0]) + ' jobs have been submitted.')
+            if time.monotonic() - state["time_saved"] > JOB_SUBMIT_SAVE_INTERVAL:
+                record_pending()
+                self.save_job_table(state, if_final=False)
+
+        try:
+            if array:
+                _, list_errors = submit_array_jobs(self.analysis_path, self.type_session,
+                                                   list_sub_ses_to_submit, array_chunk_size,
+                                                   on_submitted=on_submitted)
+            else:
+                # in parallel, with rate limit (see `job_submission.py`):
+                _, list_errors = submit_jobs(self.analysis_path, self.type_session,
+                                             list_sub_ses_to_submit, jobs, rate,
+                                             on_submitted=on_submitted)
+        except BaseException:
+            # e.g., interrupted (Ctrl+C): still save the jobs that have been submitted
+            record_pending()
+            self.save_job_table(state, if_final=True)
+            raise
+        record_pending()
+
+        job_table = state["job_table"]
+        with pd.option_context('display.max_rows', None,
+                               'display.max_columns', None,
+                               'display.width', 120):   # default is 80 characters...
+            # ^^ print all the columns and rows (with returns)
+            print(job_table.to_frame(job_table.df.index[:6]))   # only first several rows
+
+        # save updated df: only the rows of submitted jobs are changed
+        if not self.save_job_table(state, if_final=True):
+            print("Another instance of this application currently holds the lock"
+                  + " of the job status table; changes in this run are not saved.")
+            return
+
+        if len(list_errors) > 0:
+            raise Exception(str(len(list_errors))
+                            + (" array job(s)" if array else " job(s)")
+                            + " failed to be submitted,"
+                            + " so the remaining jobs were not submitted."
+                            + " Jobs that have been submitted are saved in the job status table."
+                            + " Error(s): " + "; ".join(list_errors))
+
+        # here, the job status was not checked, so message from `report_job_status()`
+        #   based on current df is not trustable:
+        # # Report the job status:
+        # report_job_status(df_job_updated)
+
+    def babs_submit_rolling(self, max_in_flight, interval, jobs=1, rate=None,
+                            order="row", max_cycles=None):
+        """
+        This function keeps submitting jobs that haven't been submitted,
+        with at most `max_in_flight` jobs of this BABS project in the queue at a time,
+        i.e., `babs-submit --max-in-flight`, e.g., if the cluster limits
+        the number of queued jobs per user.
+        Every `interval` seconds, the queue is checked (e.g., with `qstat`),
+        and it's topped up with `babs_submit()`, until all jobs have been submitted.
+
+        There is no state other than the job status table:
+        jobs are saved in the table as they're submitted (see `babs_submit()`),
+        so if this is stopped, running it again continues from there.
+        It doesn't change the status of submitted jobs, so `babs-status`
+        (including `--watch` and `--resubmit`) can be run at the same time;
+        jobs resubmitted by `babs-status` are also counted as in the queue.
+
+        Parameters:
+        -------------
+        max_in_flight: int
+            max number of jobs of this BABS project in the queue (pending or running)
+        interval: float
+            number of seconds between two checks of the queue
+        jobs: int
+            See `babs_submit()`.
+        rate: float or None
+            See `babs_submit()`.
+        order: str
+            See `babs_submit()`.
+        max_cycles: int or None
+            Stop after this number of cycles. If None, keep submitting until all jobs
+            have been submitted, or until interrupted (e.g., Ctrl+C).
+        """
+        # only one at a time, otherwise they'd both top up the queue:
+        lock = FileLock(self.rolling_submit_lock_path_abs)
+        try:
+            lock.acquire(timeout=0)
+        except Timeout:
+            raise Exception("Another `babs-submit --max-in-flight` is running"
+                            + " for this BABS project. Please wait until it's done,"
+                            + " or stop it first.")
 
-        j_count = 0
+        try:
+            i_cycle = 0
+            num_failed_cycles = 0   # in a row
+            while True:
+                i_cycle += 1
+                # Jobs of this project in the queue, and jobs not submitted yet:
+                #   the table is loaded without the lock, so it doesn't block `babs-status`
+                df_job = self.job_status_store.read_columns(["has_submitted",
+                                                             "job_id", "task_id"])
+                is_submitted = df_job["has_submitted"].to_numpy(dtype=bool)
+                num_not_submitted = int((~is_submitted).sum())
+                df_all_job_status = request_all_job_status()
+                num_in_flight = int(get_job_id_str(df_job[is_submitted])
+                                    .isin(df_all_job_status.index).sum())
+
+                print("\n" + datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                      + " babs-submit --max-in-flight: cycle #" + str(i_cycle) + ": "
+                      + str(num_in_flight) + " job(s) in the queue; "
+                      + str(num_not_submitted) + " job(s) haven't been submitted.")
+                if num_not_submitted == 0:
+                    print("All jobs have been submitted. Use `babs-status` to check job status.")
+                    break
+
+                # Top up the queue:
+                num_to_submit = min(max_in_flight - num_in_flight, num_not_submitted)
+                if num_to_submit > 0:
+                    try:
+                        self.babs_submit(num_to_submit, jobs=jobs, rate=rate, order=order)
+                        num_failed_cycles = 0
+                    except Exception as e:
+                        # e.g., the cluster's limit of queued jobs is reached;
+                        #   jobs that have been submitted are saved, see `babs_submit()`
+                        num_failed_cycles += 1
+                        if num_failed_cycles >= ROLLING_SUBMIT_MAX_FAILED_CYCLES:
+                            raise
+                        warnings.warn("Failed to submit jobs in this cycle;"
+                                      + " will try again in next cycle. " + str(e))
+
+                if (max_cycles is not None) and (i_cycle >= max_cycles):
+                    break
+                try:
+                    time.sleep(interval)
+                except KeyboardInterrupt:
+                    print("\nStopped submitting jobs."
+                          + " Run `babs-submit --max-in-flight` again to continue.")
+                    break
+        finally:
+            lock.release()
+
+    def record_submitted_jobs(self, job_table, list_index, list_job_id, list_task_id,
+                              list_log_filename, time_submitted):
+        """
+        This is to record (re)submitted jobs in the job status table, all at once.
 
+        Parameters:
+        -------------
+        job_table: JobStatusTable
+            the compact job status table; it will be updated in place
+        list_index: list
+            indices of the submitted jobs in the table
+        list_job_id: list of int
+            IDs of the submitted jobs
+        list_task_id: list of int, or int
+            task IDs if they're tasks of array job(s); -1 if not
+        list_log_filename: list of str
+            log filenames, see `submit_one_job()`
+        time_submitted: float or list of float
+            unix timestamp(s) when they were submitted
+        """
+        # `job_id` and `task_id` first, as `log_filename` is saved as a pattern of them
+        job_table.set(list_index, "job_id", list_job_id)
+        job_table.set(list_index, "task_id", list_task_id)
+        job_table.set(list_index, "log_filename", list_log_filename)
+
+        # update the status:
+        job_table.set(list_index, "has_submitted", True)
+        # reset fields:
+        job_table.set(list_index, "is_failed", np.nan)
+        # probably not necessary to reset:
+        job_table.set(list_index, "job_state_category", np.nan)
+        job_table.set(list_index, "job_state_code", np.nan)
+        job_table.set(list_index, "duration", np.nan)
+        # timestamps of this attempt:
+        job_table.set(list_index, "time_submitted", time_submitted)
+        for col in ["time_started", "time_finished", "time_failed"]:
+            job_table.set(list_index, col, np.nan)
+
+    def save_job_table(self, state, if_final=True):
+        """
+        This is to save the changes of the job status table made by `babs-submit`,
+        which are merged if the table was saved by another process in the meantime.
+        It can be called many times, e.g., while jobs are still being submitted.
+
+        Parameters:
+        -------------
+        state: dict
+            - 'job_table': the compact job status table (see `job_status_table.py`);
+                it's replaced if the changes are merged with another process's
+            - 'job_status_version': version of the table when it was loaded or saved
+            - 'time_saved': when the table was saved, from `time.monotonic()`
+            They're updated in place.
+        if_final: bool
+            whether it's the last chance to save these changes.
+            If so, and the table can't be saved as it's locked by another process
+            (even after waiting longer, see `commit_job_changes()`),
+            the jobs submitted in this run are killed, as they would not be tracked.
+            Otherwise, the changes are kept, and will be saved next time.
+
+        Returns:
+        -----------
+        if_saved: bool
+        """
+        job_table = state["job_table"]
+        list_index_changed, df_old_rows = job_table.get_changes()
+        df_job_updated = job_table.to_frame()
         try:
-            with lock.acquire(timeout=5):  # lock the file, i.e., lock job status df
-                df_job = read_job_status_csv(self.job_status_path_abs)
-                df_job_updated = df_job.copy()
-
-                # See if user has specified list of jobs to submit:
-                if df_job_specified is not None:
-                    print("Will only submit specified jobs...")
-                    for j_job in range(0, df_job_specified.shape[0]):
-                        # find the index in the full `df_job`:
-                        if self.type_session == "single-ses":
-                            sub = df_job_specified.at[j_job, 'sub_id']
-                            ses = None
-                            temp = df_job['sub_id'] == sub
-                        elif self.type_session == "multi-ses":
-                            sub = df_job_specified.at[j_job, 'sub_id']
-                            ses = df_job_specified.at[j_job, 'ses_id']
-                            temp = (df_job['sub_id'] == sub) & \
-                                (df_job['ses_id'] == ses)
-
-                        i_job = df_job.index[temp].to_list()
-                        # # sanity check: there should only be one `i_job`:
-                        # #   ^^ can be removed as done in `core_functions.py`
-                        # assert_msg = "There are duplications in `job_status.csv`" \
-                        #     + " for " + sub
-                        # if self.type_session == "multi-ses":
-                        #     assert_msg += ", " + ses
-                        # assert len(i_job) == 1, assert_msg + "!"
-                        i_job = i_job[0]   # take the element out of the list
-
-                        # check if the job has already been submitted:
-                        if not df_job["has_submitted"][i_job]:  # to run
-                            job_id, _, log_filename = \
-                                submit_one_job(self.analysis_path,
-                                               self.type_session,
-                                               sub, ses)
-
-                            # assign into `df_job_updated`:
-                            df_job_updated.at[i_job, "job_id"] = job_id
-                            df_job_updated.at[i_job, "log_filename"] = log_filename
-
-                            # update the status:
-                            df_job_updated.at[i_job, "has_submitted"] = True
-                            # reset fields:
-                            df_job_updated.at[i_job, "is_failed"] = np.nan
-                            # probably not necessary to reset:
-                            df_job_updated.at[i_job, "job_state_category"] = np.nan
-                            df_job_updated.at[i_job, "job_state_code"] = np.nan
-                            df_job_updated.at[i_job, "duration"] = np.nan
-                        else:
-                            to_print = "The job for " + sub
-                            if self.type_session == "multi-ses":
-                                to_print += ", " + ses
-                            to_print += " has already been submitted," \
-                                + " so it won't be submitted again." \
-                                + " If you want to resubmit it," \
-                                + " please use `babs-status --resubmit`"
-                            print(to_print)
-
-                else:    # did not specify jobs to submit,
-                    #   so submit by order in full list `df_job`, max = `count`:
-                    # Check if there is still jobs to submit:
-                    total_has_submitted = int(df_job["has_submitted"].sum())
-                    if total_has_submitted == df_job.shape[0]:   # all submitted
-                        print("All jobs have already been submitted. "
-                              + "Use `babs-status` to check job status.")
-                    else:
-                        # Check which row has not been submitted:
-                        for i_job in range(0, df_job.shape[0]):
-                            if not df_job["has_submitted"][i_job]:  # to run
-                                # ^^ type is bool (`numpy.bool_`), so use `if a:` or `if not a:`
-                                # print(df_job["sub_id"][i_job] + "_" + df_job["ses_id"][i_job])
-
-                                # Submit a job:
-                                if self.type_session == "single-ses":
-                                    sub = df_job.at[i_job, "sub_id"]
-                                    ses = None
-                                else:   # multi-ses
-                                    sub = df_job.at[i_job, "sub_id"]
-                                    ses = df_job.at[i_job, "ses_id"]
-
-                                job_id, _, log_filename = \
-                                    submit_one_job(self.analysis_path,
-                                                   self.type_session,
-                                                   sub, ses)
-
-                                # assign into `df_job_updated`:
-                                df_job_updated.at[i_job, "job_id"] = job_id
-                                df_job_updated.at[i_job, "log_filename"] = log_filename
-
-                                # update the status:
-                                df_job_updated.at[i_job, "has_submitted"] = True
-                                # reset fields:
-                                df_job_updated.at[i_job, "is_failed"] = np.nan
-                                # probably not necessary to reset:
-                                df_job_updated.at[i_job, "job_state_category"] = np.nan
-                                df_job_updated.at[i_job, "job_state_code"] = np.nan
-                                df_job_updated.at[i_job, "duration"] = np.nan
-
-                                # print(df_job_updated)
-
-                                j_count += 1
-                                # if it's several times of `count_report_progress`:
-                                if j_count % count_report_progress == 0:
-                                    print('So far ' + str(j_count) + ' jobs have been submitted.')
-
-                                if j_count == count:
-                                    break
-
-                        # babs-submit is only responsible for submitting jobs that haven't run yet
-
-                with pd.option_context('display.max_rows', None,
-                                       'display.max_columns', None,
-                                       'display.width', 120):   # default is 80 characters...
-                    # ^^ print all the columns and rows (with returns)
-                    print(df_job_updated.head(6))   # only first several rows
-
-                # save updated df:
-                df_job_updated.to_csv(self.job_status_path_abs, index=False)
-
-                # here, the job status was not checked, so message from `report_job_status()`
-                #   based on current df is not trustable:
-                # # Report the job status:
-                # report_job_status(df_job_updated)
-
-        except Timeout:   # after waiting for time defined in `timeout`:
-            # if another instance also uses locks, and is currently running,
-            #   there will be a timeout error
-            print("Another instance of this application currently holds the lock.")
+            df_job_saved, job_status_version, list_index_conflict = \
+                self.commit_job_changes(df_job_updated, list_index_changed,
+                                        df_old_rows, state["job_status_version"], if_final)
+        except Timeout:
+            if if_final:
+                resolve_job_status_conflicts(df_job_updated, df_old_rows, None,
+                                             list_index_changed, self.type_session)
+            return False
+        resolve_job_status_conflicts(df_job_updated, df_old_rows, df_job_saved,
+                                     list_index_conflict, self.type_session)
+        job_table.reset_changes()
+        if df_job_saved is not df_job_updated:   # merged with changes of another process:
+            state["job_table"] = JobStatusTable(df_job_saved)
+        state["job_status_version"] = job_status_version
+        state["time_saved"] = time.monotonic()
+        return True
 
     def babs_status(self, flags_resubmit,
                     df_resubmit_job_specific=None, reckless=False,
                     container_config_yaml_file=None,
-                    job_account=False):
+                    job_account=False, jobs=1, rate=None, status_cache=None):
         """
         This function checks job status and resubmit jobs if requested.
 
@@ -737,438 +1078,477 @@ class BABS():
             Whether to account failed jobs (e.g., using `qacct` for SGE),
             which may take some time.
             This step will be skipped if `--resubmit failed` was requested.
+        jobs: int
+            Number of threads to inspect jobs' log files, and to resubmit jobs, in parallel.
+            Increase it if `analysis/logs` is on a network file system,
+            or if many jobs will be resubmitted.
+        rate: float or None
+            Max number of job resubmissions started per second; None for no limit.
+            See `submit_jobs()` in `job_submission.py`.
+        status_cache: dict or None
+            In-memory state kept across calls of this function in `babs-status --watch`,
+            see `babs_status_watch()`. It will be updated in place.
+            If None, everything is loaded from files.
         """
 
         # `create_job_status_csv(self)` has been called in `babs_status()`
         #   in `core_functions.py`
 
-        # Load the csv file
-        lock_path = self.job_status_path_abs + ".lock"
-        lock = FileLock(lock_path)
+        if status_cache is None:
+            status_cache = {}
+
+        if "config_keywords_alert" not in status_cache:
+            # Prepare for checking alert messages in log files:
+            #   get the keywords of alert messages:
+            status_cache["config_keywords_alert"] = \
+                get_config_keywords_alert(container_config_yaml_file)
+            # Get username, if `--job-account` is requested:
+            status_cache["username_lowercase"] = get_username()
+        config_keywords_alert = status_cache["config_keywords_alert"]
+        username_lowercase = status_cache["username_lowercase"]
+
+        # Get the branches of jobs in output RIA:
+        #   read new records in the journal of pushes, if it was installed by `babs-init`;
+        #   otherwise, read from the refs in output RIA directly, instead of `git branch -a`
+        dict_branches = get_output_ria_job_branches(self.output_ria_data_dir,
+                                                    self.journal_cache_path_abs)
+
+        # Load the job status table, without the lock:
+        #   the changes will be saved with `commit()` at the end, which merges them
+        #   if the table is saved by another process (e.g., `babs-submit`) in the meantime.
+        # Only read the job status table if it was changed since previous call;
+        #   otherwise use the one in memory.
+        #   The table is kept in the compact form, and updated in place:
+        job_status_version = self.job_status_store.get_version()
+        if status_cache.pop("job_status_version", None) == job_status_version:
+            # ^^ removed until the table is saved, so that a table changed in memory
+            #   but not saved (e.g., due to an error) won't be used again
+            job_table = status_cache["job_table"]
+        else:
+            df_job, job_status_version = self.job_status_store.read_with_version()
+            add_missing_job_status_columns(df_job)   # if the table was created by an older BABS
+            job_table = JobStatusTable(df_job)
+        df_job = job_table.df   # for reading only
+
+        # Get all jobs' status:
+        df_all_job_status = request_all_job_status()
+
+        # Decide what to do for each submitted job, for all jobs at once:
+        #   jobs requested in `--resubmit-job` are found with the hash index:
+        if df_resubmit_job_specific is not None:
+            list_index_requested = self.find_jobs(df_resubmit_job_specific)
+        else:
+            list_index_requested = None
+        df_plan = plan_job_status_actions(df_job, df_all_job_status, dict_branches,
+                                          self.type_session, flags_resubmit,
+                                          df_resubmit_job_specific, reckless,
+                                          list_index_requested)
+
+        # Warn about jobs requested in `--resubmit-job` but done or running:
+        for i_job in df_plan.index[df_plan["if_warn_reckless"]]:
+            to_print = "Although resubmit for job: " + df_job.at[i_job, "sub_id"]
+            if self.type_session == "multi-ses":
+                to_print += ", " + df_job.at[i_job, "ses_id"]
+            if df_job.at[i_job, "is_done"]:
+                to_print += " was requested, as this job is done,"
+            else:
+                to_print += " was requested, as this job is running,"
+            to_print += " and `--reckless` was not specified, BABS won't" \
+                + " resubmit this job."
+            warnings.warn(to_print)
+
+        # Update jobs that are done, still in the queue, or failed:
+        apply_job_status_plan(job_table, df_plan)
+
+        # Resubmit jobs if requested:
+        #   first, collect all jobs to kill and to resubmit;
+        #   then, kill them with a few `qdel` calls, and submit new ones in parallel.
+        is_resubmit = df_plan["action"].isin([ACTION_RESUBMIT, ACTION_KILL_RESUBMIT])
+        list_index_job_resubmit = df_plan.index[is_resubmit].tolist()
+        list_sub_ses_resubmit = []
+        list_resubmitted = []   # (index, result, time resubmitted), not in `job_table` yet
+
+        def record_pending():
+            self.record_resubmitted_jobs(job_table,
+                                         [x[0] for x in list_resubmitted],
+                                         [x[1][0] for x in list_resubmitted],
+                                         [x[1][2] for x in list_resubmitted],
+                                         [x[2] for x in list_resubmitted])
+            list_resubmitted.clear()
+
+        def on_resubmitted(i, result):
+            list_resubmitted.append((list_index_job_resubmit[i], result, round(time.time(), 3)))
 
-        # Prepare for checking alert messages in log files:
-        #   get the keywords of alert messages:
-        config_keywords_alert = get_config_keywords_alert(container_config_yaml_file)
+        try:
+            # kill original ones, if they're still in the queue:
+            #   no need to kill failed ones, as they're already out of the queue.
+            #   If some of them failed to be killed, others are still resubmitted;
+            #   the ones that may still be in the queue are not resubmitted, so that they won't
+            #   run twice, and they will be checked again in next `babs-status`.
+            # TODO: delete the original branch of a done job?
+            index_kill = df_plan.index[df_plan["action"] == ACTION_KILL_RESUBMIT]
+            list_job_id_str_kill = get_job_id_str(df_job.loc[index_kill]).tolist()
+            set_job_id_str_not_killed = set(kill_jobs(list_job_id_str_kill))
+            set_index_not_killed = set(i_job for i_job, job_id_str
+                                       in zip(index_kill, list_job_id_str_kill)
+                                       if job_id_str in set_job_id_str_not_killed)
+            list_index_job_resubmit = [i_job for i_job in list_index_job_resubmit
+                                       if i_job not in set_index_not_killed]
+
+            for i_job in list_index_job_resubmit:
+                sub = df_job.at[i_job, "sub_id"]
+                if self.type_session == "single-ses":
+                    ses = None
+                elif self.type_session == "multi-ses":
+                    ses = df_job.at[i_job, "ses_id"]
+                list_sub_ses_resubmit.append((sub, ses))
+
+                # print a message:
+                to_print = "Resubmit job for " + sub
+                if self.type_session == "multi-ses":
+                    to_print += ", " + ses
+                to_print += ", " + df_plan.at[i_job, "reason"]
+                print(to_print)
+
+            # submit new ones, in parallel with rate limit (see `job_submission.py`):
+            #   each job is kept once it's resubmitted, so that if this is interrupted
+            #   (e.g., Ctrl+C), the new job IDs are still saved, as the original jobs have been
+            #   killed. If some of them failed to be resubmitted, only the resubmitted ones are
+            #   updated; the others will be checked again in next `babs-status`.
+            _, list_errors_resubmit = submit_jobs(self.analysis_path, self.type_session,
+                                                  list_sub_ses_resubmit, jobs, rate,
+                                                  on_submitted=on_resubmitted)
+        except BaseException:
+            # e.g., interrupted (Ctrl+C): still save the jobs that have been resubmitted,
+            #   together with other changes so far:
+            record_pending()
+            self.commit_job_table(job_table, job_status_version)
+            raise
+        record_pending()
+
+        # Update log-derived fields for other submitted jobs:
+        #   only if the log files have changed since previous `babs-status`,
+        #   e.g., log files of 'is_done' jobs won't change anymore,
+        #   so their `last_line_o_file` and `alert_message` are kept as they are.
+        #   If user changes `keywords_alert` in yaml, all will be updated.
+        #   Log files of different jobs are inspected in parallel (`jobs` threads),
+        #   as it's mostly waiting for file I/O (e.g., on network file system);
+        #   results are collected in the order of jobs, so it's deterministic.
+        if "dict_log_cache" in status_cache:
+            dict_log_cache = status_cache["dict_log_cache"]
+        else:
+            dict_log_cache = read_log_files_cache(self.log_cache_path_abs,
+                                                  config_keywords_alert)
+        dict_log_cache_updated = {}
+        list_index_job_logs = df_plan.index[~is_resubmit].tolist()
+        list_log_filename = job_table.to_frame(list_index_job_logs, ["log_filename"])[
+            "log_filename"].tolist()
+        # ^^ with "*"
+
+        def inspect_one_job(i_job, log_filename):
+            log_fn = op.join(self.analysis_path, "logs", log_filename)  # abs path
+            return inspect_job_log_files(log_fn, config_keywords_alert,
+                                         dict_log_cache.get(log_filename, {}),
+                                         df_job.at[i_job, "last_line_o_file"],
+                                         df_job.at[i_job, "alert_message"])
+
+        with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+            list_results = list(executor.map(inspect_one_job, list_index_job_logs,
+                                             list_log_filename))
+
+        dict_job_account_todo = {}   # key: index of job; value: (job ID, job name)
+        for i_job, log_filename, dict_result in zip(list_index_job_logs,
+                                                    list_log_filename, list_results):
+            dict_log_cache_updated[log_filename] = dict_result["log_cache"]
+            if_no_alert_in_log = dict_result["if_no_alert_in_log"]
+
+            # If `--job-account` is requested:
+            if job_account & if_no_alert_in_log & \
+                    (df_plan.at[i_job, "action"] == ACTION_MARK_FAILED):
+                # if `--job-account` is requested, the job is failed
+                #   and resubmit was not requested, and there is no alert
+                #   message found in log files:
+                job_name = log_filename.split(".*")[0]
+                dict_job_account_todo[i_job] = \
+                    (get_job_id_str(df_job.loc[[i_job]]).iloc[0], job_name)
+
+        # update log-derived fields, all at once:
+        job_table.set(list_index_job_logs, "last_line_o_file",
+                      [x["last_line_o_file"] for x in list_results])
+        job_table.set(list_index_job_logs, "alert_message",
+                      [x["alert_message"] for x in list_results])
+
+        # Job account for all these jobs at once:
+        #   previous results are cached, as finished jobs' account won't change
+        if len(dict_job_account_todo) > 0:
+            dict_job_account = check_job_account_bulk(
+                dict(dict_job_account_todo.values()), username_lowercase,
+                self.job_account_cache_path_abs)
+            job_table.set(list(dict_job_account_todo.keys()), "job_account",
+                          [dict_job_account[job_id_str]
+                           for job_id_str, _ in dict_job_account_todo.values()])
+
+        # For jobs that haven't been submitted yet:
+        #   just to throw out warnings if `--resubmit-job` was requested...
+        if df_resubmit_job_specific is not None:
+            # only keep those not submitted:
+            df_job_not_submitted = df_job[~df_job["has_submitted"]]
+            # check if `--resubmit-job` was requested for any these jobs:
+            if_request_not_submitted = \
+                get_if_job_requested(df_job_not_submitted, df_resubmit_job_specific,
+                                     self.type_session, list_index_requested)
+            if if_request_not_submitted.any():
+                warnings.warn("Jobs for some of the subjects (and sessions) requested in"
+                              + " `--resubmit-job` haven't been submitted yet."
+                              + " Please use `babs-submit` first.")
+        # Done: jobs that haven't submitted yet
+
+        # Finish up `babs-status`:
+        # # print udpated df:
+        # print("")
+        # with pd.option_context('display.max_rows', None,
+        #                        'display.max_columns', None,
+        #                        'display.width', 120):   # default is 80 characters...
+        #     # ^^ print all columns and rows (with returns)
+        #     print(job_table.to_frame().head(6))
+
+        # save updated df: only the changed rows, if supported by the backend
+        df_job_updated, df_job_saved, job_status_version = \
+            self.commit_job_table(job_table, job_status_version)
+        if df_job_saved is None:
+            return
+        # save the cache of log files, after the df is saved:
+        write_log_files_cache(self.log_cache_path_abs, config_keywords_alert,
+                              dict_log_cache_updated)
+
+        # keep in memory for next call:
+        #   if changes were merged with another process's, the table will be loaded again
+        if df_job_saved is df_job_updated:
+            status_cache["job_table"] = job_table
+            status_cache["job_status_version"] = job_status_version
+        status_cache["dict_log_cache"] = dict_log_cache_updated
+
+        # Report the job status:
+        dict_summary = report_job_status(df_job_saved, self.analysis_path,
+                                         config_keywords_alert)
+        # save the summary, for `babs-status --cached`:
+        try:
+            write_job_status_summary(self.job_status_summary_path_abs, dict_summary,
+                                     config_keywords_alert is not None,
+                                     self.job_status_store.events_path)
+        except OSError as e:
+            warnings.warn("Failed to save the cached summary of job status: " + str(e))
+
+        if len(list_errors_resubmit) > 0:
+            warnings.warn(str(len(list_errors_resubmit)) + " job(s) failed to be resubmitted,"
+                          + " so the remaining jobs were not resubmitted."
+                          + " Please run `babs-status` with `--resubmit` again."
+                          + " Error(s): " + "; ".join(list_errors_resubmit))
+
+    def record_resubmitted_jobs(self, job_table, list_index, list_job_id, list_log_filename,
+                                time_resubmitted):
+        """
+        This is to record resubmitted jobs in the job status table, all at once.
+        Timestamps of the previous attempts are kept in the job event log.
 
-        # Get username, if `--job-account` is requested:
-        username_lowercase = get_username()
+        Parameters:
+        -------------
+        job_table: JobStatusTable
+            the compact job status table; it will be updated in place
+        list_index: list
+            indices of the resubmitted jobs in the table
+        list_job_id: list of int
+            new IDs of the resubmitted jobs
+        list_log_filename: list of str
+            log filenames, see `submit_one_job()`
+        time_resubmitted: float or list of float
+            unix timestamp(s) when they were resubmitted
+        """
+        # `job_id` first, as `log_filename` is saved as a pattern of it:
+        job_table.set(list_index, "job_id", list_job_id)
+        job_table.set(list_index, "task_id", -1)
+        # ^^ a task of an array job is resubmitted as a single job
+        job_table.set(list_index, "log_filename", list_log_filename)
+        job_table.set(list_index, "is_done", False)
+        for col in ["job_state_category", "job_state_code", "duration",
+                    "is_failed", "last_line_o_file", "alert_message", "job_account",
+                    "time_started", "time_finished", "time_failed"]:
+            job_table.set(list_index, col, np.nan)
+        job_table.set(list_index, "time_submitted", time_resubmitted)
+
+    def commit_job_changes(self, df_job_updated, list_index_changed, df_old_rows,
+                           job_status_version, if_final=True):
+        """
+        This is to save the changes of the job status table with `JobStatusStore.commit()`.
+        If the lock can't be acquired in `JOB_STATUS_LOCK_TIMEOUT` seconds,
+        and it's the last chance to save jobs (re)submitted in this run,
+        it waits again for up to `JOB_STATUS_LOCK_TIMEOUT_FINAL` seconds,
+        as these jobs would be killed otherwise (see `resolve_job_status_conflicts()`).
 
-        # Get the list of branches in output RIA:
-        proc_git_branch_all = subprocess.run(
-            ["git", "branch", "-a"],
-            cwd=self.output_ria_data_dir,
-            stdout=subprocess.PIPE
-        )
-        proc_git_branch_all.check_returncode()
-        msg = proc_git_branch_all.stdout.decode('utf-8')
-        list_branches = msg.split()
+        Parameters:
+        -------------
+        df_job_updated: pd.DataFrame
+            the job status table with changes made by this process
+        list_index_changed: list
+            indices of changed rows
+        df_old_rows: pd.DataFrame
+            values of these changed rows before the changes
+        job_status_version: int or str
+            version of the table that the changes were made to
+        if_final: bool
+            whether it's the last chance to save these changes
+
+        Returns:
+        -------------
+        see `JobStatusStore.commit()`
 
+        Raises:
+        -------------
+        filelock.Timeout
+            if the lock can't be acquired, even after waiting longer;
+            also if it's interrupted (e.g., Ctrl+C) while waiting longer
+        """
         try:
-            with lock.acquire(timeout=5):  # lock the file, i.e., lock job status df
-                df_job = read_job_status_csv(self.job_status_path_abs)
-                df_job_updated = df_job.copy()
+            return self.job_status_store.commit(df_job_updated, list_index_changed,
+                                                df_old_rows, job_status_version)
+        except Timeout:   # after waiting for time defined in `JOB_STATUS_LOCK_TIMEOUT`:
+            if_new_jobs = (df_job_updated.loc[list_index_changed, "job_id"]
+                           != df_old_rows.loc[list_index_changed, "job_id"]).any()
+            if not (if_final and if_new_jobs):
+                raise
+
+        print("Another instance of this application currently holds the lock"
+              + " of the job status table; waiting for up to "
+              + str(JOB_STATUS_LOCK_TIMEOUT_FINAL) + " seconds to save the jobs"
+              + " (re)submitted in this run, which will be killed if they can't be saved...")
+        try:
+            return self.job_status_store.commit(df_job_updated, list_index_changed,
+                                                df_old_rows, job_status_version,
+                                                timeout=JOB_STATUS_LOCK_TIMEOUT_FINAL)
+        except KeyboardInterrupt:
+            # as if it timed out, so that these jobs are killed, instead of being left
+            #   in the queue without being tracked:
+            raise Timeout(self.job_status_store.lock_path)
+
+    def commit_job_table(self, job_table, job_status_version):
+        """
+        This is to save the changes of the job status table made by `babs-status`,
+        which are merged if the table was saved by another process in the meantime.
+        Jobs resubmitted by this process whose changes could not be saved are killed,
+        see `resolve_job_status_conflicts()`.
 
-                # Get all jobs' status:
-                df_all_job_status = request_all_job_status()
+        Parameters:
+        -------------
+        job_table: JobStatusTable
+            the compact job status table, with changes since it was loaded.
+            If saved, its changes are reset.
+        job_status_version: int or str
+            version of the table when it was loaded, see `JobStatusStore.commit()`
 
-                # For jobs that have been submitted but not successful yet:
-                # Update job status, and resubmit if requested:
-                # get the list of jobs submitted, but `is_done` is not True:
-                temp = (df_job['has_submitted']) & (~df_job['is_done'])
-                list_index_job_tocheck = df_job.index[temp].tolist()
-                for i_job in list_index_job_tocheck:
-                    # Get basic information for this job:
-                    job_id = df_job.at[i_job, "job_id"]
-                    job_id_str = str(job_id)
-                    log_filename = df_job.at[i_job, "log_filename"]  # with "*"
-                    log_fn = op.join(self.analysis_path, "logs", log_filename)  # abs path
-                    o_fn = log_fn.replace(".*", ".o")
-
-                    # did_resubmit = False   # reset: did not resubmit this job
-
-                    if self.type_session == "single-ses":
-                        sub = df_job.at[i_job, "sub_id"]
-                        ses = None
-                        branchname = "job-" + job_id_str + "-" + sub
-                        # e.g., job-00000-sub-01
-                    elif self.type_session == "multi-ses":
-                        sub = df_job.at[i_job, "sub_id"]
-                        ses = df_job.at[i_job, "ses_id"]
-                        branchname = "job-" + job_id_str + "-" + sub + "-" + ses
-                        # e.g., job-00000-sub-01-ses-B
-
-                    # Check if resubmission of this job is requested:
-                    if_request_resubmit_this_job = False
-                    if df_resubmit_job_specific is not None:
-                        if self.type_session == "single-ses":
-                            temp = df_resubmit_job_specific['sub_id'] == sub
-                        elif self.type_session == "multi-ses":
-                            temp = (df_resubmit_job_specific['sub_id'] == sub) & \
-                                (df_resubmit_job_specific['ses_id'] == ses)
-
-                        if any(temp):   # any matched; `temp` is pd.Series of True or False
-                            if_request_resubmit_this_job = True
-                            # print("debugging purpose: request to resubmit job: " + sub + ", " + ses)
-                            # ^^ only for multi-ses!
-
-                    # Update the "last_line_o_file":
-                    df_job_updated.at[i_job, "last_line_o_file"] = \
-                        get_last_line(o_fn)
-
-                    # Check if any alert keywords in log files for this job:
-                    # NOTE: in theory can skip failed jobs in previous round,
-                    #       but making assinging variables hard; so not to skip
-                    #       if df_job.at[i_job, "is_failed"] is not True:    # np.nan or False
-                    alert_message_in_log_files, if_no_alert_in_log = \
-                        get_alert_message_in_log_files(config_keywords_alert, log_fn)
-                    # ^^ the function will handle even if `config_keywords_alert=None`
-                    df_job_updated.at[i_job, "alert_message"] = \
-                        alert_message_in_log_files
-
-                    # Check if there is a branch in output RIA:
-                    #   check if branch name of current job is in the list of all branches:
-                    if branchname in list_branches:
-                        # found the branch:
-                        df_job_updated.at[i_job, "is_done"] = True
-                        # reset/update:
-                        df_job_updated.at[i_job, "job_state_category"] = np.nan
-                        df_job_updated.at[i_job, "job_state_code"] = np.nan
-                        df_job_updated.at[i_job, "duration"] = np.nan
-                        #   ROADMAP: ^^ get duration via `qacct`
-                        #       (though qacct may not be accurate)
-                        df_job_updated.at[i_job, "is_failed"] = False
-
-                        # check if echoed "SUCCESS":
-                        # TODO ^^
-
-                    else:   # did not find the branch
-                        # Check the job status:
-                        if job_id_str in df_all_job_status.index.to_list():
-                            # ^^ if `df` is empty, `.index.to_list()` will return []
-                            state_category = df_all_job_status.at[job_id_str, '@state']
-                            state_code = df_all_job_status.at[job_id_str, 'state']
-                            # ^^ column `@state`: 'running' or 'pending'
-
-                            if state_code == "r":
-                                # Check if resubmit is requested:
-                                if if_request_resubmit_this_job & (not reckless):
-                                    # requested resubmit, but without `reckless`: print msg
-                                    to_print = "Although resubmit for job: " + sub
-                                    if self.type_session == "multi-ses":
-                                        to_print += ", " + ses
-                                    to_print += " was requested, as this job is running," \
-                                        + " and `--reckless` was not specified, BABS won't" \
-                                        + " resubmit this job."
-                                    warnings.warn(to_print)
-
-                                if if_request_resubmit_this_job & reckless:  # force to resubmit:
-                                    # Resubmit:
-                                    # did_resubmit = True
-                                    # print a message:
-                                    to_print = "Resubmit job for " + sub
-                                    if self.type_session == "multi-ses":
-                                        to_print += ", " + ses
-                                    to_print += ", although it was running," \
-                                        + " resubmit for this job was requested" \
-                                        + " and `--reckless` was specified."
-                                    print(to_print)
-
-                                    # kill original one
-                                    proc_kill = subprocess.run(
-                                        ["qdel", job_id_str],
-                                        stdout=subprocess.PIPE
-                                    )
-                                    proc_kill.check_returncode()
-                                    # submit new one:
-                                    job_id_updated, _, log_filename = \
-                                        submit_one_job(self.analysis_path,
-                                                       self.type_session,
-                                                       sub, ses)
-                                    # update fields:
-                                    df_job_updated.at[i_job, "job_id"] = job_id_updated
-                                    df_job_updated.at[i_job, "log_filename"] = log_filename
-                                    df_job_updated.at[i_job, "job_state_category"] = np.nan
-                                    df_job_updated.at[i_job, "job_state_code"] = np.nan
-                                    df_job_updated.at[i_job, "duration"] = np.nan
-                                    df_job_updated.at[i_job, "is_failed"] = np.nan
-                                    df_job_updated.at[i_job, "last_line_o_file"] = np.nan
-                                    df_job_updated.at[i_job, "alert_message"] = np.nan
-                                    df_job_updated.at[i_job, "job_account"] = np.nan
-
-                                else:   # just let it run:
-                                    df_job_updated.at[i_job, "job_state_category"] = state_category
-                                    df_job_updated.at[i_job, "job_state_code"] = state_code
-                                    # get the duration:
-                                    duration = calcu_runtime(
-                                        df_all_job_status.at[job_id_str, "JAT_start_time"])
-                                    df_job_updated.at[i_job, "duration"] = duration
-
-                                    # do nothing else, just wait
-
-                            elif state_code == "qw":
-                                if ('pending' in flags_resubmit) or (if_request_resubmit_this_job):
-                                    # Resubmit:
-                                    # did_resubmit = True
-                                    # print a message:
-                                    to_print = "Resubmit job for " + sub
-                                    if self.type_session == "multi-ses":
-                                        to_print += ", " + ses
-                                    to_print += ", as it was pending and resubmit was requested."
-                                    print(to_print)
-
-                                    # kill original one
-                                    proc_kill = subprocess.run(
-                                        ["qdel", job_id_str],
-                                        stdout=subprocess.PIPE
-                                    )
-                                    proc_kill.check_returncode()
-                                    # submit new one:
-                                    job_id_updated, _, log_filename = \
-                                        submit_one_job(self.analysis_path,
-                                                       self.type_session,
-                                                       sub, ses)
-                                    # update fields:
-                                    df_job_updated.at[i_job, "job_id"] = job_id_updated
-                                    df_job_updated.at[i_job, "log_filename"] = log_filename
-                                    df_job_updated.at[i_job, "job_state_category"] = np.nan
-                                    df_job_updated.at[i_job, "job_state_code"] = np.nan
-                                    df_job_updated.at[i_job, "duration"] = np.nan
-                                    df_job_updated.at[i_job, "is_failed"] = np.nan
-                                    df_job_updated.at[i_job, "last_line_o_file"] = np.nan
-                                    df_job_updated.at[i_job, "alert_message"] = np.nan
-                                    df_job_updated.at[i_job, "job_account"] = np.nan
-
-                                else:   # not to resubmit:
-                                    # update fields:
-                                    df_job_updated.at[i_job, "job_state_category"] = state_category
-                                    df_job_updated.at[i_job, "job_state_code"] = state_code
-
-                            elif state_code == "eqw":
-                                if ('stalled' in flags_resubmit) or (if_request_resubmit_this_job):
-                                    # Resubmit:
-                                    # did_resubmit = True
-                                    # print a message:
-                                    to_print = "Resubmit job for " + sub
-                                    if self.type_session == "multi-ses":
-                                        to_print += ", " + ses
-                                    to_print += ", as it was stalled and resubmit was requested."
-                                    print(to_print)
-
-                                    # kill original one
-                                    proc_kill = subprocess.run(
-                                        ["qdel", job_id_str],
-                                        stdout=subprocess.PIPE
-                                    )
-                                    proc_kill.check_returncode()
-                                    # submit new one:
-                                    job_id_updated, _, log_filename = \
-                                        submit_one_job(self.analysis_path,
-                                                       self.type_session,
-                                                       sub, ses)
-                                    # update fields:
-                                    df_job_updated.at[i_job, "job_id"] = job_id_updated
-                                    df_job_updated.at[i_job, "log_filename"] = log_filename
-                                    df_job_updated.at[i_job, "job_state_category"] = np.nan
-                                    df_job_updated.at[i_job, "job_state_code"] = np.nan
-                                    df_job_updated.at[i_job, "duration"] = np.nan
-                                    df_job_updated.at[i_job, "is_failed"] = np.nan
-                                    df_job_updated.at[i_job, "last_line_o_file"] = np.nan
-                                    df_job_updated.at[i_job, "alert_message"] = np.nan
-                                    df_job_updated.at[i_job, "job_account"] = np.nan
-                                else:   # not to resubmit:
-                                    # update fields:
-                                    df_job_updated.at[i_job, "job_state_category"] = state_category
-                                    df_job_updated.at[i_job, "job_state_code"] = state_code
-
-                        else:   # did not find in `df_all_job_status`, i.e., job queue
-                            # probably error
-                            df_job_updated.at[i_job, "is_failed"] = True
-                            # reset:
-                            df_job_updated.at[i_job, "job_state_category"] = np.nan
-                            df_job_updated.at[i_job, "job_state_code"] = np.nan
-                            df_job_updated.at[i_job, "duration"] = np.nan
-                            # ROADMAP: ^^ get duration via `qacct`
-
-                            # check the log file:
-                            # TODO ^^
-                            # TODO: assign error category in df; also print it out
-
-                            # resubmit if requested:
-                            if ("failed" in flags_resubmit) or (if_request_resubmit_this_job):
-                                # Resubmit:
-                                # did_resubmit = True
-                                # print a message:
-                                to_print = "Resubmit job for " + sub
-                                if self.type_session == "multi-ses":
-                                    to_print += ", " + ses
-                                to_print += ", as it is failed and resubmit was requested."
-                                print(to_print)
-
-                                # no need to kill original one!
-                                #   As it already failed and out of job queue...
-
-                                # submit new one:
-                                job_id_updated, _, log_filename = \
-                                    submit_one_job(self.analysis_path,
-                                                   self.type_session,
-                                                   sub, ses)
-
-                                # update fields:
-                                df_job_updated.at[i_job, "job_id"] = job_id_updated
-                                df_job_updated.at[i_job, "log_filename"] = log_filename
-                                df_job_updated.at[i_job, "is_failed"] = np.nan
-                                df_job_updated.at[i_job, "last_line_o_file"] = np.nan
-                                df_job_updated.at[i_job, "alert_message"] = np.nan
-                                df_job_updated.at[i_job, "job_account"] = np.nan
-                                # reset of `job_state_*` have been done - see above
-
-                            else:  # resubmit 'error' was not requested:
-                                # If `--job-account` is requested:
-                                if job_account & if_no_alert_in_log:
-                                    # if `--job-account` is requested, and there is no alert
-                                    #   message found in log files:
-                                    job_name = log_filename.split(".*")[0]
-                                    msg_job_account = \
-                                        check_job_account(job_id_str, job_name, username_lowercase)
-                                    df_job_updated.at[i_job, "job_account"] = msg_job_account
-                # Done: submitted jobs that not 'is_done'
-
-                # For 'is_done' jobs in previous round:
-                temp = (df_job['has_submitted']) & (df_job['is_done'])
-                list_index_job_is_done = df_job.index[temp].tolist()
-                for i_job in list_index_job_is_done:
-                    # Get basic information for this job:
-                    job_id = df_job.at[i_job, "job_id"]
-                    job_id_str = str(job_id)
-                    log_filename = df_job.at[i_job, "log_filename"]  # with "*"
-                    log_fn = op.join(self.analysis_path, "logs", log_filename)  # abs path
-                    o_fn = log_fn.replace(".*", ".o")
-
-                    if self.type_session == "single-ses":
-                        sub = df_job.at[i_job, "sub_id"]
-                        ses = None
-                        branchname = "job-" + job_id_str + "-" + sub
-                        # e.g., job-00000-sub-01
-                    elif self.type_session == "multi-ses":
-                        sub = df_job.at[i_job, "sub_id"]
-                        ses = df_job.at[i_job, "ses_id"]
-                        branchname = "job-" + job_id_str + "-" + sub + "-" + ses
-                        # e.g., job-00000-sub-01-ses-B
-
-                    # Check if resubmission of this job is requested:
-                    if_request_resubmit_this_job = False
-                    if df_resubmit_job_specific is not None:
-                        if self.type_session == "single-ses":
-                            temp = df_resubmit_job_specific['sub_id'] == sub
-                        elif self.type_session == "multi-ses":
-                            temp = (df_resubmit_job_specific['sub_id'] == sub) & \
-                                (df_resubmit_job_specific['ses_id'] == ses)
-
-                        if any(temp):   # any matched; `temp` is pd.Series of True or False
-                            if_request_resubmit_this_job = True
-                            # print("debugging purpose: request to resubmit job:" + sub + ", " + ses)
-                            # ^^ only for multi-ses
-
-                    # if want to resubmit, but `--reckless` is NOT specified: print msg:
-                    if if_request_resubmit_this_job & (not reckless):
-                        to_print = "Although resubmit for job: " + sub
-                        if self.type_session == "multi-ses":
-                            to_print += ", " + ses
-                        to_print += " was requested, as this job is done," \
-                            + " and `--reckless` was not specified, BABS won't" \
-                            + " resubmit this job."
-                        warnings.warn(to_print)
-
-                    # if resubmit is requested, and `--reckless` is specified:
-                    if if_request_resubmit_this_job & reckless:
-                        # Resubmit:
-                        # did_resubmit = True
-                        # print a message:
-                        to_print = "Resubmit job for " + sub
-                        if self.type_session == "multi-ses":
-                            to_print += ", " + ses
-                        to_print += ", although it is done," \
-                            + " resubmit for this job was requested" \
-                            + " and `--reckless` was specified."
-                        print(to_print)
-
-                        # TODO: delete the original branch?
-
-                        # kill original one
-                        proc_kill = subprocess.run(
-                            ["qdel", job_id_str],
-                            stdout=subprocess.PIPE
-                        )
-                        proc_kill.check_returncode()
-                        # submit new one:
-                        job_id_updated, _, log_filename = \
-                            submit_one_job(self.analysis_path,
-                                           self.type_session,
-                                           sub, ses)
-                        # update fields:
-                        df_job_updated.at[i_job, "job_id"] = job_id_updated
-                        df_job_updated.at[i_job, "log_filename"] = log_filename
-                        df_job_updated.at[i_job, "job_state_category"] = np.nan
-                        df_job_updated.at[i_job, "job_state_code"] = np.nan
-                        df_job_updated.at[i_job, "duration"] = np.nan
-                        df_job_updated.at[i_job, "is_done"] = False
-                        df_job_updated.at[i_job, "is_failed"] = np.nan
-                        df_job_updated.at[i_job, "last_line_o_file"] = np.nan
-                        df_job_updated.at[i_job, "alert_message"] = np.nan
-                        df_job_updated.at[i_job, "job_account"] = np.nan
-
-                    else:    # did not request resubmit, or `--reckless` is None:
-                        # just perform normal stuff for a successful job:
-                        # Update the "last_line_o_file":
-                        df_job_updated.at[i_job, "last_line_o_file"] = \
-                            get_last_line(o_fn)
-                        # Check if any alert keywords in log files for this job:
-                        #   this is to update `alert_message` in case user changes configs in yaml
-                        alert_message_in_log_files, if_no_alert_in_log = \
-                            get_alert_message_in_log_files(config_keywords_alert, log_fn)
-                        # ^^ the function will handle even if `config_keywords_alert=None`
-                        df_job_updated.at[i_job, "alert_message"] = \
-                            alert_message_in_log_files
-                # Done: 'is_done' jobs.
-
-                # For jobs that haven't been submitted yet:
-                #   just to throw out warnings if `--resubmit-job` was requested...
-                if df_resubmit_job_specific is not None:
-                    # only keep those not submitted:
-                    df_job_not_submitted = df_job[~df_job["has_submitted"]]
-                    # only keep columns of `sub_id` and `ses_id`:
-                    if self.type_session == "single-ses":
-                        df_job_not_submitted_slim = df_job_not_submitted[["sub_id"]]
-                    elif self.type_session == "multi-ses":
-                        df_job_not_submitted_slim = df_job_not_submitted[["sub_id", "ses_id"]]
-
-                    # check if `--resubmit-job` was requested for any these jobs:
-                    df_intersection = df_resubmit_job_specific.merge(df_job_not_submitted_slim)
-                    if len(df_intersection) > 0:
-                        warnings.warn("Jobs for some of the subjects (and sessions) requested in"
-                                      + " `--resubmit-job` haven't been submitted yet."
-                                      + " Please use `babs-submit` first.")
-                # Done: jobs that haven't submitted yet
-
-                # Finish up `babs-status`:
-                # # print udpated df:
-                # print("")
-                # with pd.option_context('display.max_rows', None,
-                #                        'display.max_columns', None,
-                #                        'display.width', 120):   # default is 80 characters...
-                #     # ^^ print all columns and rows (with returns)
-                #     print(df_job_updated.head(6))
-
-                # save updated df:
-                df_job_updated.to_csv(self.job_status_path_abs, index=False)
-
-                # Report the job status:
-                report_job_status(df_job_updated, self.analysis_path, config_keywords_alert)
-
-        except Timeout:   # after waiting for time defined in `timeout`:
-            # if another instance also uses locks, and is currently running,
-            #   there will be a timeout error
-            print("Another instance of this application currently holds the lock.")
+        Returns:
+        -------------
+        df_job_updated: pd.DataFrame
+            the job status table with changes made by this process
+        df_job_saved: pd.DataFrame or None
+            the saved job status table; it's `df_job_updated` if no changes were merged.
+            None if nothing was saved, as another process held the lock
+        job_status_version: int or str
+            version of the saved table
+        """
+        list_index_changed, df_old_rows = job_table.get_changes()
+        df_job_updated = job_table.to_frame()
+        try:
+            df_job_saved, job_status_version, list_index_conflict = \
+                self.commit_job_changes(df_job_updated, list_index_changed,
+                                        df_old_rows, job_status_version)
+        except Timeout:
+            resolve_job_status_conflicts(df_job_updated, df_old_rows, None,
+                                         list_index_changed, self.type_session)
+            print("Another instance of this application currently holds the lock"
+                  + " of the job status table; changes in this run are not saved.")
+            return df_job_updated, None, job_status_version
+        resolve_job_status_conflicts(df_job_updated, df_old_rows, df_job_saved,
+                                     list_index_conflict, self.type_session)
+        job_table.reset_changes()
+        return df_job_updated, df_job_saved, job_status_version
+
+    def babs_status_watch(self, interval, flags_resubmit,
+                          df_resubmit_job_specific=None, reckless=False,
+                          container_config_yaml_file=None,
+                          job_account=False, jobs=1, rate=None, max_cycles=None):
+        """
+        This function keeps checking job status (and resubmitting jobs if requested)
+        every `interval` seconds, i.e., `babs-status --watch`.
+        The project is loaded only once; the job status table, the branches in output RIA
+        and the cache of log files are kept in memory between cycles.
+
+        Parameters:
+        -------------
+        interval: float
+            Number of seconds to wait between two cycles.
+        flags_resubmit: list
+            See `babs_status()`. This is applied in every cycle.
+        df_resubmit_job_specific: pd.DataFrame or None
+            See `babs_status()`. This is only applied in the first cycle.
+        reckless: bool
+            See `babs_status()`.
+        container_config_yaml_file: str or None
+            See `babs_status()`.
+        job_account: bool
+            See `babs_status()`.
+        jobs: int
+            See `babs_status()`.
+        rate: float or None
+            See `babs_status()`.
+        max_cycles: int or None
+            Stop after this number of cycles. If None, keep watching until all jobs
+            are done, or until interrupted (e.g., Ctrl+C).
+        """
+        status_cache = {}
+        i_cycle = 0
+        while True:
+            i_cycle += 1
+            print("\n" + datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                  + " babs-status --watch: cycle #" + str(i_cycle))
+            self.babs_status(flags_resubmit, df_resubmit_job_specific, reckless,
+                             container_config_yaml_file, job_account, jobs, rate,
+                             status_cache=status_cache)
+            # `--resubmit-job` is only for the first cycle:
+            df_resubmit_job_specific = None
+
+            if (max_cycles is not None) and (i_cycle >= max_cycles):
+                break
+            if ("job_table" in status_cache) and \
+                    status_cache["job_table"].df["is_done"].all():
+                print("All jobs are done. Stop watching.")
+                break
+
+            try:
+                time.sleep(interval)
+            except KeyboardInterrupt:
+                print("\nStopped watching.")
+                break
+
+    def babs_stats(self, list_percentiles=(50, 90, 99), window=24):
+        """
+        This function reports the queue wait and runtime of all attempts of jobs,
+        and the throughput, based on the timeline of each attempt
+        in the job event log (see `job_stats.py`).
+
+        Parameters:
+        -------------
+        list_percentiles: list of float
+            percentiles of queue wait and runtime to report, between 0 and 100
+        window: float
+            in hours. The throughput is of attempts done in this period before now,
+            and is used to forecast when the remaining jobs will be done.
+        """
+        df_attempts = get_job_attempts(self.job_status_store)
+        df_job = self.job_status_store.read_columns(["is_done"])
+        dict_summary = summarize_job_attempts(df_attempts, df_job.shape[0],
+                                              int(df_job["is_done"].sum()), time.time(),
+                                              list_percentiles, window)
+        report_job_stats(dict_summary, list_percentiles, window)
 
 
 class Input_ds():
@@ -1778,14 +2158,33 @@ class Container():
         bash_file.write("\n")
         bash_file.write('dssource="$1"\t# i.e., `input_ria`\n')
         bash_file.write('pushgitremote="$2"\t# i.e., `output_ria`\n')
-        bash_file.write('subid="$3"\n')
 
+        # a task of an array job (`babs-submit --array`):
+        #   instead of subject (and session) ID, there is the mapping file of task IDs;
+        #   get this task's subject (and session) ID from it.
+        #   For a job that is not an array job, SGE sets `SGE_TASK_ID` as 'undefined'.
+        # TODO: add array jobs for slurm, i.e., `SLURM_ARRAY_TASK_ID`
+        bash_file.write('if [[ "${SGE_TASK_ID:-undefined}" != "undefined" ]]; then\n')
+        bash_file.write('\ttask_mapping="$3"\t# columns: task_id, sub_id (, ses_id)\n')
+        bash_file.write("\tsubid=$(awk -F, -v task_id=\"${SGE_TASK_ID}\""
+                        + " '$1 == task_id {print $2}' \"${task_mapping}\")\n")
+        if type_session == "multi-ses":
+            bash_file.write("\tsesid=$(awk -F, -v task_id=\"${SGE_TASK_ID}\""
+                            + " '$1 == task_id {print $3}' \"${task_mapping}\")\n")
+        bash_file.write('\twhere_to_run="$4"\n')
+        bash_file.write('\tif [[ -z "${subid}" ]]; then\n')
+        bash_file.write('\t\techo "Task ${SGE_TASK_ID} is not found in ${task_mapping}"\n')
+        bash_file.write('\t\texit 1\n')
+        bash_file.write('\tfi\n')
+        bash_file.write('else\n')
+        bash_file.write('\tsubid="$3"\n')
         if type_session == "multi-ses":
             # also have the input of `sesid`:
-            bash_file.write('sesid="$4"\n')
-            bash_file.write('where_to_run="$5"\n')
+            bash_file.write('\tsesid="$4"\n')
+            bash_file.write('\twhere_to_run="$5"\n')
         elif type_session == "single-ses":
-            bash_file.write('where_to_run="$4"\n')
+            bash_file.write('\twhere_to_run="$4"\n')
+        bash_file.write('fi\n')
 
         # TODO: if `where_to_run` is not specified, change to default = ??
 
@@ -1956,7 +2355,8 @@ class Container():
         -------------
         yaml_path: str
             The path to the yaml file to be generated. It should be in the `analysis/code` folder.
-            It has several fields: 1) cmd_template; 2) job_name_template
+            It has several fields: 1) cmd_template; 2) job_name_template;
+            3) array_cmd_template and array_job_name, for array jobs
         input_ds: class `Input_ds`
             input dataset(s) information
         babs: class `BABS`
@@ -1969,9 +2369,10 @@ class Container():
         # Flags when submitting the job:
         if system.type == "sge":
             submit_head = "qsub -cwd"
-            env_flags = "-v DSLOCKFILE=" + babs.analysis_path + "/.SGE_datalad_lock"
-            eo_args = "-e " + babs.analysis_path + "/logs " \
-                + "-o " + babs.analysis_path + "/logs"
+            env_flags = "-v " + quote_arg("DSLOCKFILE=" + babs.analysis_path
+                                          + "/.SGE_datalad_lock")
+            eo_args = "-e " + quote_arg(babs.analysis_path + "/logs") + " " \
+                + "-o " + quote_arg(babs.analysis_path + "/logs")
         else:
             warnings.warn("not supporting systems other than sge...")
 
@@ -1982,12 +2383,19 @@ class Container():
         # Write into the bash file:
         yaml_file = open(yaml_path, "a")   # open in append mode
         yaml_file.write("# '${sub_id}' and '${ses_id}' are placeholders." + "\n")
+        yaml_file.write("# Commands are split into arguments as in a shell,"
+                        + " so an argument with spaces should be quoted." + "\n")
+        yaml_file.write("# For array jobs (`babs-submit --array`),"
+                        + " '${task_range}' (e.g., '1-1000') and '${task_mapping}'"
+                        + " (path to the mapping file of task IDs) are placeholders." + "\n")
 
         # Variables to use:
         # `dssource`: Input RIA:
-        dssource = babs.input_ria_url + "#" + babs.analysis_dataset_id
+        dssource = quote_arg(babs.input_ria_url + "#" + babs.analysis_dataset_id)
         # `pushgitremote`: Output RIA:
-        pushgitremote = babs.output_ria_data_dir
+        pushgitremote = quote_arg(babs.output_ria_data_dir)
+        # `participant_job.sh`:
+        participant_job_path = quote_arg(babs.analysis_path + "/code/participant_job.sh")
 
         # Generate the command:
         #   several rows in the text file; in between, to insert sub and ses id.
@@ -1996,7 +2404,7 @@ class Container():
                 + " -N " + self.container_name[0:3] + "_" + "${sub_id}"
             cmd += " " \
                 + eo_args + " " \
-                + babs.analysis_path + "/code/participant_job.sh" + " " \
+                + participant_job_path + " " \
                 + dssource + " " \
                 + pushgitremote + " " + "${sub_id}"
             cmd += " " \
@@ -2007,13 +2415,14 @@ class Container():
                 + " -N " + self.container_name[0:3] + "_" + "${sub_id}_${ses_id}"
             cmd += " " \
                 + eo_args + " " \
-                + babs.analysis_path + "/code/participant_job.sh" + " " \
+                + participant_job_path + " " \
                 + dssource + " " \
                 + pushgitremote + " " + "${sub_id} ${ses_id}"
             cmd += " " \
                 + "cbica_tmpdir"
 
-        yaml_file.write("cmd_template: '" + cmd + "'" + "\n")
+        yaml_file.write("cmd_template: '" + cmd.replace("'", "''") + "'" + "\n")
+        # ^^ in YAML, a single quote in a single-quoted string is written as two
 
         # TODO: currently only support SGE.
 
@@ -2024,6 +2433,24 @@ class Container():
 
         yaml_file.write("job_name_template: '" + job_name + "'\n")
 
+        # Section 3: Command for submitting array jobs: ---------------------------
+        #   one array job for many jobs; each task gets its subject (and session) ID
+        #   from the mapping file of task IDs, see `generate_bash_participant_job()`
+        array_job_name = self.container_name[0:3] + "_" + "array"
+        cmd = submit_head + " " + env_flags \
+            + " -N " + array_job_name \
+            + " -t ${task_range}"
+        cmd += " " \
+            + eo_args + " " \
+            + participant_job_path + " " \
+            + dssource + " " \
+            + pushgitremote + " " + "${task_mapping}"
+        cmd += " " \
+            + "cbica_tmpdir"
+
+        yaml_file.write("array_cmd_template: '" + cmd.replace("'", "''") + "'" + "\n")
+        yaml_file.write("array_job_name: '" + array_job_name + "'\n")
+
         yaml_file.close()
 
     def generate_bash_submit_jobs(self, bash_path, input_ds, babs, system):
@@ -1,22 +1,18 @@
 """This provides command-line interfaces of babs functions"""
 
 import argparse
+import json
 import os
 import os.path as op
-import datalad.api as dlapi
-import pandas as pd
 import yaml
 import warnings
-from filelock import Timeout, FileLock
 # import sys
 # from datalad.interface.base import build_doc
 
 # from babs.core_functions import babs_init, babs_submit, babs_status
-from babs.utils import (get_datalad_version,
-                        validate_type_session,
-                        read_job_status_csv,
-                        create_job_status_csv)
-from babs.babs import BABS, Input_ds, System
+# Modules that take long to import (e.g., DataLad, pandas, and `babs.babs` that uses them)
+#   are imported in the functions that need them, so that quick commands
+#   (e.g., `babs-status --cached`) are not slowed down by importing them.
 
 # @build_doc
 def babs_init_cli():
@@ -28,6 +24,8 @@ def babs_init_cli():
 
     """
 
+    from babs.job_status_store import JOB_STATUS_BACKENDS
+
     parser = argparse.ArgumentParser(
         description="Initialize a babs project and bootstrap scripts that will be used later",
         formatter_class=argparse.ArgumentDefaultsHelpFormatter)
@@ -90,6 +88,17 @@ def babs_init_cli():
         choices=["sge", "slurm"],
         help="The name of the job scheduling type_system that you will use. Choices are sge and slurm.",
         required=True)
+    parser.add_argument(
+        "--job_status_backend", "--job-status-backend",
+        choices=JOB_STATUS_BACKENDS,
+        default="csv",
+        help="Where to save the job status table that `babs-submit` and `babs-status` update."
+        + " 'csv': `analysis/code/job_status.csv`;"
+        + " 'sqlite': `analysis/code/job_status.sqlite`, where only changed jobs are updated,"
+        + " and which can be queried while BABS is running;"
+        + " 'events': only the append-only event log `analysis/code/job_status_events.jsonl`,"
+        + " from which the table is materialized."
+        + " For all backends, changes of jobs are also appended to this event log.")
 
     return parser
 
@@ -139,8 +148,14 @@ def babs_init_main():
         multi-ses or single-ses
     type_system: str
         sge or slurm
+    job_status_backend: str
+        where to save the job status table, 'csv', 'sqlite' or 'events'
     """
 
+    import datalad.api as dlapi
+    from babs.utils import get_datalad_version, validate_type_session
+    from babs.babs import BABS, Input_ds, System
+
     # Get arguments:
     args = babs_init_cli().parse_args()
 
@@ -153,6 +168,7 @@ def babs_init_main():
     container_config_yaml_file = args.container_config_yaml_file
     type_session = args.type_session
     type_system = args.type_system
+    job_status_backend = args.job_status_backend
 
     # print datalad version:
     # if no datalad is installed, will raise error
@@ -188,7 +204,8 @@ def babs_init_main():
     # Create an instance of babs class:
     babs_proj = BABS(project_root,
                      type_session,
-                     type_system)
+                     type_system,
+                     job_status_backend)
 
     # Validate system's type name `type_system`:
     system = System(type_system)
@@ -221,6 +238,9 @@ def babs_submit_cli():
     # TODO: to add an example command here!
     """
 
+    from babs.job_selection import JOB_STATES
+    from babs.job_order import SUBMIT_ORDERS
+
     parser = argparse.ArgumentParser(
         description="Submit jobs that will be run on cluster compute nodes.")
     parser.add_argument(
@@ -249,6 +269,77 @@ def babs_submit_cli():
         " Can repeat to submit more than one job."
         " Format would be `--job sub-xx` for single-session dataset,"
         " and `--job sub-xx ses-yy` for multiple-session dataset.")
+    group.add_argument(
+        "--job_file", "--job-file",
+        help="Path to a CSV or Parquet file (extension '.parquet') of jobs to submit,"
+        " with column 'sub_id' (and 'ses_id', for multiple-session dataset);"
+        " other columns are ignored. Use this instead of many `--job`.")
+    group.add_argument(
+        "--select",
+        metavar="EXPRESSION",
+        help="Submit jobs selected by an expression over the job status table,"
+        " e.g., 'state == \"not_submitted\" and sub_id >= \"sub-1000\"'."
+        " Fields: `state` (one of " + ", ".join(JOB_STATES) + ")"
+        " or columns of the job status table; operators: ==, !=, <, <=, >, >=, contains;"
+        " values: quoted strings, numbers, true, false, null;"
+        " combined with and, or, not, and parentheses.")
+    group.add_argument(
+        "--max_in_flight", "--max-in-flight",
+        type=int,
+        metavar="N",
+        help="Keep submitting all jobs that haven't been submitted, with at most N jobs"
+        " of this BABS project in the queue (pending or running) at a time:"
+        " the queue is checked every `--poll-interval` seconds, and topped up"
+        " as jobs finish, until all jobs have been submitted."
+        " Submitted jobs are saved in the job status table as they're submitted,"
+        " so if it's stopped (e.g., Ctrl+C), running it again continues from there."
+        " `babs-status` can be run at the same time.")
+    parser.add_argument(
+        "--poll_interval", "--poll-interval",
+        type=float,
+        default=60,
+        metavar="SECONDS",
+        help="With `--max-in-flight`: number of seconds between two checks of the queue.")
+    parser.add_argument(
+        "--array",
+        action='store_true',
+        help="Submit the jobs as tasks of one array job (e.g., `qsub -t 1-1000` for SGE),"
+        " instead of one job submission per job, to reduce the load on the job scheduler."
+        " The mapping of task IDs to jobs is saved in folder `analysis/logs`.")
+    parser.add_argument(
+        "--array_chunk_size", "--array-chunk-size",
+        type=int,
+        metavar="N",
+        help="With `--array`: max number of tasks in one array job;"
+        " more jobs are submitted as several array jobs."
+        " For example, it should not be larger than `max_aj_tasks` of SGE."
+        " By default, all jobs are submitted in one array job.")
+    parser.add_argument(
+        "--jobs", "-j",
+        type=int,
+        default=1,
+        help="Number of jobs to submit in parallel, i.e., number of job submission commands"
+        " (e.g., `qsub`) running at the same time. Jobs that have been submitted are"
+        " saved in the job status table, even if some submissions failed.")
+    parser.add_argument(
+        "--submit_rate", "--submit-rate",
+        type=float,
+        metavar="N",
+        help="Max number of job submissions started per second, e.g., 5,"
+        " so that the job scheduler won't be flooded. Please tune it for your cluster."
+        " By default, there is no limit.")
+    parser.add_argument(
+        "--order",
+        choices=SUBMIT_ORDERS,
+        default="row",
+        help="Order of submitting jobs (with `--count`, the first ones in this order):"
+        " 'row': in the order of rows in the job status table (default);"
+        " 'largest' / 'smallest': the largest / smallest input size first,"
+        " as estimated by `babs-init` from the input datasets;"
+        " 'random': in random order;"
+        " 'history': the longest runtime first, estimated from input sizes"
+        " and the runtime of finished jobs. On a fixed number of job slots,"
+        " 'largest' or 'history' usually finishes all jobs sooner.")
 
     return parser
 
@@ -276,8 +367,30 @@ def babs_submit_main():
         any negative int will be treated as submitting all jobs that haven't been submitted.
     job: nested list or None
         For each sub-list, the length should be 1 (for single-ses) or 2 (for multi-ses)
+    job_file: str or None
+        path to a CSV or Parquet file of jobs to submit, see `read_job_file()`
+    select: str or None
+        selection expression of jobs to submit, see `job_selection.py`
+    array: bool
+        whether to submit the jobs as tasks of array job(s)
+    array_chunk_size: int or None
+        max number of tasks in one array job
+    jobs: int
+        number of jobs to submit in parallel
+    submit_rate: float or None
+        max number of job submissions started per second
+    max_in_flight: int or None
+        if not None, keep submitting jobs, with at most this number of jobs in the queue
+    poll_interval: float
+        number of seconds between two checks of the queue, with `max_in_flight`
+    order: str
+        order of submitting jobs, see `SUBMIT_ORDERS` in `job_order.py`
     """
 
+    import pandas as pd
+    from babs.utils import create_job_status_csv
+    from babs.job_selection import read_job_file, select_jobs
+
     # Get arguments:
     args = babs_submit_cli().parse_args()
 
@@ -285,6 +398,31 @@ def babs_submit_main():
     count = args.count
     all = args.all
     job = args.job
+    job_file = args.job_file
+    select = args.select
+    array = args.array
+    array_chunk_size = args.array_chunk_size
+    if array_chunk_size is not None:
+        if not array:
+            raise Exception("`--array-chunk-size` can only be used with `--array`!")
+        if array_chunk_size < 1:
+            raise Exception("`--array-chunk-size` should be a positive integer!")
+    jobs = args.jobs
+    if jobs < 1:
+        raise Exception("`--jobs` should be a positive integer!")
+    submit_rate = args.submit_rate
+    if (submit_rate is not None) and (submit_rate <= 0):
+        raise Exception("`--submit-rate` should be a positive number!")
+    order = args.order
+    max_in_flight = args.max_in_flight
+    poll_interval = args.poll_interval
+    if max_in_flight is not None:
+        if max_in_flight < 1:
+            raise Exception("`--max-in-flight` should be a positive integer!")
+        if array:
+            raise Exception("`--max-in-flight` can't be used with `--array`!")
+        if poll_interval <= 0:
+            raise Exception("`--poll-interval` should be a positive number of seconds!")
 
     # Get class `BABS` based on saved `analysis/code/babs_proj_config.yaml`:
     babs_proj = get_existing_babs_proj(project_root)
@@ -293,6 +431,12 @@ def babs_submit_main():
     create_job_status_csv(babs_proj)
     # ^^ this is required by the sanity check `check_df_job_specific`
 
+    # Rolling submission, until all jobs have been submitted:
+    if max_in_flight is not None:
+        babs_proj.babs_submit_rolling(max_in_flight, poll_interval, jobs, submit_rate,
+                                      order)
+        return
+
     # Actions on `count`:
     if all:   # if True:
         count = -1  # so that to submit all remaining jobs
@@ -341,13 +485,27 @@ def babs_submit_main():
 
         # sanity check:
         df_job_specified = \
-            check_df_job_specific(df_job_specified, babs_proj.job_status_path_abs,
-                                  babs_proj.type_session, "babs-submit")
+            check_df_job_specific(df_job_specified, babs_proj, "babs-submit")
+    elif (job_file is not None) or (select is not None):
+        count = -1    # just in case; make sure all specified jobs will be submitted
+        if job_file is not None:
+            df_job_specified = read_job_file(job_file, babs_proj.type_session)
+        else:
+            df_job_specified = select_jobs(babs_proj.job_status_store, select,
+                                           babs_proj.type_session)
+            print(str(len(df_job_specified)) + " job(s) are selected by `--select`.")
+        if len(df_job_specified) == 0:
+            print("There is no job to submit.")
+            return
+        # sanity check:
+        df_job_specified = \
+            check_df_job_specific(df_job_specified, babs_proj, "babs-submit")
     else:  # `job` is None:
         df_job_specified = None
 
     # Call method `babs_submit()`:
-    babs_proj.babs_submit(count, df_job_specified)
+    babs_proj.babs_submit(count, df_job_specified, array, array_chunk_size,
+                          jobs, submit_rate, order)
 
 def babs_status_cli():
     """
@@ -386,6 +544,18 @@ def babs_status_cli():
         help="The subject ID (and session ID) whose job to be resubmitted."
         " Can repeat to submit more than one job."
         " Currently, this can only resubmit pending, failed, or stalled jobs.")
+    parser.add_argument(
+        '--resubmit_job_file', '--resubmit-job-file',
+        help="Path to a CSV or Parquet file (extension '.parquet') of jobs to resubmit,"
+        " with column 'sub_id' (and 'ses_id', for multiple-session dataset);"
+        " other columns are ignored. Use this instead of many `--resubmit-job`.")
+    parser.add_argument(
+        '--resubmit_select', '--resubmit-select',
+        metavar="EXPRESSION",
+        help="Resubmit jobs selected by an expression over the job status table,"
+        " e.g., 'state == \"failed\" and alert_message contains \"OOM\"'."
+        " The syntax is the same as `babs-submit --select`."
+        " Selected jobs are handled as if they were listed in `--resubmit-job`.")
     # ^^ NOTE: ROADMAP: improve the strategy to deal with `eqw` (stalled) is not to resubmit,
     #                   but fix the issue - Bergman 12/20/22 email
     parser.add_argument(
@@ -406,6 +576,43 @@ def babs_status_cli():
         help="Whether to account failed jobs, which may take some time."
              " If `--resubmit failed` or `--resubmit-job` for this failed job is also requested,"
              " this `--job-account` will be skipped.")
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        help="Number of threads to inspect jobs' log files, and to resubmit jobs, in parallel."
+             " Increase it (e.g., 8) if `analysis/logs` is on a network file system"
+             " (e.g., Lustre, NFS), where reading each log file is slow,"
+             " or if many jobs will be resubmitted.")
+    parser.add_argument(
+        '--submit_rate', '--submit-rate',
+        type=float,
+        metavar='N',
+        help="Max number of job resubmissions started per second, e.g., 5,"
+             " so that the job scheduler won't be flooded. By default, there is no limit.")
+    parser.add_argument(
+        '--watch',
+        type=float,
+        metavar='SECONDS',
+        help="Keep checking job status (and resubmitting jobs based on `--resubmit`)"
+             " every SECONDS seconds, until all jobs are done or interrupted (Ctrl+C)."
+             " The project is only loaded once, and the job status is kept in memory."
+             " `--resubmit-job` is only applied in the first round.")
+    parser.add_argument(
+        '--json',
+        action='store_true',
+        help="Print the job status as JSON, including the number of jobs in each state,"
+             " histograms of alert messages, and the record of each job."
+             " This only reads the job status table (without the lock), so it's quick;"
+             " it does not check the job queue or output RIA, and does not resubmit jobs,"
+             " i.e., it's the job status as of the last `babs-submit` or `babs-status`.")
+    parser.add_argument(
+        '--cached',
+        action='store_true',
+        help="Instantly print the job status summary saved by the last `babs-status`,"
+             " and when it was checked."
+             " This does not check the job queue, output RIA or log files,"
+             " and does not even load the job status table.")
 
     return parser
 
@@ -433,6 +640,10 @@ def babs_status_main():
         each sub-list: one of 'failed', 'pending', 'stalled'
     resubmit_job: nested list or None
         For each sub-list, the length should be 1 (for single-ses) or 2 (for multi-ses)
+    resubmit_job_file: str or None
+        path to a CSV or Parquet file of jobs to resubmit, see `read_job_file()`
+    resubmit_select: str or None
+        selection expression of jobs to resubmit, see `job_selection.py`
     reckless: bool
         Whether to resubmit jobs listed in `--resubmit-job`, even they're done or running
         This is used when `--resubmit-job`
@@ -444,17 +655,68 @@ def babs_status_main():
     job_account: bool
         Whether to account failed jobs (e.g., using `qacct` for SGE),
         which may take some time.
+    jobs: int
+        Number of threads to inspect jobs' log files, and to resubmit jobs, in parallel.
+    submit_rate: float or None
+        Max number of job resubmissions started per second
+    watch: float or None
+        If not None, keep checking job status every `watch` seconds.
+    json: bool
+        Whether to only print the current job status as JSON, see `BABS.snapshot()`.
+    cached: bool
+        Whether to only print the job status summary saved by the last `babs-status`.
     """
 
     # Get arguments:
     args = babs_status_cli().parse_args()
 
     project_root = args.project_root
+    if args.cached:
+        # before importing anything else (e.g., pandas), to be instant:
+        if (args.resubmit is not None) or (args.resubmit_job is not None) \
+                or (args.resubmit_job_file is not None) or (args.resubmit_select is not None) \
+                or args.job_account or (args.watch is not None) or args.json:
+            raise Exception("`--cached` only prints the saved job status summary;"
+                            + " it can't be used with `--resubmit`, `--resubmit-job`,"
+                            + " `--resubmit-job-file`, `--resubmit-select`,"
+                            + " `--job-account`, `--watch` or `--json`!")
+        if op.exists(project_root) is False:
+            raise Exception("`project_root` does not exist!")
+        from babs.job_status_summary import report_cached_job_status
+        report_cached_job_status(op.join(project_root, "analysis"))
+        return
+
+    import pandas as pd
+    from babs.utils import create_job_status_csv
+    from babs.job_selection import read_job_file, select_jobs
+
     resubmit = args.resubmit
     resubmit_job = args.resubmit_job
+    resubmit_job_file = args.resubmit_job_file
+    resubmit_select = args.resubmit_select
+    if [resubmit_job, resubmit_job_file, resubmit_select].count(None) < 2:
+        raise Exception("Only one of `--resubmit-job`, `--resubmit-job-file`"
+                        + " and `--resubmit-select` can be used!")
     reckless = args.reckless
     container_config_yaml_file = args.container_config_yaml_file
     job_account = args.job_account
+    jobs = args.jobs
+    if jobs < 1:
+        raise Exception("`--jobs` should be a positive integer!")
+    submit_rate = args.submit_rate
+    if (submit_rate is not None) and (submit_rate <= 0):
+        raise Exception("`--submit-rate` should be a positive number!")
+    watch = args.watch
+    if (watch is not None) and (watch <= 0):
+        raise Exception("`--watch` should be a positive number of seconds!")
+
+    if args.json:
+        if (resubmit is not None) or ([resubmit_job, resubmit_job_file, resubmit_select]
+                                      .count(None) < 3) or job_account or (watch is not None):
+            raise Exception("`--json` only prints the current job status;"
+                            + " it can't be used with `--resubmit`, `--resubmit-job`,"
+                            + " `--resubmit-job-file`, `--resubmit-select`,"
+                            + " `--job-account` or `--watch`!")
 
     # Get class `BABS` based on saved `analysis/code/babs_proj_config.yaml`:
     babs_proj = get_existing_babs_proj(project_root)
@@ -463,6 +725,10 @@ def babs_status_main():
     create_job_status_csv(babs_proj)
     # ^^ this is required by the sanity check `check_df_job_specific`
 
+    if args.json:
+        print(json.dumps(babs_proj.snapshot().to_json_dict()))
+        return
+
     # Get the list of resubmit conditions:
     if resubmit is not None:   # user specified --resubmit
         # e.g., [['pending'], ['failed']]
@@ -495,7 +761,8 @@ def babs_status_main():
                 + " it's meaningless to run job account on previous failed jobs,"
                 + " so will skip `--job-account`")
 
-    # If `resubmit-job` is requested:
+    # If `resubmit-job` (or `--resubmit-job-file`, `--resubmit-select`) is requested:
+    df_resubmit_job_specific = None
     if resubmit_job is not None:
         # sanity check:
         if babs_proj.type_session == "single-ses":
@@ -535,9 +802,24 @@ def babs_status_main():
 
         # sanity check:
         df_resubmit_job_specific = \
-            check_df_job_specific(df_resubmit_job_specific, babs_proj.job_status_path_abs,
-                                  babs_proj.type_session, "babs-status")
+            check_df_job_specific(df_resubmit_job_specific, babs_proj, "babs-status")
+
+    elif (resubmit_job_file is not None) or (resubmit_select is not None):
+        if resubmit_job_file is not None:
+            df_resubmit_job_specific = read_job_file(resubmit_job_file, babs_proj.type_session)
+        else:
+            df_resubmit_job_specific = select_jobs(babs_proj.job_status_store,
+                                                   resubmit_select, babs_proj.type_session)
+            print(str(len(df_resubmit_job_specific))
+                  + " job(s) are selected by `--resubmit-select`.")
+        if len(df_resubmit_job_specific) > 0:
+            # sanity check:
+            df_resubmit_job_specific = \
+                check_df_job_specific(df_resubmit_job_specific, babs_proj, "babs-status")
+        else:   # e.g., no failed job now; just check the job status:
+            df_resubmit_job_specific = None
 
+    if df_resubmit_job_specific is not None:
         if len(df_resubmit_job_specific) > 0:
             if reckless:    # if `--reckless`:
                 print("Will resubmit all the job(s) listed in `--resubmit-job`,"
@@ -548,12 +830,79 @@ def babs_status_main():
         else:    # in theory should not happen, but just in case:
             raise Exception("There is no valid job in --resubmit-job!")
 
-    else:   # `--resubmit-job` is None:
-        df_resubmit_job_specific = None
-
     # Call method `babs_status()`:
-    babs_proj.babs_status(flags_resubmit, df_resubmit_job_specific, reckless,
-                          container_config_yaml_file, job_account)
+    if watch is None:
+        babs_proj.babs_status(flags_resubmit, df_resubmit_job_specific, reckless,
+                              container_config_yaml_file, job_account, jobs, submit_rate)
+    else:   # `--watch`:
+        babs_proj.babs_status_watch(watch, flags_resubmit, df_resubmit_job_specific,
+                                    reckless, container_config_yaml_file, job_account, jobs,
+                                    submit_rate)
+
+def babs_stats_cli():
+    """
+    Report statistics of jobs, e.g., queue wait and runtime.
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Report queue wait and runtime of jobs in a BABS project,"
+        " based on the job status recorded by `babs-submit` and `babs-status`.")
+    parser.add_argument(
+        "--project_root", "--project-root",
+        help="Absolute path to the root of BABS project."
+        " For example, '/path/to/my_BABS_project/'.",
+        required=True)
+    parser.add_argument(
+        '--percentiles',
+        default="50,90,99",
+        help="Comma-separated percentiles of queue wait and runtime to report,"
+        " e.g., '50,90,99'. The runtime percentiles help to set `cluster_resources`"
+        " (e.g., `hard_runtime_limit`) in the container config YAML file.")
+    parser.add_argument(
+        '--window',
+        type=float,
+        default=24,
+        metavar='HOURS',
+        help="The throughput is the number of job attempts done in the past HOURS hours;"
+        " it's used to forecast when the remaining jobs will be done.")
+
+    return parser
+
+def babs_stats_main():
+    """
+    This is the core function of `babs-stats`.
+
+    Parameters:
+    --------------
+    project_root: str
+        absolute path to the directory of BABS project
+    percentiles: str
+        comma-separated percentiles, between 0 and 100
+    window: float
+        in hours, the period before now to calculate the throughput
+    """
+
+    from babs.utils import create_job_status_csv
+
+    # Get arguments:
+    args = babs_stats_cli().parse_args()
+
+    try:
+        list_percentiles = [float(p) for p in args.percentiles.split(",")]
+    except ValueError:
+        raise Exception("`--percentiles` should be comma-separated numbers, e.g., '50,90,99'!")
+    if not all(0 <= p <= 100 for p in list_percentiles):
+        raise Exception("`--percentiles` should be between 0 and 100!")
+    if args.window <= 0:
+        raise Exception("`--window` should be a positive number of hours!")
+
+    # Get class `BABS` based on saved `analysis/code/babs_proj_config.yaml`:
+    babs_proj = get_existing_babs_proj(args.project_root)
+
+    # Check if this csv file has been created, if not, create it:
+    create_job_status_csv(babs_proj)
+
+    babs_proj.babs_stats(list_percentiles, args.window)
 
 def get_existing_babs_proj(project_root):
     """
@@ -573,6 +922,8 @@ def get_existing_babs_proj(project_root):
         information about a BABS project
     """
 
+    from babs.babs import BABS
+
     # Sanity check: the path `project_root` exists:
     if op.exists(project_root) is False:
         raise Exception("`--project-root` does not exist! Requested `--project-root` was: "
@@ -592,9 +943,11 @@ def get_existing_babs_proj(project_root):
 
     type_session = babs_proj_config["type_session"]
     type_system = babs_proj_config["type_system"]
+    # projects created before `job_status_backend` was introduced use csv:
+    job_status_backend = babs_proj_config.get("job_status_backend", "csv")
 
     # Get the class `BABS`:
-    babs_proj = BABS(project_root, type_session, type_system)
+    babs_proj = BABS(project_root, type_session, type_system, job_status_backend)
 
     # update key informations including `output_ria_data_dir`:
     babs_proj.wtf_key_info(flag_output_ria_only=True)
@@ -602,8 +955,7 @@ def get_existing_babs_proj(project_root):
     return babs_proj
 
 
-def check_df_job_specific(df, job_status_path_abs,
-                          type_session, which_function):
+def check_df_job_specific(df, babs_proj, which_function):
     """
     This is to perform sanity check on the pd.DataFrame `df`
     which is used by `babs-submit --job` and `babs-status --resubmit-job`.
@@ -616,10 +968,9 @@ def check_df_job_specific(df, job_status_path_abs,
     df: pd.DataFrame
         i.e., `df_job_specific`
         list of sub_id (and ses_id, if multi-ses) that the user requests to submit or resubmit
-    job_status_path_abs: str
-        absolute path to the `job_status.csv`
-    type_session: str
-        'single-ses' or 'multi-ses'
+    babs_proj: class `BABS`
+        information about a BABS project;
+        its hash index of the job status table is used, see `BABS.find_jobs()`
     which_function: str
         'babs-status' or 'babs-submit'
         The warning message will be tailored based on this.
@@ -631,7 +982,7 @@ def check_df_job_specific(df, job_status_path_abs,
 
     Notes:
     --------------
-    The `job_status.csv` file must present before running this function!
+    The job status table (e.g., `job_status.csv`) must present before running this function!
     Please use `create_job_status_csv()` from `utils.py` to create
 
     TODO:
@@ -653,37 +1004,22 @@ def check_df_job_specific(df, job_status_path_abs,
         to_print += " . Only the first occuration(s) will be kept..."
         warnings.warn(to_print)
 
-        df = df_unique   # update with the unique one
+        df = df_unique.reset_index(drop=True)   # update with the unique one
 
     # 2. Sanity check: `df` should be a sub-set of all jobs:
-    # read the `job_status.csv`:
-    lock_path = job_status_path_abs + ".lock"
-    lock = FileLock(lock_path)
-    try:
-        with lock.acquire(timeout=5):  # lock the file, i.e., lock job status df
-            df_job = read_job_status_csv(job_status_path_abs)
-
-            # check if `df` is sub-set of `df_job`:
-            df_intersection = df.merge(df_job).drop_duplicates()
-            # `df_job` should not contain duplications, but just in case..
-            # ^^ ref: https://stackoverflow.com/questions/49530918/
-            #           check-if-pandas-dataframe-is-subset-of-other-dataframe
-            if len(df_intersection) != len(df):
-                to_print = "Some of the subjects (and sessions) requested in "
-                if which_function == "babs-submit":
-                    to_print += "`--job`"
-                elif which_function == "babs-status":
-                    to_print += "`--resubmit-job`"
-                else:
-                    raise Exception("Invalid `which_function`: " + which_function)
-                to_print += " are not in the final list of included subjects (and sessions)." \
-                    + " Path to this final inclusion list is at: " \
-                    + job_status_path_abs
-                raise Exception(to_print)
-
-    except Timeout:   # after waiting for time defined in `timeout`:
-        # if another instance also uses locks, and is currently running,
-        #   there will be a timeout error
-        print("Another instance of this application currently holds the lock.")
+    #   look up each job in the hash index of the job status table (e.g., `job_status.csv`):
+    list_index = babs_proj.find_jobs(df)
+    if None in list_index:
+        to_print = "Some of the subjects (and sessions) requested in "
+        if which_function == "babs-submit":
+            to_print += "`--job`"
+        elif which_function == "babs-status":
+            to_print += "`--resubmit-job`"
+        else:
+            raise Exception("Invalid `which_function`: " + which_function)
+        to_print += " are not in the final list of included subjects (and sessions)." \
+            + " Path to this final inclusion list is at: " \
+            + babs_proj.job_status_store.path
+        raise Exception(to_print)
 
     return df
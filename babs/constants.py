@@ -1 +1,57 @@
 MSG_NO_ALERT_IN_LOGS = "BABS: No alert keyword found in log files."
+MSG_NO_ALERT_QACCT_FAILED = "qacct: no alert message in field 'failed'"
+MSG_FAILED_TO_CALL_QACCT = "BABS: failed to call 'qacct'"
+
+# Journal of pushes to output RIA, written by the `post-receive` hook installed by `babs-init`:
+OUTPUT_RIA_PUSH_JOURNAL = "babs_push_journal.txt"   # in the output RIA's bare repository
+
+# Actions planned by `plan_job_status_actions()` for each submitted job in `babs-status`:
+ACTION_MARK_DONE = "mark_done"   # found the job's branch in output RIA
+ACTION_UPDATE_STATE = "update_state"   # still in the queue; update the state
+ACTION_NO_CHANGE = "no_change"   # nothing to update except for log-derived fields
+ACTION_MARK_FAILED = "mark_failed"   # out of the queue, but no branch in output RIA
+ACTION_RESUBMIT = "resubmit"   # resubmit; no need to kill, as it's out of the queue
+ACTION_KILL_RESUBMIT = "kill_resubmit"   # kill the job in the queue, then resubmit
+
+# Types of events in the job event log, see `job_status_events.py`:
+EVENT_CREATED = "created"   # the job status table was created (or migrated); includes all rows
+EVENT_SUBMITTED = "submitted"   # the job was submitted for the first time
+EVENT_RESUBMITTED = "resubmitted"   # the job was resubmitted, with a new job ID
+EVENT_DONE = "done"   # the job is done, i.e., found its branch in output RIA
+EVENT_FAILED = "failed"   # the job is failed
+EVENT_ALERT_FOUND = "alert_found"   # alert keyword was found in the job's log files
+EVENT_STATE_CHANGED = "state_changed"   # other changes, e.g., pending -> running
+
+# Columns of the job status table used by `report_job_status()` in `utils.py`,
+#   e.g., to load only these columns with `JobStatusStore.read_columns()`:
+JOB_STATUS_REPORT_COLUMNS = ["has_submitted", "is_done", "job_state_category",
+                             "job_state_code", "is_failed", "alert_message", "job_account"]
+
+# Maximum time (in seconds) to wait for the lock of the job status table
+#   when saving changes with `JobStatusStore.commit()`; the lock is only held briefly:
+JOB_STATUS_LOCK_TIMEOUT = 120
+
+# Maximum time (in seconds) to wait for the lock again, if it timed out in the last save
+#   of jobs (re)submitted in this run: these jobs would be killed if not saved,
+#   as they would not be tracked:
+JOB_STATUS_LOCK_TIMEOUT_FINAL = 3600
+
+# Interval (in seconds) to save the job status table while `babs-submit` is submitting jobs,
+#   so that job IDs of jobs that have been submitted are not lost if it's killed:
+JOB_SUBMIT_SAVE_INTERVAL = 30
+
+# Max number of cycles in a row where submitting jobs failed in `babs-submit --max-in-flight`,
+#   before it stops; a failure may be temporary, e.g., the cluster's limit of queued jobs:
+ROLLING_SUBMIT_MAX_FAILED_CYCLES = 5
+
+# Columns of the job status table with unix timestamps (in seconds) of the current attempt
+#   of each job, recorded by `babs-submit` and `babs-status`; NaN if not happened (yet).
+#   Previous attempts are kept in the job event log, see `job_stats.py`:
+JOB_TIMESTAMP_COLUMNS = ["time_submitted",   # when the job was (re)submitted
+                         "time_started",   # when the job started running, first seen as 'r'
+                         "time_finished",   # when the job was found done
+                         "time_failed"]   # when the job was found failed
+
+# Cached summary of job status, written at the end of every `babs-status`
+#   and printed by `babs-status --cached`; relative to the `analysis` folder:
+JOB_STATUS_SUMMARY_PATH_REL = "code/job_status_summary.json"
@@ -0,0 +1,315 @@
+# This is the order of submitting jobs, i.e., `babs-submit --order`.
+# By default, jobs are submitted in the order of rows in the job status table,
+#   i.e., the order of `sub_final_inclu.csv` (or `sub_ses_final_inclu.csv`).
+#   On a fixed number of job slots, the largest jobs submitted last often decide
+#   when all jobs are done; submitting the longest jobs first makes this tail shorter.
+# How long a job runs is estimated with:
+#   - the size of its input data ('input_size' in the job status table, in bytes),
+#       estimated in `babs-init` from the sizes in git-annex keys of its files
+#       in all input datasets, without getting the file contents, see `get_job_input_sizes()`;
+#   - the runtime of finished jobs (see `job_stats.py`), fitted against their input sizes.
+
+import os.path as op
+import re
+import subprocess
+import warnings
+import numpy as np
+import pandas as pd
+
+from babs.job_stats import get_job_attempts, OUTCOME_DONE
+
+# Choices of `babs-submit --order`:
+SUBMIT_ORDERS = ["row",   # in the order of rows in the job status table
+                 "largest",   # largest input size first
+                 "smallest",   # smallest input size first
+                 "random",
+                 "history"]   # longest runtime estimated from finished jobs first
+
+# Min number of finished jobs to estimate the runtime from, for `--order history`:
+HISTORY_MIN_JOBS = 5
+
+# git-annex key, e.g., 'MD5E-s123456--0123abcd.nii.gz': backend, fields (size: '-s<bytes>'),
+#   and then '--' with the rest. See https://git-annex.branchable.com/internals/key_format/
+ANNEX_KEY_PATTERN = re.compile(r"^[A-Z0-9]+((?:-[a-zA-Z][0-9]+)*)--")
+ANNEX_KEY_SIZE_PATTERN = re.compile(r"-s([0-9]+)")
+# An unlocked annexed file is saved in git as a small pointer file, '/annex/objects/<key>':
+ANNEX_POINTER_PREFIX = b"/annex/objects/"
+ANNEX_POINTER_MAX_SIZE = 1024
+
+
+def get_annex_key_size(key):
+    """
+    This is to get the file size saved in a git-annex key.
+
+    Parameters:
+    -------------
+    key: str
+        e.g., 'MD5E-s123456--0123abcd.nii.gz'
+
+    Returns:
+    -----------
+    size: int or None
+        in bytes; None if it's not a git-annex key, or the key doesn't have a size
+        (e.g., a key of a URL)
+    """
+    match = ANNEX_KEY_PATTERN.match(key)
+    if match is None:
+        return None
+    match_size = ANNEX_KEY_SIZE_PATTERN.search(match.group(1))
+    if match_size is None:
+        return None
+    return int(match_size.group(1))
+
+
+def get_dataset_file_sizes(ds_path):
+    """
+    This is to get the size of every file in a dataset, from the git tree of `HEAD`:
+    for annexed files, from their git-annex keys, so file contents are not needed;
+    for files in git, from the git objects.
+    Files in subdatasets are not included.
+
+    Parameters:
+    -------------
+    ds_path: str
+        path to the dataset
+
+    Returns:
+    -----------
+    dict_file_size: dict
+        key: path of the file, relative to `ds_path`; value: size in bytes,
+        or None if unknown
+    """
+    proc = subprocess.run(["git", "-C", ds_path, "ls-tree", "-r", "-l", "-z", "HEAD"],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    proc.check_returncode()
+
+    dict_file_size = {}
+    dict_object_paths = {}   # files to check their contents; key: git object
+    for entry in proc.stdout.split(b"\0"):
+        if len(entry) == 0:
+            continue
+        meta, path = entry.split(b"\t", 1)
+        mode, object_type, object_id, size = meta.split()
+        if object_type != b"blob":   # e.g., a subdataset
+            continue
+        path = path.decode("utf-8", errors="surrogateescape")
+        is_symlink = mode == b"120000"
+        if is_symlink or (int(size) <= ANNEX_POINTER_MAX_SIZE):
+            # a symlink (locked annexed file), or maybe a pointer file (unlocked):
+            dict_object_paths.setdefault(object_id, []).append(path)
+        dict_file_size[path] = None if is_symlink else int(size)
+
+    # contents of these objects, all at once:
+    if len(dict_object_paths) > 0:
+        list_object_id = list(dict_object_paths.keys())
+        proc = subprocess.run(["git", "-C", ds_path, "cat-file", "--batch"],
+                              input=b"\n".join(list_object_id) + b"\n",
+                              stdout=subprocess.PIPE)
+        proc.check_returncode()
+        output = proc.stdout
+        position = 0
+        for object_id in list_object_id:
+            # each object: '<object> <type> <size>\n<contents>\n'
+            end_header = output.index(b"\n", position)
+            size = int(output[position:end_header].split()[2])
+            contents = output[end_header + 1:end_header + 1 + size]
+            position = end_header + 1 + size + 1
+
+            if contents.startswith(ANNEX_POINTER_PREFIX) or (b"/annex/objects/" in contents):
+                key = op.basename(contents.strip().decode("utf-8", errors="surrogateescape"))
+                for path in dict_object_paths[object_id]:
+                    dict_file_size[path] = get_annex_key_size(key)
+            # ^^ otherwise, a small file in git (its size is known),
+            #   or a symlink not to an annexed file (its size is unknown)
+
+    return dict_file_size
+
+
+def get_job_input_sizes(input_ds, type_session, df_sub):
+    """
+    This is to estimate the size of input data of each job, summed over all input datasets:
+    - for an unzipped input dataset: all files in the folder of the subject
+        (and the session), e.g., `sub-01/ses-A/`;
+    - for a zipped input dataset: the zip file(s) of the subject (and the session),
+        e.g., `sub-01_ses-A_freesurfer-20.7.zip`.
+    Files whose size is unknown (e.g., in a subdataset) are not counted.
+
+    Parameters:
+    -------------
+    input_ds: class `Input_ds`
+        input dataset(s) information
+    type_session: str
+        "multi-ses" or "single-ses"
+    df_sub: pd.DataFrame
+        list of jobs; columns: 'sub_id' (and 'ses_id', if multi-ses)
+
+    Returns:
+    -----------
+    input_sizes: np.ndarray of float
+        size of input data of each job in `df_sub`, in bytes
+    """
+    if type_session == "multi-ses":
+        list_keys = list(zip(df_sub["sub_id"], df_sub["ses_id"]))
+        zip_pattern = re.compile(r"^(sub-[^_/]+)_(ses-[^_/]+)_.*\.zip$")
+    else:
+        list_keys = [(sub, None) for sub in df_sub["sub_id"]]
+        zip_pattern = re.compile(r"^(sub-[^_/]+)_.*\.zip$")
+    dict_size = dict.fromkeys(list_keys, 0)
+
+    for i_ds in range(0, input_ds.num_ds):
+        try:
+            dict_file_size = get_dataset_file_sizes(input_ds.df["path_now_abs"][i_ds])
+        except (subprocess.CalledProcessError, OSError) as e:
+            warnings.warn("Failed to get file sizes in input dataset '"
+                          + input_ds.df["name"][i_ds] + "': " + str(e)
+                          + " It's not counted in the input size of jobs.")
+            continue
+
+        is_zipped = input_ds.df["is_zipped"][i_ds] is True
+        for path, size in dict_file_size.items():
+            if size is None:
+                continue
+            if is_zipped:
+                match = zip_pattern.match(path)
+                if match is None:
+                    continue
+                key = (match.group(1),
+                       match.group(2) if type_session == "multi-ses" else None)
+            else:
+                parts = path.split("/")
+                if type_session == "multi-ses":
+                    if len(parts) < 3:   # not in a session folder
+                        continue
+                    key = (parts[0], parts[1])
+                else:
+                    if len(parts) < 2:   # not in a subject folder
+                        continue
+                    key = (parts[0], None)
+            if key in dict_size:
+                dict_size[key] += size
+
+    return np.array([dict_size[key] for key in list_keys], dtype=float)
+
+
+def add_input_sizes_to_sub_list(input_ds, babs):
+    """
+    This is to estimate the input size of each job, see `get_job_input_sizes()`,
+    and save it as column 'input_size' in the final list of subjects (and sessions),
+    i.e., `sub_final_inclu.csv` (or `sub_ses_final_inclu.csv`);
+    it will be in the job status table, which is created from this list.
+
+    Parameters:
+    -------------
+    input_ds: class `Input_ds`
+        input dataset(s) information
+    babs: class `BABS`
+        information about a BABS project
+    """
+    df_sub = pd.read_csv(babs.list_sub_path_abs)
+    df_sub["input_size"] = get_job_input_sizes(input_ds, babs.type_session, df_sub)
+    df_sub.to_csv(babs.list_sub_path_abs, index=False)
+    print("The input size of each job has been estimated, with "
+          + format_size(df_sub["input_size"].sum()) + " in total;"
+          + " it's used by `babs-submit --order`.")
+
+
+def format_size(num_bytes):
+    """
+    This is to print a size in bytes, e.g., '1.5 GB'.
+    """
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if num_bytes < 1024 or unit == "TB":
+            break
+        num_bytes /= 1024
+    return str(round(num_bytes, 1)) + " " + unit
+
+
+def estimate_job_runtimes(df_job, job_status_store):
+    """
+    This is to estimate the runtime of jobs from their input sizes, with a linear fit
+    of runtime vs. input size of jobs that have finished successfully.
+
+    Parameters:
+    -------------
+    df_job: pd.DataFrame
+        the job status table, with column 'input_size'
+    job_status_store: class `JobStatusStoreCsv`, `JobStatusStoreSqlite`
+        or `JobStatusStoreEvents`
+        where the job status table is saved, for the runtime of finished jobs
+
+    Returns:
+    -----------
+    runtimes: pd.Series of float or None
+        estimated runtime (in seconds) of each job in `df_job`;
+        None if there are not enough finished jobs with known input size
+    """
+    df_attempts = get_job_attempts(job_status_store)
+    df_attempts = df_attempts[(df_attempts["outcome"] == OUTCOME_DONE)
+                              & df_attempts["runtime"].notna()
+                              & df_attempts["row_index"].isin(df_job.index)]
+    sizes = df_job.loc[df_attempts["row_index"], "input_size"].to_numpy(dtype=float)
+    runtimes = df_attempts["runtime"].to_numpy(dtype=float)
+    is_known = ~np.isnan(sizes)
+    if (is_known.sum() < HISTORY_MIN_JOBS) or (np.ptp(sizes[is_known]) == 0):
+        return None
+    slope, intercept = np.polyfit(sizes[is_known], runtimes[is_known], 1)
+    print("Runtime estimated from " + str(is_known.sum()) + " finished jobs: "
+          + str(round(intercept)) + " s " + ("+ " if slope >= 0 else "- ")
+          + str(abs(round(slope * 1024 ** 3))) + " s per GB"
+          + " of input data.")
+    return intercept + slope * df_job["input_size"].astype(float)
+
+
+def order_jobs(df_job, list_index, order, job_status_store=None):
+    """
+    This is to sort jobs to submit, see `SUBMIT_ORDERS`.
+
+    Parameters:
+    -------------
+    df_job: pd.DataFrame
+        the job status table
+    list_index: list
+        indices of jobs to submit, in the order of rows
+    order: str
+        one of `SUBMIT_ORDERS`
+    job_status_store: class `JobStatusStoreCsv`, `JobStatusStoreSqlite`
+        or `JobStatusStoreEvents`, or None
+        where the job status table is saved; required by order 'history'
+
+    Returns:
+    -----------
+    list_index_ordered: list
+        the same indices, sorted.
+        Jobs with unknown input size (NaN) are submitted after others.
+    """
+    if order not in SUBMIT_ORDERS:
+        raise Exception("Invalid order of submitting jobs: '" + order + "'."
+                        + " It should be one of: " + ", ".join(SUBMIT_ORDERS))
+    if (order == "row") or (len(list_index) <= 1):
+        return list(list_index)
+    if order == "random":
+        return [list_index[i] for i in np.random.default_rng().permutation(len(list_index))]
+
+    if ("input_size" not in df_job.columns) or df_job["input_size"].isna().all():
+        warnings.warn("The input size of jobs is unknown, as this BABS project was initialized"
+                      + " by an older version of BABS; jobs are submitted in the order of rows.")
+        return list(list_index)
+
+    if order == "history":
+        runtimes = estimate_job_runtimes(df_job, job_status_store)
+        if runtimes is None:
+            print("Not enough jobs have finished to estimate the runtime"
+                  + " (at least " + str(HISTORY_MIN_JOBS) + " with different input sizes);"
+                  + " submitting jobs with the largest input size first.")
+            order = "largest"
+        else:
+            keys = runtimes.loc[list_index]
+            ascending = False
+    if order in ["largest", "smallest"]:
+        keys = df_job.loc[list_index, "input_size"].astype(float)
+        ascending = order == "smallest"
+
+    keys = pd.Series(keys.to_numpy(), index=pd.RangeIndex(len(list_index)))
+    list_position = keys.sort_values(ascending=ascending, kind="stable",
+                                     na_position="last").index
+    return [list_index[i] for i in list_position]
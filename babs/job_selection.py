@@ -0,0 +1,325 @@
+# This is to select jobs in bulk for `babs-submit` and `babs-status`,
+#   instead of repeating `--job` or `--resubmit-job`:
+#   - a job file: a CSV or Parquet file with columns 'sub_id' (and 'ses_id', if multi-ses),
+#       e.g., a filtered copy of `job_status.csv`; other columns are ignored;
+#   - a selection expression over the job status table, evaluated on all jobs at once, e.g.,
+#       state == "failed" and alert_message contains "OOM"
+# Syntax of selection expressions:
+#   - comparisons: <field> <operator> <value>
+#       field: a column of the job status table (e.g., `job_id`, `alert_message`),
+#           or `state`, one of the `JOB_STATES` (see `get_job_states()`);
+#       operator: ==, !=, <, <=, >, >=, or `contains` (substring, for text);
+#       value: a quoted string, a number, `true`, `false`, or `null` (missing value);
+#   - combined with `and`, `or`, `not`, and parentheses.
+# A missing value (e.g., `alert_message` of a job without alert) never matches,
+#   except for `== null` (and `!= <value>`).
+
+import re
+import os.path as op
+import numpy as np
+import pandas as pd
+
+# states of jobs, i.e., field `state` in selection expressions:
+JOB_STATES = ["not_submitted", "done", "failed", "running", "pending", "stalled", "submitted"]
+# ^^ 'submitted': submitted but none of the others, e.g., not checked by `babs-status` yet
+
+# tokens of selection expressions:
+TOKEN_PATTERN = re.compile(r"""\s*(?:
+    (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    |(?P<number>-?\d+(?:\.\d*)?)
+    |(?P<operator>==|!=|<=|>=|<|>)
+    |(?P<paren>[()])
+    |(?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    )""", re.VERBOSE)
+KEYWORDS = ["and", "or", "not", "contains", "true", "false", "null"]
+
+
+def read_job_file(job_file, type_session):
+    """
+    This is to read a job file, i.e., a list of jobs requested by `--job-file`
+    (for `babs-submit`) or `--resubmit-job-file` (for `babs-status`).
+
+    Parameters:
+    -------------
+    job_file: str
+        path to the CSV file, or Parquet file (with extension '.parquet' or '.pq';
+        `pyarrow` is required). It should have column 'sub_id' (and 'ses_id', if multi-ses).
+    type_session: str
+        'single-ses' or 'multi-ses'
+
+    Returns:
+    -----------
+    df: pd.DataFrame
+        list of requested jobs; columns: 'sub_id' (and 'ses_id', if multi-ses)
+    """
+    if op.exists(job_file) is False:
+        raise Exception("The job file does not exist: " + job_file)
+    columns = get_job_key_columns(type_session)
+
+    if op.splitext(job_file)[1].lower() in [".parquet", ".pq"]:
+        try:
+            df = pd.read_parquet(job_file)
+        except ImportError:
+            raise Exception("Reading a Parquet job file requires `pyarrow`;"
+                            + " please install it (e.g., `pip install babs[parquet]`),"
+                            + " or use a CSV file instead.")
+    else:
+        df = pd.read_csv(job_file, dtype=str)
+
+    list_missing = [column for column in columns if column not in df.columns]
+    if len(list_missing) > 0:
+        raise Exception("The job file should have column(s): " + ", ".join(columns)
+                        + ", as input dataset(s) is " + type_session + "!"
+                        + " Missing: " + ", ".join(list_missing) + ". File: " + job_file)
+    df = df[columns].astype(str).reset_index(drop=True)
+
+    # sanity check, as for `--job`:
+    if not df["sub_id"].str.startswith("sub-").all():
+        raise Exception("Values of 'sub_id' in the job file should be 'sub-*'!")
+    if (type_session == "multi-ses") and (not df["ses_id"].str.startswith("ses-").all()):
+        raise Exception("Values of 'ses_id' in the job file should be 'ses-*'!")
+
+    return df
+
+
+def select_jobs(job_status_store, expression, type_session):
+    """
+    This is to select jobs with a selection expression, see the top of this file.
+    Only the columns used by the expression are loaded, if possible.
+
+    Parameters:
+    -------------
+    job_status_store: class `JobStatusStoreCsv`, `JobStatusStoreSqlite`
+        or `JobStatusStoreEvents`
+        where the job status table is saved, i.e., attribute `job_status_store` of class `BABS`
+    expression: str
+        the selection expression
+    type_session: str
+        'single-ses' or 'multi-ses'
+
+    Returns:
+    -----------
+    df: pd.DataFrame
+        list of selected jobs, in the order of the job status table;
+        columns: 'sub_id' (and 'ses_id', if multi-ses)
+    """
+    tree = parse_job_selection(expression)
+    list_fields = get_fields(tree)
+    columns = get_job_key_columns(type_session)
+    for field in list_fields:
+        if field == "state":
+            columns += ["has_submitted", "is_done", "is_failed", "job_state_code"]
+        else:
+            columns.append(field)
+    df_job = job_status_store.read_columns(list(dict.fromkeys(columns)))
+
+    is_selected = evaluate_job_selection(tree, df_job)
+    return df_job.loc[is_selected.to_numpy(), get_job_key_columns(type_session)] \
+        .reset_index(drop=True)
+
+
+def get_job_key_columns(type_session):
+    if type_session == "single-ses":
+        return ["sub_id"]
+    elif type_session == "multi-ses":
+        return ["sub_id", "ses_id"]
+    else:
+        raise Exception("Invalid `type_session`: " + str(type_session))
+
+
+def tokenize(expression):
+    """
+    This is to split a selection expression into tokens.
+
+    Returns:
+    -----------
+    list_tokens: list of tuple
+        (kind, value); kind is 'string', 'number', 'operator', 'paren', 'word' or 'keyword'
+    """
+    list_tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        if (match is None) or (match.end() == position):
+            raise Exception("Invalid selection expression at: '"
+                            + expression[position:] + "'")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        elif kind == "number":
+            value = float(value) if "." in value else int(value)
+        elif (kind == "word") and (value.lower() in KEYWORDS):
+            kind = "keyword"
+            value = value.lower()
+        list_tokens.append((kind, value))
+        position = match.end()
+    return list_tokens
+
+
+def parse_job_selection(expression):
+    """
+    This is to parse a selection expression into a tree.
+
+    Returns:
+    -----------
+    tree: tuple
+        ('or', left, right), ('and', left, right), ('not', operand),
+        or ('compare', field, operator, value)
+    """
+    list_tokens = tokenize(expression)
+    if len(list_tokens) == 0:
+        raise Exception("The selection expression is empty!")
+    tree, position = parse_or(list_tokens, 0)
+    if position != len(list_tokens):
+        raise Exception("Invalid selection expression: unexpected '"
+                        + str(list_tokens[position][1]) + "' in: " + expression)
+    return tree
+
+
+def parse_or(list_tokens, position):
+    left, position = parse_and(list_tokens, position)
+    while (position < len(list_tokens)) and (list_tokens[position] == ("keyword", "or")):
+        right, position = parse_and(list_tokens, position + 1)
+        left = ("or", left, right)
+    return left, position
+
+
+def parse_and(list_tokens, position):
+    left, position = parse_not(list_tokens, position)
+    while (position < len(list_tokens)) and (list_tokens[position] == ("keyword", "and")):
+        right, position = parse_not(list_tokens, position + 1)
+        left = ("and", left, right)
+    return left, position
+
+
+def parse_not(list_tokens, position):
+    if position >= len(list_tokens):
+        raise Exception("Invalid selection expression: it ends unexpectedly.")
+    if list_tokens[position] == ("keyword", "not"):
+        operand, position = parse_not(list_tokens, position + 1)
+        return ("not", operand), position
+    if list_tokens[position] == ("paren", "("):
+        tree, position = parse_or(list_tokens, position + 1)
+        if (position >= len(list_tokens)) or (list_tokens[position] != ("paren", ")")):
+            raise Exception("Invalid selection expression: missing ')'.")
+        return tree, position + 1
+    return parse_comparison(list_tokens, position)
+
+
+def parse_comparison(list_tokens, position):
+    if position + 3 > len(list_tokens):
+        raise Exception("Invalid selection expression: incomplete comparison.")
+    (kind_field, field), (kind_op, operator), (kind_value, value) = \
+        list_tokens[position:position + 3]
+    if kind_field != "word":
+        raise Exception("Invalid selection expression: expected a field name, got '"
+                        + str(field) + "'.")
+    if not ((kind_op == "operator") or ((kind_op, operator) == ("keyword", "contains"))):
+        raise Exception("Invalid selection expression: expected an operator after '"
+                        + field + "', got '" + str(operator) + "'.")
+    if kind_value == "keyword":
+        if value not in ["true", "false", "null"]:
+            raise Exception("Invalid selection expression: expected a value after '"
+                            + operator + "', got '" + value + "'.")
+        value = {"true": True, "false": False, "null": None}[value]
+    elif kind_value not in ["string", "number"]:
+        raise Exception("Invalid selection expression: expected a value after '"
+                        + operator + "', got '" + str(value) + "'."
+                        + " Please quote strings, e.g., \"failed\".")
+    if (operator == "contains") and not isinstance(value, str):
+        raise Exception("Invalid selection expression: `contains` needs a quoted string.")
+    return ("compare", field, operator, value), position + 3
+
+
+def get_fields(tree):
+    """
+    This is to get the fields used in the parsed selection expression.
+    """
+    if tree[0] == "compare":
+        return [tree[1]]
+    return [field for operand in tree[1:] for field in get_fields(operand)]
+
+
+def evaluate_job_selection(tree, df_job):
+    """
+    This is to evaluate the parsed selection expression on all jobs at once.
+
+    Parameters:
+    -------------
+    tree: tuple
+        from `parse_job_selection()`
+    df_job: pd.DataFrame
+        the job status table, with (at least) the columns used in the expression
+
+    Returns:
+    -----------
+    is_selected: pd.Series of bool
+        index is the same as `df_job`
+    """
+    if tree[0] == "or":
+        return evaluate_job_selection(tree[1], df_job) | evaluate_job_selection(tree[2], df_job)
+    elif tree[0] == "and":
+        return evaluate_job_selection(tree[1], df_job) & evaluate_job_selection(tree[2], df_job)
+    elif tree[0] == "not":
+        return ~evaluate_job_selection(tree[1], df_job)
+
+    _, field, operator, value = tree
+    if field == "state":
+        values = get_job_states(df_job)
+        if (value is not None) and (value not in JOB_STATES):
+            raise Exception("Invalid value of `state`: '" + str(value) + "'."
+                            + " It should be one of: " + ", ".join(JOB_STATES))
+    elif field in df_job.columns:
+        values = df_job[field]
+    else:
+        raise Exception("Invalid field in the selection expression: '" + field + "'."
+                        + " It should be `state` or a column of the job status table.")
+
+    is_missing = values.isna()
+    if value is None:
+        if operator == "==":
+            return is_missing
+        elif operator == "!=":
+            return ~is_missing
+        raise Exception("Only `==` and `!=` can be used with `null`.")
+
+    values_present = values[~is_missing]
+    if operator == "contains":
+        result = values_present.astype(str).str.contains(value, regex=False)
+    else:
+        if isinstance(value, str):
+            values_present = values_present.astype(str)
+        elif isinstance(value, bool):
+            values_present = values_present.astype(bool)
+        else:
+            values_present = pd.to_numeric(values_present, errors="coerce")
+        result = {"==": values_present.__eq__, "!=": values_present.__ne__,
+                  "<": values_present.__lt__, "<=": values_present.__le__,
+                  ">": values_present.__gt__, ">=": values_present.__ge__}[operator](value)
+
+    is_selected = pd.Series(operator == "!=", index=df_job.index)
+    is_selected[~is_missing] = result.fillna(False).astype(bool).to_numpy()
+    return is_selected
+
+
+def get_job_states(df_job):
+    """
+    This is to get the state of each job, for all jobs at once, see `JOB_STATES`.
+    Columns 'has_submitted', 'is_done', 'is_failed' and 'job_state_code' are used.
+
+    Returns:
+    -----------
+    states: pd.Series of str
+        index is the same as `df_job`
+    """
+    code = df_job["job_state_code"]
+    list_conditions = [~df_job["has_submitted"].astype(bool),
+                       df_job["is_done"].astype(bool),
+                       (df_job["is_failed"] == True).to_numpy(),   # noqa: E712; NaN is False
+                       (code == "r").to_numpy(),
+                       (code == "qw").to_numpy(),
+                       (code == "eqw").to_numpy()]
+    return pd.Series(np.select(list_conditions, JOB_STATES[:-1], default=JOB_STATES[-1]),
+                     index=df_job.index)
@@ -0,0 +1,293 @@
+# This is to analyze the throughput of jobs, for `babs-stats`.
+# The timeline of every attempt of every job (i.e., each submission, with its own job ID)
+#   is reconstructed from the job event log (`job_status_events.jsonl`,
+#   see `job_status_events.py`), as the job status table only keeps the current attempt:
+#   - when it was submitted, started running, and was found done or failed,
+#       from the timestamps recorded by `babs-submit` and `babs-status`
+#       (see `JOB_TIMESTAMP_COLUMNS` in `constants.py`);
+#   - for events recorded before these timestamps were introduced, the time of the events
+#       is used instead, e.g., the time of event `EVENT_DONE` as the time it finished.
+# Queue wait (started - submitted) and runtime (finished - started) are computed
+#   for all attempts at once, and summarized with percentiles,
+#   e.g., to size `cluster_resources` in the container config YAML file,
+#   and to forecast when all jobs will be done.
+
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+
+from babs.constants import (JOB_TIMESTAMP_COLUMNS,
+                            EVENT_CREATED, EVENT_SUBMITTED, EVENT_RESUBMITTED,
+                            EVENT_DONE, EVENT_FAILED)
+from babs.job_status_events import get_job_events, read_job_events
+
+# outcomes of attempts:
+OUTCOME_DONE = "done"
+OUTCOME_FAILED = "failed"
+OUTCOME_RESUBMITTED = "resubmitted"   # resubmitted before it was found done or failed
+OUTCOME_ACTIVE = "active"   # current attempt, pending or running (or not checked yet)
+
+
+def get_job_attempts(job_status_store):
+    """
+    This is to get the timeline of every attempt of every job.
+
+    Parameters:
+    -------------
+    job_status_store: class `JobStatusStoreCsv`, `JobStatusStoreSqlite`
+        or `JobStatusStoreEvents`
+        where the job status table is saved, i.e., attribute `job_status_store` of class `BABS`
+
+    Returns:
+    -----------
+    df_attempts: pd.DataFrame
+        one row per attempt, in the order of (row_index, attempt). Columns:
+        - row_index: index of the job in the job status table
+        - sub_id (and ses_id, if multi-ses)
+        - attempt: 1 for the first submission of the job, 2 for the first resubmission, ...
+        - job_id
+        - time_submitted, time_started, time_finished, time_failed: unix timestamps;
+            NaN if unknown or not happened
+        - outcome: see `OUTCOME_*`
+        - queue_wait, runtime: in seconds; NaN if unknown.
+            The runtime of a failed attempt is until it was found failed.
+    """
+    list_events, _ = read_job_events(job_status_store.events_path)
+    if len(list_events) == 0:   # no event log (yet); only the current attempts:
+        list_events = get_job_events(None, job_status_store.read(), None)
+
+    list_attempts = []
+    dict_current = {}   # key: row_index; value: the current attempt of this job
+    for event in list_events:
+        if event["event"] == EVENT_CREATED:
+            dict_current = {}
+            columns = event["columns"]
+            for row_index, row in zip(event["index"], event["rows"]):
+                dict_row = dict(zip(columns, row))
+                if dict_row.get("has_submitted") and (dict_row.get("job_id", -1) != -1):
+                    attempt = new_attempt(row_index, dict_row, dict_current)
+                    for col in JOB_TIMESTAMP_COLUMNS + ["is_done", "is_failed"]:
+                        attempt[col] = dict_row.get(col)
+                    list_attempts.append(attempt)
+            continue
+
+        row_index = event["row_index"]
+        values = event["values"]
+        attempt = dict_current.get(row_index)
+        job_id = values.get("job_id")
+        if (job_id is not None) and (job_id != -1) and \
+                ((attempt is None) or (attempt["job_id"] != job_id)):
+            attempt = new_attempt(row_index, dict(event, job_id=job_id), dict_current)
+            list_attempts.append(attempt)
+        if attempt is None:
+            continue
+
+        for col in JOB_TIMESTAMP_COLUMNS + ["is_done", "is_failed"]:
+            if values.get(col) is not None:
+                attempt[col] = values[col]
+        # events recorded before the timestamps were introduced:
+        if event["event"] in [EVENT_SUBMITTED, EVENT_RESUBMITTED] \
+                and (attempt["time_submitted"] is None):
+            attempt["time_submitted"] = event["time"]
+        elif (event["event"] == EVENT_DONE) and (attempt["time_finished"] is None):
+            attempt["time_finished"] = event["time"]
+        elif (event["event"] == EVENT_FAILED) and (attempt["time_failed"] is None):
+            attempt["time_failed"] = event["time"]
+        if (values.get("job_state_code") == "r") and (attempt["time_started"] is None):
+            attempt["time_started"] = event["time"]
+
+    df_attempts = pd.DataFrame(list_attempts,
+                               columns=["row_index", "sub_id", "ses_id", "attempt", "job_id"]
+                               + JOB_TIMESTAMP_COLUMNS + ["is_done", "is_failed"])
+    if df_attempts["ses_id"].isna().all():   # single-ses
+        df_attempts = df_attempts.drop(columns=["ses_id"])
+    df_attempts[JOB_TIMESTAMP_COLUMNS] = df_attempts[JOB_TIMESTAMP_COLUMNS].astype(float)
+    df_attempts = df_attempts.sort_values(["row_index", "attempt"], kind="stable") \
+        .reset_index(drop=True)
+
+    # outcomes and durations, for all attempts at once:
+    is_last = df_attempts["row_index"].shift(-1) != df_attempts["row_index"]
+    df_attempts["outcome"] = np.select(
+        [(df_attempts.pop("is_done") == True).to_numpy(),   # noqa: E712; None is False
+         (df_attempts.pop("is_failed") == True).to_numpy(),   # noqa: E712
+         ~is_last.to_numpy()],
+        [OUTCOME_DONE, OUTCOME_FAILED, OUTCOME_RESUBMITTED], default=OUTCOME_ACTIVE)
+    df_attempts["queue_wait"] = df_attempts["time_started"] - df_attempts["time_submitted"]
+    time_ended = df_attempts["time_finished"].fillna(df_attempts["time_failed"])
+    df_attempts["runtime"] = time_ended - df_attempts["time_started"]
+
+    return df_attempts
+
+
+def new_attempt(row_index, dict_row, dict_current):
+    """
+    This is to start a new attempt of a job, see `get_job_attempts()`.
+
+    Parameters:
+    -------------
+    row_index: int
+        index of the job in the job status table
+    dict_row: dict
+        with keys 'job_id', 'sub_id' (and 'ses_id', if multi-ses)
+    dict_current: dict
+        the current attempt of each job; it will be updated in place
+
+    Returns:
+    -----------
+    attempt: dict
+    """
+    attempt_previous = dict_current.get(row_index)
+    attempt = {"row_index": row_index,
+               "sub_id": dict_row.get("sub_id"),
+               "ses_id": dict_row.get("ses_id"),
+               "attempt": 1 if attempt_previous is None else attempt_previous["attempt"] + 1,
+               "job_id": dict_row["job_id"]}
+    for col in JOB_TIMESTAMP_COLUMNS + ["is_done", "is_failed"]:
+        attempt[col] = None
+    dict_current[row_index] = attempt
+    return attempt
+
+
+def summarize_job_attempts(df_attempts, num_jobs, num_jobs_done, time_now,
+                           list_percentiles=(50, 90, 99), window=24):
+    """
+    This is to summarize the attempts of jobs, for `babs-stats`.
+
+    Parameters:
+    -------------
+    df_attempts: pd.DataFrame
+        from `get_job_attempts()`
+    num_jobs: int
+        number of jobs in the job status table
+    num_jobs_done: int
+        number of jobs that are done now
+    time_now: float
+        current unix timestamp
+    list_percentiles: list of float
+        percentiles of queue wait and runtime to report, between 0 and 100
+    window: float
+        in hours. The throughput is the number of attempts done in this period before now,
+        which is used to forecast when the remaining jobs will be done.
+
+    Returns:
+    -----------
+    dict_summary: dict
+        - 'num_jobs', 'num_jobs_done', 'num_attempts'
+        - 'outcomes': number of attempts of each outcome, see `OUTCOME_*`
+        - 'queue_wait', 'runtime', 'runtime_failed': dict of 'count', 'mean',
+            'max', and each percentile (e.g., 'p50'), in seconds.
+            'runtime' is of done attempts; 'runtime_failed' is of failed attempts.
+        - 'throughput': number of attempts done per hour in the past `window` hours
+        - 'eta': estimated seconds until the remaining jobs are done,
+            with the same throughput and no more failure; None if unknown
+    """
+    is_done = df_attempts["outcome"] == OUTCOME_DONE
+    is_failed = df_attempts["outcome"] == OUTCOME_FAILED
+
+    dict_summary = {"num_jobs": int(num_jobs),
+                    "num_jobs_done": int(num_jobs_done),
+                    "num_attempts": int(df_attempts.shape[0]),
+                    "outcomes": {outcome: int((df_attempts["outcome"] == outcome).sum())
+                                 for outcome in [OUTCOME_DONE, OUTCOME_FAILED,
+                                                 OUTCOME_RESUBMITTED, OUTCOME_ACTIVE]},
+                    "queue_wait": get_percentiles(df_attempts["queue_wait"],
+                                                  list_percentiles),
+                    "runtime": get_percentiles(df_attempts.loc[is_done, "runtime"],
+                                               list_percentiles),
+                    "runtime_failed": get_percentiles(df_attempts.loc[is_failed, "runtime"],
+                                                      list_percentiles)}
+
+    num_done_window = int((df_attempts.loc[is_done, "time_finished"]
+                           >= time_now - window * 3600).sum())
+    throughput = num_done_window / window
+    dict_summary["throughput"] = throughput
+    num_remaining = num_jobs - num_jobs_done
+    if num_remaining == 0:
+        dict_summary["eta"] = 0.0
+    elif throughput > 0:
+        dict_summary["eta"] = num_remaining / throughput * 3600
+    else:
+        dict_summary["eta"] = None
+    return dict_summary
+
+
+def get_percentiles(series, list_percentiles):
+    """
+    This is to get the statistics of durations (in seconds), ignoring NaN.
+
+    Returns:
+    -----------
+    dict_stats: dict
+        'count', 'mean', 'max', and each percentile, e.g., 'p50';
+        values are None if there is no duration
+    """
+    values = series.dropna().to_numpy(dtype=float)
+    dict_stats = {"count": int(len(values))}
+    if len(values) == 0:
+        dict_stats["mean"] = None
+        dict_stats.update({"p" + format_percentile(p): None for p in list_percentiles})
+        dict_stats["max"] = None
+        return dict_stats
+    dict_stats["mean"] = float(values.mean())
+    for p, value in zip(list_percentiles, np.percentile(values, list_percentiles)):
+        dict_stats["p" + format_percentile(p)] = float(value)
+    dict_stats["max"] = float(values.max())
+    return dict_stats
+
+
+def format_percentile(p):
+    """
+    e.g., 50 -> '50', 99.9 -> '99.9'
+    """
+    return "{:g}".format(p)
+
+
+def format_seconds(seconds):
+    """
+    This is to format a duration in seconds, in the same format as column `duration`
+    in the job status table, e.g., '0:08:40', '2 days, 0:00:00'; 'n/a' if None.
+    """
+    if seconds is None:
+        return "n/a"
+    return str(timedelta(seconds=round(seconds)))
+
+
+def report_job_stats(dict_summary, list_percentiles, window):
+    """
+    This is to print the summary from `summarize_job_attempts()`.
+    """
+    outcomes = dict_summary["outcomes"]
+    print("Jobs: " + str(dict_summary["num_jobs"]) + " in total, "
+          + str(dict_summary["num_jobs_done"]) + " done.")
+    print("Attempts (submissions): " + str(dict_summary["num_attempts"])
+          + " in total; " + str(outcomes[OUTCOME_DONE]) + " done, "
+          + str(outcomes[OUTCOME_FAILED]) + " failed, "
+          + str(outcomes[OUTCOME_RESUBMITTED]) + " resubmitted before done or failed, "
+          + str(outcomes[OUTCOME_ACTIVE]) + " pending or running.")
+
+    list_keys = ["p" + format_percentile(p) for p in list_percentiles]
+    print("")
+    print("{:<32}".format("") + "".join("{:>18}".format(key) for key in
+                                        ["count", "mean"] + list_keys + ["max"]))
+    for name, key in [("Queue wait", "queue_wait"),
+                      ("Runtime of done attempts", "runtime"),
+                      ("Runtime of failed attempts", "runtime_failed")]:
+        dict_stats = dict_summary[key]
+        print("{:<32}".format(name) + "{:>18}".format(dict_stats["count"])
+              + "".join("{:>18}".format(format_seconds(dict_stats[k]))
+                        for k in ["mean"] + list_keys + ["max"]))
+    print("The runtime of a failed attempt is until `babs-status` found it failed.")
+
+    print("")
+    print("Throughput: " + "{:.1f}".format(dict_summary["throughput"])
+          + " attempts done per hour in the past " + "{:g}".format(window) + " hour(s).")
+    num_remaining = dict_summary["num_jobs"] - dict_summary["num_jobs_done"]
+    if num_remaining == 0:
+        print("All jobs are done.")
+    elif dict_summary["eta"] is None:
+        print("Can't forecast when the remaining " + str(num_remaining) + " jobs"
+              + " will be done, as no attempt was done in this period.")
+    else:
+        print("At this throughput, the remaining " + str(num_remaining) + " jobs"
+              + " will be done in about " + format_seconds(dict_summary["eta"])
+              + " (if none of them fails).")
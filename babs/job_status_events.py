@@ -0,0 +1,360 @@
+# This is the append-only event log of jobs, i.e., `analysis/code/job_status_events.jsonl`.
+# `babs-submit` and `babs-status` append one event per change of a job,
+#   so the history of all jobs is kept, and the job status table
+#   at any time can be reconstructed by replaying the events.
+# Each line is one event in JSON, e.g.:
+#   {"time": 1672531200.123, "event": "done", "row_index": 3, "sub_id": "sub-01",
+#    "values": {"is_done": true, "is_failed": false, ...}}
+#   - "time": unix timestamp when the event was recorded
+#   - "event": type of the event, see `EVENT_*` in `constants.py`
+#   - "row_index": index of the job in the job status table
+#   - "values": columns changed by this event, and their new values
+#   The first event is `EVENT_CREATED`, which includes all rows of the table.
+# A compactor saves the table materialized from all events so far into a snapshot,
+#   i.e., `job_status_events_snapshot.json`, so that the current table can be loaded
+#   by only replaying the events after the snapshot.
+
+import os
+import os.path as op
+import json
+import re
+import time
+import numpy as np
+import pandas as pd
+
+from babs.constants import (MSG_NO_ALERT_IN_LOGS,
+                            EVENT_CREATED, EVENT_SUBMITTED, EVENT_RESUBMITTED,
+                            EVENT_DONE, EVENT_FAILED, EVENT_ALERT_FOUND,
+                            EVENT_STATE_CHANGED)
+
+
+def to_json_value(value):
+    """
+    This is to convert a value in the job status table into a value that can be saved in JSON.
+    NaN is saved as null.
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if (value is None) or isinstance(value, (bool, int, float, str)):
+        return value
+    if pd.isna(value):
+        return None
+    return str(value)
+
+
+def get_job_events(df_old, df_new, list_index_changed, time_event=None):
+    """
+    This is to get the events of jobs, from the changes of the job status table.
+
+    Parameters:
+    -------------
+    df_old: pd.DataFrame or None
+        the job status table before changes.
+        If None, the table was just created, and an `EVENT_CREATED` event is returned.
+    df_new: pd.DataFrame
+        the job status table after changes
+    list_index_changed: list
+        indices of changed rows, e.g., from `get_changed_rows()` in `utils.py`
+    time_event: float or None
+        unix timestamp of the events. If None, current time is used.
+
+    Returns:
+    -------------
+    list_events: list of dict
+        events, in the order of rows. For each changed row, the first event carries
+        all changed columns in "values"; if more than one type applies
+        (e.g., failed and alert found), the other events have empty "values".
+    """
+    if time_event is None:
+        time_event = time.time()
+    time_event = round(time_event, 3)
+
+    if df_old is None:
+        return [{"time": time_event,
+                 "event": EVENT_CREATED,
+                 "columns": list(df_new.columns),
+                 "index": [int(i) for i in df_new.index],
+                 "rows": [[to_json_value(v) for v in row]
+                          for row in df_new.itertuples(index=False, name=None)]}]
+
+    list_events = []
+    for i_job in list_index_changed:
+        row_old = df_old.loc[i_job]
+        row_new = df_new.loc[i_job]
+
+        dict_values = {}
+        for column in df_new.columns:
+            value_new = to_json_value(row_new[column])
+            value_old = to_json_value(row_old[column]) if column in df_old.columns else None
+            if value_new != value_old:
+                dict_values[column] = value_new
+
+        # Types of this change:
+        list_types = []
+        if (not row_old["has_submitted"]) and row_new["has_submitted"]:
+            list_types.append(EVENT_SUBMITTED)
+        elif row_old["has_submitted"] and (row_new["job_id"] != row_old["job_id"]):
+            list_types.append(EVENT_RESUBMITTED)
+        if (not row_old["is_done"]) and row_new["is_done"]:
+            list_types.append(EVENT_DONE)
+        if (to_json_value(row_new["is_failed"]) is True) \
+                and (to_json_value(row_old["is_failed"]) is not True):
+            list_types.append(EVENT_FAILED)
+        alert_message = to_json_value(row_new["alert_message"])
+        if ("alert_message" in dict_values) and (alert_message is not None) \
+                and (alert_message != MSG_NO_ALERT_IN_LOGS):
+            list_types.append(EVENT_ALERT_FOUND)
+        if len(list_types) == 0:
+            list_types.append(EVENT_STATE_CHANGED)
+
+        for i_type, event_type in enumerate(list_types):
+            event = {"time": time_event,
+                     "event": event_type,
+                     "row_index": int(i_job),
+                     "sub_id": to_json_value(row_new["sub_id"])}
+            if "ses_id" in df_new.columns:
+                event["ses_id"] = to_json_value(row_new["ses_id"])
+            event["values"] = dict_values if i_type == 0 else {}
+            list_events.append(event)
+
+    return list_events
+
+
+def append_job_events(events_path, list_events):
+    """
+    This is to append events to the event log.
+    The caller should hold the lock of the job status table.
+
+    Parameters:
+    -------------
+    events_path: str
+        path to the event log, i.e., `job_status_events.jsonl`
+    list_events: list of dict
+        from `get_job_events()`
+    """
+    if len(list_events) == 0:
+        return
+    text = "".join(json.dumps(event) + "\n" for event in list_events)
+    with open(events_path, "a") as f:
+        f.write(text)
+
+
+def read_job_events(events_path, offset=0):
+    """
+    This is to read events from the event log, starting from byte `offset`.
+    Only complete lines are read, as the last line may be still being written.
+
+    Parameters:
+    -------------
+    events_path: str
+        path to the event log, i.e., `job_status_events.jsonl`
+    offset: int
+        the position in the event log to start reading
+
+    Returns:
+    -------------
+    list_events: list of dict
+        the events
+    offset_end: int
+        the position in the event log after the last complete line
+    """
+    if not op.exists(events_path):
+        return [], offset
+    with open(events_path, "rb") as f:
+        f.seek(offset)
+        content = f.read()
+    content = content[:content.rfind(b"\n") + 1]   # only complete lines
+    list_events = [json.loads(line) for line in content.decode("utf-8").splitlines()
+                   if line.strip() != ""]
+    return list_events, offset + len(content)
+
+
+def apply_job_events(table, list_events, until=None):
+    """
+    This is to apply events to a table, i.e., replay the events.
+
+    Parameters:
+    -------------
+    table: dict or None
+        'columns': list of column names; 'index': list of row indices;
+        'rows': list of rows, each is a list of values.
+        If None, there should be an `EVENT_CREATED` event in `list_events`.
+        It will be updated in place.
+    list_events: list of dict
+        from `read_job_events()`
+    until: float or None
+        only apply events with "time" no later than this unix timestamp.
+        If None, all events are applied.
+
+    Returns:
+    -------------
+    table: dict or None
+        the table after applying the events
+    """
+    dict_position = {} if table is None else \
+        {row_index: i for i, row_index in enumerate(table["index"])}
+    for event in list_events:
+        if (until is not None) and (event["time"] > until):
+            break
+        if event["event"] == EVENT_CREATED:
+            table = {"columns": list(event["columns"]),
+                     "index": list(event["index"]),
+                     "rows": [list(row) for row in event["rows"]]}
+            dict_position = {row_index: i for i, row_index in enumerate(table["index"])}
+            continue
+        row = table["rows"][dict_position[event["row_index"]]]
+        for column, value in event["values"].items():
+            if column not in table["columns"]:   # a new column:
+                table["columns"].append(column)
+                for temp in table["rows"]:
+                    temp.append(None)
+            row[table["columns"].index(column)] = value
+    return table
+
+
+def table_to_dataframe(table):
+    """
+    This is to convert a table from `apply_job_events()` into a pd.DataFrame,
+    with the same dtypes as loading `job_status.csv` by `read_job_status_csv()`.
+    """
+    dict_columns = {}
+    for i_col, column in enumerate(table["columns"]):
+        list_values = [row[i_col] for row in table["rows"]]
+        list_not_null = [v for v in list_values if v is not None]
+        if column in ["has_submitted", "is_done"]:
+            values = np.array([bool(v) for v in list_values], dtype=bool)
+        elif column == "job_id":
+            values = np.array(list_values, dtype=np.int64)
+        elif len(list_not_null) == 0:
+            values = np.full(len(list_values), np.nan)
+        elif all(isinstance(v, bool) for v in list_not_null):
+            if len(list_not_null) == len(list_values):
+                values = np.array(list_values, dtype=bool)
+            else:
+                values = np.array([np.nan if v is None else v for v in list_values],
+                                  dtype=object)
+        elif all(isinstance(v, (int, float)) and not isinstance(v, bool)
+                 for v in list_not_null):
+            if (len(list_not_null) == len(list_values)) \
+                    and all(isinstance(v, int) for v in list_values):
+                values = np.array(list_values, dtype=np.int64)
+            else:
+                values = np.array([np.nan if v is None else v for v in list_values],
+                                  dtype=float)
+        else:
+            values = np.array([np.nan if v is None else v for v in list_values],
+                              dtype=object)
+        dict_columns[column] = values
+
+    if table["index"] == list(range(len(table["index"]))):
+        index = pd.RangeIndex(len(table["index"]))
+    else:
+        index = pd.Index(table["index"])
+    return pd.DataFrame(dict_columns, index=index)
+
+
+def read_events_snapshot(snapshot_path):
+    """
+    This is to load the snapshot saved by `compact_job_events()`.
+
+    Returns:
+    -------------
+    table: dict or None
+        See `apply_job_events()`. None if there is no (valid) snapshot.
+    offset: int
+        the position in the event log that the snapshot covers; 0 if no snapshot.
+    """
+    if not op.exists(snapshot_path):
+        return None, 0
+    try:
+        with open(snapshot_path, "r") as f:
+            snapshot = json.load(f)
+    except ValueError:   # e.g., incomplete file; just don't use it
+        return None, 0
+    return snapshot["table"], snapshot["offset"]
+
+
+def read_events_snapshot_offset(snapshot_path):
+    """
+    This is to get the position in the event log that the snapshot covers,
+    without loading the whole snapshot: `compact_job_events()` saves it first.
+
+    Returns:
+    -------------
+    offset: int
+        0 if no (valid) snapshot.
+    """
+    try:
+        with open(snapshot_path, "r") as f:
+            head = f.read(64)
+    except FileNotFoundError:
+        return 0
+    match = re.match(r'\{"offset": ([0-9]+),', head)
+    if match is None:   # e.g., saved in another way; load it all
+        return read_events_snapshot(snapshot_path)[1]
+    return int(match.group(1))
+
+
+def materialize_job_status(events_path, snapshot_path=None, until=None):
+    """
+    This is to get the job status table by replaying the events.
+
+    Parameters:
+    -------------
+    events_path: str
+        path to the event log, i.e., `job_status_events.jsonl`
+    snapshot_path: str or None
+        path to the snapshot saved by `compact_job_events()`.
+        If provided (and `until` is None), only events after the snapshot are replayed.
+    until: float or None
+        unix timestamp. If provided, get the table at this time,
+        by replaying events from the beginning.
+
+    Returns:
+    -------------
+    df: pd.DataFrame or None
+        the job status table; None if there was no job status table at that time.
+    """
+    table, offset = None, 0
+    if (snapshot_path is not None) and (until is None):
+        table, offset = read_events_snapshot(snapshot_path)
+    list_events, _ = read_job_events(events_path, offset)
+    table = apply_job_events(table, list_events, until)
+    if table is None:
+        return None
+    return table_to_dataframe(table)
+
+
+def compact_job_events(events_path, snapshot_path):
+    """
+    This is to save the job status table materialized from the event log into a snapshot,
+    so that loading the current table only needs to replay events after the snapshot.
+    The event log itself is kept as it is, so the history is not lost.
+    The snapshot is replaced atomically, and only complete events are used,
+    so this can run without the lock, e.g., in the background.
+
+    Parameters:
+    -------------
+    events_path: str
+        path to the event log, i.e., `job_status_events.jsonl`
+    snapshot_path: str
+        path to the snapshot, i.e., `job_status_events_snapshot.json`
+
+    Returns:
+    -------------
+    offset: int
+        the position in the event log that the new snapshot covers
+    """
+    table, offset = read_events_snapshot(snapshot_path)
+    list_events, offset_end = read_job_events(events_path, offset)
+    if len(list_events) == 0:
+        return offset
+    table = apply_job_events(table, list_events)
+
+    temp_path = snapshot_path + ".tmp." + str(os.getpid())
+    with open(temp_path, "w") as f:
+        json.dump({"offset": offset_end, "time": list_events[-1]["time"], "table": table}, f)
+    os.replace(temp_path, snapshot_path)
+    return offset_end
@@ -0,0 +1,136 @@
+# This is the read-only view of the job status table, from `BABS.snapshot()`,
+#   e.g., for dashboards and downstream pipelines, instead of parsing `job_status.csv`.
+#   - It's loaded without the lock of the job status table, so it doesn't block
+#       (and isn't blocked by) `babs-submit` or `babs-status`;
+#   - it's consistent: it's one complete version of the table, see `read_consistent()`
+#       in `job_status_store.py`;
+#   - it's immutable: values are kept in read-only arrays, and `to_frame()` returns a copy.
+# It doesn't check the job queue, output RIA or log files,
+#   i.e., it's the job status as of the last `babs-submit` or `babs-status`.
+
+import time
+import types
+from datetime import datetime
+import pandas as pd
+
+from babs.utils import get_job_status_summary
+from babs.job_selection import get_job_states
+
+
+class JobStatusSnapshot():
+    """
+    This class is a read-only view of the job status table at one version.
+    """
+
+    def __init__(self, df, version, type_session):
+        """
+        Parameters:
+        -------------
+        df: pd.DataFrame
+            the job status table, e.g., from `JobStatusStore.read_consistent()`.
+            It's copied.
+        version: int or str
+            version of the table, see `JobStatusStore.get_version()`
+        type_session: str
+            'single-ses' or 'multi-ses'
+
+        Attributes:
+        -------------
+        version: int or str
+            version of the table
+        time_loaded: float
+            unix timestamp when the table was loaded
+        type_session: str
+            'single-ses' or 'multi-ses'
+        columns: list of str
+            columns of the job status table
+        index: pd.Index
+            index of the job status table
+        """
+        dict_arrays = {}
+        for column in df.columns:
+            values = df[column].to_numpy(copy=True)
+            values.flags.writeable = False
+            dict_arrays[column] = values
+        attributes = {"version": version,
+                      "time_loaded": time.time(),
+                      "type_session": type_session,
+                      "columns": tuple(df.columns),
+                      "index": df.index.copy(),
+                      "dict_arrays": types.MappingProxyType(dict_arrays)}
+        for name, value in attributes.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("`JobStatusSnapshot` is read-only.")
+
+    def __len__(self):
+        return len(self.index)
+
+    def to_frame(self, columns=None):
+        """
+        This is to get the job status table, as loaded from `job_status.csv`.
+
+        Parameters:
+        -------------
+        columns: list of str or None
+            columns to get; None for all columns
+
+        Returns:
+        -----------
+        df: pd.DataFrame
+            a new dataframe, so changing it won't change the snapshot
+        """
+        if columns is None:
+            columns = self.columns
+        return pd.DataFrame({column: self.dict_arrays[column].copy() for column in columns},
+                            index=self.index.copy())
+
+    def get_states(self):
+        """
+        This is to get the state of each job, see `JOB_STATES` in `job_selection.py`.
+
+        Returns:
+        -----------
+        states: pd.Series of str
+        """
+        return get_job_states(self.to_frame(["has_submitted", "is_done", "is_failed",
+                                             "job_state_code"]))
+
+    def get_summary(self):
+        """
+        This is to summarize the job status, see `get_job_status_summary()` in `utils.py`.
+        """
+        return get_job_status_summary(self.to_frame())
+
+    def to_json_dict(self, include_jobs=True):
+        """
+        This is to get the job status as a dict that can be saved in JSON,
+        e.g., for `babs-status --json`.
+
+        Parameters:
+        -------------
+        include_jobs: bool
+            whether to include the record of each job
+
+        Returns:
+        -----------
+        dict_json: dict
+            - 'version': version of the job status table
+            - 'time_loaded': when the table was loaded, in ISO format
+            - 'type_session': 'single-ses' or 'multi-ses'
+            - 'summary': see `get_summary()`
+            - 'jobs' (if `include_jobs`): list of dict, one per job; keys are
+                the columns of the job status table plus 'state'; NaN is saved as null
+        """
+        df = self.to_frame()
+        dict_json = {"version": self.version,
+                     "time_loaded": datetime.fromtimestamp(self.time_loaded).isoformat(),
+                     "type_session": self.type_session,
+                     "summary": get_job_status_summary(df)}
+        if include_jobs:
+            df["state"] = get_job_states(df)
+            # python types (e.g., int instead of np.int64), and None instead of NaN:
+            df = df.astype(object).where(df.notna(), None)
+            dict_json["jobs"] = df.to_dict("records")
+        return dict_json
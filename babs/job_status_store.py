@@ -0,0 +1,954 @@
+# This is to save and load the job status table of a BABS project,
+#   i.e., what `babs-submit` and `babs-status` update.
+# Backends:
+#   - 'csv': `analysis/code/job_status.csv`; the whole file is rewritten for each change.
+#   - 'sqlite': `analysis/code/job_status.sqlite`, in WAL mode;
+#       only changed rows are written, in one transaction;
+#       readers (e.g., dashboards) can query it without taking the lock of BABS.
+#   - 'events': only the append-only event log, `analysis/code/job_status_events.jsonl`;
+#       each change costs one appended line per changed job;
+#       the table is materialized from the log, and compacted into a snapshot
+#       in the background from time to time. See `job_status_events.py`.
+# For all backends, the changes are also appended to the event log,
+#   so the job status table at any past time can be reconstructed, see `read_at()`.
+# If `pyarrow` is installed, a Parquet snapshot of the table, `job_status.parquet`,
+#   is also written next to it when the table is loaded and the snapshot is outdated
+#   (not at each save, so saving a few rows stays fast), and is used to load the table
+#   as long as it's up-to-date. It is columnar and typed, so nothing needs parsing,
+#   and a few columns can be loaded without reading the others, see `read_columns()`.
+# Concurrency: reading never takes the lock, as all backends save the table atomically.
+#   `babs-submit` and `babs-status` can run at the same time: each reads the table
+#   and remembers its version, works without the lock (e.g., submitting jobs, checking logs),
+#   and then saves its changes with `commit()`, which only takes the lock briefly.
+#   If another process has saved the table in the meantime, the changes are merged
+#   into the latest table, see `merge_job_status_changes()`.
+
+import os
+import os.path as op
+import sqlite3
+import threading
+import warnings
+import numpy as np
+import pandas as pd
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:   # optional; without it, there is no Parquet snapshot
+    pa = None
+
+from filelock import FileLock
+
+from babs.utils import (read_job_status_csv,
+                        write_job_status_csv,
+                        get_changed_rows,
+                        add_missing_job_status_columns)
+from babs.constants import JOB_STATUS_LOCK_TIMEOUT
+from babs.job_status_events import (get_job_events,
+                                    append_job_events,
+                                    read_events_snapshot,
+                                    read_events_snapshot_offset,
+                                    read_job_events,
+                                    apply_job_events,
+                                    table_to_dataframe,
+                                    materialize_job_status,
+                                    compact_job_events)
+
+JOB_STATUS_BACKENDS = ["csv", "sqlite", "events"]
+
+# For backend 'events': compact the event log into the snapshot in the background,
+#   when the events after the snapshot are more than this size (in bytes):
+EVENTS_COMPACTION_THRESHOLD = 4 * 1024 * 1024
+
+
+def get_job_status_store(job_status_backend, analysis_path):
+    """
+    This is to get the job status store of a BABS project.
+
+    Parameters:
+    -------------
+    job_status_backend: str
+        'csv', 'sqlite' or 'events'. See key `job_status_backend` in `babs_proj_config.yaml`.
+    analysis_path: str
+        path to the `analysis` folder. One attribute in class `BABS`
+
+    Returns:
+    -------------
+    job_status_store: class `JobStatusStoreCsv`, `JobStatusStoreSqlite`
+        or `JobStatusStoreEvents`
+    """
+    csv_path = op.join(analysis_path, "code", "job_status.csv")
+    if job_status_backend == "csv":
+        return JobStatusStoreCsv(csv_path)
+    elif job_status_backend == "sqlite":
+        return JobStatusStoreSqlite(op.join(analysis_path, "code", "job_status.sqlite"),
+                                    csv_path)
+    elif job_status_backend == "events":
+        return JobStatusStoreEvents(csv_path)
+    else:
+        raise Exception("Invalid `job_status_backend`: '" + str(job_status_backend) + "'."
+                        + " It should be one of: " + ", ".join(JOB_STATUS_BACKENDS))
+
+
+class JobStatusStore():
+    """
+    This class is the interface of job status stores.
+    The job status table is a pd.DataFrame, see `create_job_status_csv()` in `utils.py`.
+    Readers don't need the lock. Writers should either hold the lock at `lock_path`
+    while reading, updating and writing the table, or use `read_with_version()`
+    and `commit()`.
+
+    Subclasses implement `load()` and `save()`; `write()` also appends the changes
+    to the event log as events.
+    """
+
+    def __init__(self, path, csv_path):
+        """
+        Parameters:
+        -------------
+        path: str
+            path to the file where the job status table is saved
+        csv_path: str
+            path to `job_status.csv`. The lock file is next to it, for all backends.
+
+        Attributes:
+        -------------
+        path: str
+            path to the file where the job status table is saved
+        lock_path: str
+            path to the lock file, i.e., `job_status.csv.lock`
+        csv_path: str
+            path to `job_status.csv`
+        events_path: str
+            path to the event log, i.e., `job_status_events.jsonl`
+        snapshot_path: str
+            path to the snapshot of the event log, i.e., `job_status_events_snapshot.json`
+        parquet_path: str
+            path to the Parquet snapshot, i.e., `job_status.parquet`
+        """
+        self.path = path
+        self.lock_path = csv_path + ".lock"
+        self.csv_path = csv_path
+        code_path = op.dirname(csv_path)
+        self.events_path = op.join(code_path, "job_status_events.jsonl")
+        self.snapshot_path = op.join(code_path, "job_status_events_snapshot.json")
+        self.parquet_path = op.join(code_path, "job_status.parquet")
+
+    def exists(self):
+        """
+        Whether the job status table has been created.
+        """
+        return op.exists(self.path)
+
+    def migrate_from_csv(self):
+        """
+        This is to create the job status table from existing `job_status.csv`, e.g.,
+        when the backend of an existing project is changed from 'csv' to another one.
+        The CSV file is renamed to `job_status.csv.migrated` afterwards,
+        so that it won't be mistaken as the current job status.
+        """
+        df = read_job_status_csv(self.csv_path)
+        self.write(df)
+        os.replace(self.csv_path, self.csv_path + ".migrated")
+
+    def read(self):
+        """
+        This is to load the job status table.
+
+        Returns:
+        -----------
+        df: pd.DataFrame
+            the job status table
+        """
+        df = self.read_parquet_snapshot()
+        if df is None:
+            df = self.load_and_write_snapshot()
+        return df
+
+    def load_and_write_snapshot(self):
+        """
+        This is to load the job status table from the backend,
+        when the Parquet snapshot is outdated (or missing),
+        and to save the Parquet snapshot of it, for later reads.
+        The snapshot is saved here, instead of every time the table is saved,
+        so that saving a few changed rows (e.g., with backend 'sqlite') stays fast.
+
+        Returns:
+        -----------
+        df: pd.DataFrame
+            the job status table
+        """
+        # the version is got before loading the table: if the table is saved by another
+        #   process in between, the snapshot is labelled with the older version,
+        #   so it just won't be used:
+        version = self.get_version()
+        df = self.load()
+        if pa is not None:
+            try:
+                write_parquet_snapshot(df, self.parquet_path, version)
+            except (OSError, pa.ArrowException) as e:
+                # an outdated snapshot just won't be used:
+                warnings.warn("Failed to save the Parquet snapshot of the job status table: "
+                              + str(e))
+        return df
+
+    def read_with_version(self):
+        """
+        This is to load the job status table, together with its version,
+        to save the changes with `commit()` later.
+        The version is got before loading the table, so if the table is saved by another
+        process in between, it's treated as changed (i.e., the changes will be merged).
+
+        Returns:
+        -----------
+        df: pd.DataFrame
+            the job status table
+        version: int or str
+            see `get_version()`
+        """
+        version = self.get_version()
+        return self.read(), version
+
+    def read_consistent(self, max_tries=5):
+        """
+        This is to load the job status table without the lock, e.g., for read-only views,
+        together with the version that the loaded table is at.
+        Saving the table is atomic, so the loaded table is always a complete version;
+        if it was saved by another process while loading, it's loaded again,
+        so that the version matches the loaded table.
+
+        Parameters:
+        -------------
+        max_tries: int
+            maximum times to load the table, if it keeps being saved while loading
+
+        Returns:
+        -----------
+        df: pd.DataFrame
+            the job status table
+        version: int or str
+            see `get_version()`. If the table was still being saved after `max_tries`,
+            it's the version before the last load, i.e., the table may be newer.
+        """
+        for _ in range(max_tries):
+            version = self.get_version()
+            df = self.read()
+            if self.get_version() == version:
+                break
+        return df, version
+
+    def commit(self, df, list_index_changed, df_old_rows, version_base,
+               timeout=JOB_STATUS_LOCK_TIMEOUT):
+        """
+        This is to save changes made to the job status table read at `version_base`,
+        without holding the lock while the changes were made (optimistic concurrency).
+        The lock is only taken here. If the table has not been saved since `version_base`,
+        `df` is saved as it is; otherwise, the changes are merged into the latest table,
+        see `merge_job_status_changes()`.
+
+        Parameters:
+        -------------
+        df: pd.DataFrame
+            the whole job status table, after changes
+        list_index_changed: list
+            indices of changed rows
+        df_old_rows: pd.DataFrame
+            values of these changed rows before the changes,
+            e.g., from `JobStatusTable.get_changes()`
+        version_base: int or str
+            version of the table that the changes were made to,
+            e.g., from `read_with_version()`
+        timeout: float
+            max time (in seconds) to wait for the lock
+
+        Returns:
+        -----------
+        df_saved: pd.DataFrame
+            the job status table saved; it's `df` itself if there is nothing to merge
+        version: int or str
+            version of the saved table
+        list_index_conflict: list
+            indices of rows whose changes were not (all) saved,
+            as these rows were changed by another process, see `merge_job_status_changes()`
+
+        Raises:
+        -----------
+        filelock.Timeout
+            if the lock can't be acquired in `timeout` seconds
+        """
+        lock = FileLock(self.lock_path)
+        with lock.acquire(timeout=timeout):
+            if self.get_version() == version_base:
+                df_saved = df
+                list_index_conflict = []
+                self.write(df, list_index_changed, df_old_rows)
+            else:   # saved by another process in the meantime:
+                df_current = self.read_parquet_snapshot()
+                if df_current is None:   # not to save the snapshot while holding the lock
+                    df_current = self.load()
+                df_saved, list_index_merged, list_index_conflict = \
+                    merge_job_status_changes(df_current, df, list_index_changed, df_old_rows)
+                self.write(df_saved, list_index_merged, df_current.loc[list_index_merged])
+            version = self.get_version()
+        return df_saved, version, list_index_conflict
+
+    def write(self, df, list_index_changed=None, df_old_rows=None):
+        """
+        This is to save the job status table,
+        and to append the changes to the event log.
+
+        Parameters:
+        -------------
+        df: pd.DataFrame
+            the whole job status table, after changes
+        list_index_changed: list or None
+            indices of rows that have been changed since it was read.
+            If None, the whole table is saved.
+            A backend may still save the whole table.
+        df_old_rows: pd.DataFrame or None
+            values of these changed rows before the changes,
+            e.g., from `JobStatusTable.get_changes()`.
+            If None, the changes are found by comparing with the event log.
+        """
+        if (df_old_rows is not None) and (list_index_changed is None):
+            list_index_changed = list(df_old_rows.index)
+        # `df_old`: the table before changes (only its changed rows are used):
+        df_old = df_old_rows
+        if op.exists(self.events_path):
+            if df_old is None:   # e.g., the whole table is rewritten:
+                df_old = materialize_job_status(self.events_path, self.snapshot_path)
+        elif df_old is not None:
+            # the table was created before the event log was introduced;
+            #   start the event log with the table before changes:
+            df_old_full = pd.concat([df.drop(index=df_old_rows.index), df_old_rows]) \
+                .loc[df.index]
+            append_job_events(self.events_path, get_job_events(None, df_old_full, None))
+
+        if df_old is None:
+            list_events = get_job_events(None, df, None)
+        else:
+            if list_index_changed is None:
+                list_index_changed = get_changed_rows(df_old, df)
+            list_events = get_job_events(df_old, df, list_index_changed)
+        append_job_events(self.events_path, list_events)
+
+        self.save(df, list_index_changed if df_old is not None else None)
+        # ^^ the Parquet snapshot is now outdated; it's saved again at next read,
+        #   see `load_and_write_snapshot()`
+
+    def read_columns(self, columns):
+        """
+        This is to load only some columns of the job status table, e.g., for reporting.
+        If the Parquet snapshot is up-to-date, only these columns are loaded from it;
+        otherwise the whole table is loaded from the backend.
+
+        Parameters:
+        -------------
+        columns: list of str
+            columns to load. Columns that are not in the table are ignored.
+
+        Returns:
+        -----------
+        df: pd.DataFrame
+            the job status table with only these columns
+        """
+        df = self.read_parquet_snapshot(columns)
+        if df is not None:
+            return df
+        df = self.load_and_write_snapshot()
+        return df[[column for column in columns if column in df.columns]]
+
+    def read_parquet_snapshot(self, columns=None):
+        """
+        This is to load the job status table (or some columns) from the Parquet snapshot,
+        if `pyarrow` is installed and the snapshot is up-to-date.
+
+        Returns:
+        -----------
+        df: pd.DataFrame or None
+            None if the snapshot cannot be used.
+        """
+        if (pa is None) or (not op.exists(self.parquet_path)):
+            return None
+        try:
+            return read_parquet_snapshot(self.parquet_path, columns, self.get_version())
+        except (OSError, pa.ArrowException):   # e.g., written by an older version of pyarrow
+            return None
+
+    def read_at(self, time_until):
+        """
+        This is to reconstruct the job status table at a past time, from the event log.
+
+        Parameters:
+        -------------
+        time_until: float
+            unix timestamp
+
+        Returns:
+        -----------
+        df: pd.DataFrame or None
+            the job status table at that time;
+            None if the table had not been created (or logged) then.
+        """
+        return materialize_job_status(self.events_path, until=time_until)
+
+    def load(self):
+        """
+        This is to load the job status table from the backend. See `read()`.
+        """
+        raise NotImplementedError()
+
+    def save(self, df, list_index_changed=None):
+        """
+        This is to save the job status table to the backend. See `write()`.
+        """
+        raise NotImplementedError()
+
+    def get_version(self):
+        """
+        This is to get the version of the saved job status table,
+        which changes every time the table is saved.
+        This is used to check if the table was changed by another process,
+        e.g., in `babs-status --watch`.
+        """
+        raise NotImplementedError()
+
+
+class JobStatusStoreCsv(JobStatusStore):
+    """
+    Job status table saved in `job_status.csv`.
+    The whole file is replaced every time the table is saved.
+    A counter in `job_status.csv.version` is increased every time the table is saved,
+    see `get_version()`.
+    """
+
+    def __init__(self, csv_path):
+        super().__init__(csv_path, csv_path)
+        self.version_path = csv_path + ".version"
+
+    def load(self):
+        return read_job_status_csv(self.path)
+
+    def save(self, df, list_index_changed=None):
+        write_job_status_csv(df, self.path)
+        # the counter is increased after the table is replaced, so a version read
+        #   together with the table is never newer than the table:
+        write_version_counter(self.version_path, read_version_counter(self.version_path) + 1)
+
+    def get_version(self):
+        # The modification time alone is not enough: on filesystems with coarse timestamps
+        #   (e.g., 1 s on ext3 and many NFS setups), two saves can get the same one.
+        #   The counter changes on every save by BABS; the inode (the file is replaced),
+        #   modification time and size also catch changes made without the counter,
+        #   e.g., by an older version of BABS:
+        counter = read_version_counter(self.version_path)
+        stat = os.stat(self.path)
+        return "-".join(str(x) for x in [counter, stat.st_ino, stat.st_mtime_ns, stat.st_size])
+
+
+class JobStatusStoreSqlite(JobStatusStore):
+    """
+    Job status table saved in an SQLite database, `job_status.sqlite`.
+
+    Tables in the database:
+    - `job_status`: one row per job; column `row_index` is the index of the row
+        in the pd.DataFrame; other columns are the same as in the pd.DataFrame.
+        There are indexes on (sub_id, ses_id) and job_id.
+    - `job_status_columns`: the columns of the pd.DataFrame in order,
+        and the kind of values in each column, so the pd.DataFrame can be restored;
+        see `get_column_kind()`.
+    - `job_status_meta`: 'version' of the table, increased every time the table is saved.
+
+    The database is in WAL mode, so it can be read while BABS is writing to it,
+    e.g., `sqlite3 job_status.sqlite "SELECT sub_id, job_id FROM job_status WHERE is_done = 1"`.
+    """
+
+    def __init__(self, db_path, csv_path):
+        super().__init__(db_path, csv_path)
+
+    def connect(self):
+        """
+        This is to connect to the database.
+
+        Returns:
+        -----------
+        conn: sqlite3.Connection
+        """
+        conn = sqlite3.connect(self.path, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self):
+        conn = self.connect()
+        try:
+            list_columns = conn.execute(
+                "SELECT name, kind FROM job_status_columns ORDER BY position").fetchall()
+            cursor = conn.execute(
+                "SELECT row_index, " + ", ".join(quote(name) for name, _ in list_columns)
+                + " FROM job_status ORDER BY row_index")
+            list_rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        list_row_index = [row[0] for row in list_rows]
+        if list_row_index == list(range(len(list_rows))):
+            index = pd.RangeIndex(len(list_rows))
+        else:
+            index = pd.Index(list_row_index)
+
+        dict_columns = {}
+        for i_col, (name, kind) in enumerate(list_columns):
+            dict_columns[name] = from_sql_values([row[i_col + 1] for row in list_rows], kind)
+        return pd.DataFrame(dict_columns, index=index)
+
+    def save(self, df, list_index_changed=None):
+        list_names = list(df.columns)
+        list_kinds = [get_column_kind(df[name]) for name in list_names]
+
+        conn = self.connect()
+        try:
+            with conn:   # one transaction
+                list_names_added = self.create_tables(conn, list_names)
+                if len(list_names_added) > 0:
+                    # e.g., a column introduced by a newer BABS: existing rows are NULL
+                    #   in the new columns, so the whole table is saved:
+                    list_index_changed = None
+                conn.execute("DELETE FROM job_status_columns")
+                conn.executemany(
+                    "INSERT INTO job_status_columns (position, name, kind) VALUES (?, ?, ?)",
+                    [(i, name, kind) for i, (name, kind) in enumerate(zip(list_names,
+                                                                           list_kinds))])
+
+                if list_index_changed is None:   # the whole table:
+                    df_rows = df
+                    conn.execute("DELETE FROM job_status")
+                    sql = "INSERT INTO job_status (row_index, " \
+                        + ", ".join(quote(name) for name in list_names) + ") VALUES (?, " \
+                        + ", ".join("?" for _ in list_names) + ")"
+                else:   # only the changed rows:
+                    df_rows = df.loc[list_index_changed]
+                    sql = "UPDATE job_status SET " \
+                        + ", ".join(quote(name) + " = ?" for name in list_names) \
+                        + " WHERE row_index = ?"
+
+                list_values = [to_sql_values(df_rows[name], kind)
+                               for name, kind in zip(list_names, list_kinds)]
+                list_row_index = [int(i) for i in df_rows.index]
+                if list_index_changed is None:
+                    conn.executemany(sql, zip(list_row_index, *list_values))
+                else:
+                    conn.executemany(sql, zip(*list_values, list_row_index))
+
+                conn.execute("INSERT OR IGNORE INTO job_status_meta (key, value)"
+                             + " VALUES ('version', 0)")
+                conn.execute("UPDATE job_status_meta SET value = value + 1"
+                             + " WHERE key = 'version'")
+        finally:
+            conn.close()
+
+    def create_tables(self, conn, list_names):
+        """
+        This is to create the tables and indexes if they don't exist,
+        and to add columns that are not in table `job_status` yet.
+
+        Parameters:
+        -------------
+        conn: sqlite3.Connection
+        list_names: list of str
+            columns of the job status table
+
+        Returns:
+        -----------
+        list_names_added: list of str
+            columns added to an existing table `job_status` with rows;
+            their values in the existing rows are NULL
+        """
+        conn.execute("CREATE TABLE IF NOT EXISTS job_status (row_index INTEGER PRIMARY KEY)")
+        conn.execute("CREATE TABLE IF NOT EXISTS job_status_columns"
+                     + " (position INTEGER PRIMARY KEY, name TEXT, kind TEXT)")
+        conn.execute("CREATE TABLE IF NOT EXISTS job_status_meta"
+                     + " (key TEXT PRIMARY KEY, value INTEGER)")
+
+        # columns without declared type, so values are saved as they are:
+        list_existing = [row[1] for row in conn.execute("PRAGMA table_info(job_status)")]
+        list_names_added = []
+        for name in list_names:
+            if name not in list_existing:
+                conn.execute("ALTER TABLE job_status ADD COLUMN " + quote(name))
+                list_names_added.append(name)
+        if (len(list_names_added) > 0) and \
+                (conn.execute("SELECT 1 FROM job_status LIMIT 1").fetchone() is None):
+            list_names_added = []   # no rows yet
+
+        if "ses_id" in list_names:
+            conn.execute("CREATE INDEX IF NOT EXISTS job_status_sub_ses"
+                         + " ON job_status (sub_id, ses_id)")
+        else:
+            conn.execute("CREATE INDEX IF NOT EXISTS job_status_sub"
+                         + " ON job_status (sub_id)")
+        if "job_id" in list_names:
+            conn.execute("CREATE INDEX IF NOT EXISTS job_status_job_id"
+                         + " ON job_status (job_id)")
+
+        return list_names_added
+
+    def get_version(self):
+        conn = self.connect()
+        try:
+            row = conn.execute(
+                "SELECT value FROM job_status_meta WHERE key = 'version'").fetchone()
+        finally:
+            conn.close()
+        return row[0]
+
+
+class JobStatusStoreEvents(JobStatusStore):
+    """
+    Job status table saved only as the event log, `job_status_events.jsonl`.
+    Saving the table only appends the events of changed jobs (done in `write()`).
+    Loading the table loads the latest snapshot, `job_status_events_snapshot.json`,
+    and replays the events after it.
+    When the events after the snapshot grow larger than `EVENTS_COMPACTION_THRESHOLD`,
+    a new snapshot is made in a background thread.
+    """
+
+    def __init__(self, csv_path):
+        super().__init__(op.join(op.dirname(csv_path), "job_status_events.jsonl"), csv_path)
+        self.snapshot_offset = 0
+        self.compaction_thread = None
+
+    def load(self):
+        table, offset = read_events_snapshot(self.snapshot_path)
+        self.snapshot_offset = offset
+        list_events, _ = read_job_events(self.events_path, offset)
+        return table_to_dataframe(apply_job_events(table, list_events))
+
+    def save(self, df, list_index_changed=None):
+        # events have been appended in `write()`; only compact if needed:
+        size = os.path.getsize(self.events_path)
+        if size - self.snapshot_offset > EVENTS_COMPACTION_THRESHOLD:
+            # `load()` may not have run (e.g., the table was read from the Parquet snapshot),
+            #   or the snapshot may have been compacted by another process since then:
+            self.snapshot_offset = max(self.snapshot_offset,
+                                       read_events_snapshot_offset(self.snapshot_path))
+            if size - self.snapshot_offset > EVENTS_COMPACTION_THRESHOLD:
+                self.compact(background=True)
+
+    def compact(self, background=False):
+        """
+        This is to compact the event log into the snapshot.
+        This does not need the lock, see `compact_job_events()`.
+
+        Parameters:
+        -------------
+        background: bool
+            whether to run it in a background thread.
+            The thread is not a daemon, so the program waits for it before exiting.
+        """
+        if (self.compaction_thread is not None) and self.compaction_thread.is_alive():
+            return
+        if background:
+            self.compaction_thread = threading.Thread(target=self.compact_snapshot)
+            self.compaction_thread.start()
+        else:
+            self.compact_snapshot()
+
+    def compact_snapshot(self):
+        self.snapshot_offset = compact_job_events(self.events_path, self.snapshot_path)
+
+    def get_version(self):
+        # the event log only grows:
+        return os.stat(self.events_path).st_size
+
+
+def read_version_counter(version_path):
+    """
+    This is to read the counter of saves of the job status table,
+    see `JobStatusStoreCsv.get_version()`.
+
+    Parameters:
+    -------------
+    version_path: str
+        path to the counter file, i.e., `job_status.csv.version`
+
+    Returns:
+    -----------
+    counter: int
+        0 if the counter file doesn't exist yet
+    """
+    try:
+        with open(version_path, "r") as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_version_counter(version_path, counter):
+    """
+    This is to save the counter of saves of the job status table.
+    The file is replaced atomically. It should be called with the lock,
+    see `JobStatusStoreCsv.save()`.
+    """
+    temp_path = version_path + ".tmp." + str(os.getpid())
+    with open(temp_path, "w") as f:
+        f.write(str(counter) + "\n")
+    os.replace(temp_path, version_path)
+
+
+def merge_job_status_changes(df_current, df, list_index_changed, df_old_rows):
+    """
+    This is to apply changes made by this process to the latest job status table,
+    which may have been changed by another process, see `JobStatusStore.commit()`.
+    For each changed row:
+    - if the job was (re)submitted by another process (i.e., `job_id` has changed),
+        none of the changes of this row are applied, as they are about the previous job;
+    - otherwise, each changed value is applied, unless the other process
+        has changed it into a different value (then the other process's value is kept).
+
+    Parameters:
+    -------------
+    df_current: pd.DataFrame
+        the latest job status table; it's not changed
+    df: pd.DataFrame
+        the job status table after changes by this process
+    list_index_changed: list
+        indices of rows changed by this process
+    df_old_rows: pd.DataFrame
+        values of these rows before the changes by this process
+
+    Returns:
+    -------------
+    df_merged: pd.DataFrame
+        the latest job status table, with the changes applied
+    list_index_merged: list
+        indices of rows that are changed in `df_merged` compared to `df_current`
+    list_index_conflict: list
+        indices of rows whose changes were not (all) applied
+    """
+    # columns that are not in the latest table yet (e.g., added by a newer BABS):
+    list_columns_new = [column for column in df.columns if column not in df_current.columns]
+    if len(list_columns_new) > 0:
+        df_current = df_current.copy()
+        add_missing_job_status_columns(df_current)   # with their default values
+        df_current = df_current.reindex(columns=list(df_current.columns)
+                                        + [column for column in list_columns_new
+                                           if column not in df_current.columns])
+
+    dict_updates = {}   # key: column; value: dict of index -> new value
+    list_index_conflict = []
+    for i_job in list_index_changed:
+        row_old = df_old_rows.loc[i_job]
+        row_new = df.loc[i_job]
+        row_current = df_current.loc[i_job]
+        if not is_same_value(row_current["job_id"], row_old["job_id"]):
+            list_index_conflict.append(i_job)
+            continue
+        for column in df.columns:
+            if is_same_value(row_new[column], row_old[column]):   # not changed by this process
+                continue
+            if is_same_value(row_current[column], row_old[column]):
+                dict_updates.setdefault(column, {})[i_job] = row_new[column]
+            elif not is_same_value(row_current[column], row_new[column]):
+                if i_job not in list_index_conflict:
+                    list_index_conflict.append(i_job)
+
+    df_merged = df_current.copy()
+    set_index_merged = set()
+    for column, dict_values in dict_updates.items():
+        values = df_merged[column].astype(object)
+        values.loc[list(dict_values.keys())] = list(dict_values.values())
+        df_merged[column] = values.infer_objects()
+        set_index_merged.update(dict_values.keys())
+    list_index_merged = [i for i in df_merged.index if i in set_index_merged]
+
+    return df_merged, list_index_merged, list_index_conflict
+
+
+def is_same_value(value_1, value_2):
+    """
+    Whether two values in the job status table are the same; NaN is the same as NaN.
+    """
+    if pd.isna(value_1) or pd.isna(value_2):
+        return pd.isna(value_1) and pd.isna(value_2)
+    return value_1 == value_2
+
+
+def write_parquet_snapshot(df, parquet_path, version):
+    """
+    This is to save the job status table into a Parquet file.
+    The kind of each column (see `get_column_kind()`) and the version of the table
+    (see `JobStatusStore.get_version()`) are saved in the metadata,
+    so that the columns can be restored with the same dtypes as from `job_status.csv`,
+    and an outdated snapshot won't be used.
+    The file is replaced atomically.
+
+    Parameters:
+    -------------
+    df: pd.DataFrame
+        the job status table
+    parquet_path: str
+        path to the Parquet file, i.e., `job_status.parquet`
+    version: int
+        version of the table in its backend
+    """
+    dict_type = {"bool": pa.bool_(), "int": pa.int64(), "float": pa.float64(),
+                 "bool_nan": pa.bool_(), "object": pa.string()}
+    list_arrays = []
+    list_kinds = []
+    for name in df.columns:
+        kind = get_column_kind(df[name])
+        values = df[name]
+        if (kind == "object") and (pd.api.types.infer_dtype(values, skipna=True) != "string"):
+            # as in `job_status.csv`, values are saved as strings:
+            values = [None if v is None else str(v) for v in to_sql_values(values, kind)]
+        array = pa.array(values, type=dict_type[kind], from_pandas=True)
+        if (kind == "object") and (len(array) > 0) \
+                and (len(array.unique()) * 2 < len(array)):
+            # many repeated strings (e.g., `alert_message`): dictionary-encoded,
+            #   so that each distinct string is only one object after loading:
+            array = array.dictionary_encode()
+        list_arrays.append(array)
+        list_kinds.append(kind)
+
+    table = pa.Table.from_arrays(list_arrays, names=[str(name) for name in df.columns])
+    table = table.replace_schema_metadata({
+        "babs_column_kinds": ",".join(list_kinds),
+        "babs_version": str(version)})
+    temp_path = parquet_path + ".tmp." + str(os.getpid())
+    pq.write_table(table, temp_path)
+    os.replace(temp_path, parquet_path)
+
+
+def read_parquet_snapshot(parquet_path, columns=None, version=None):
+    """
+    This is to load the job status table (or some of its columns)
+    from the Parquet file saved by `write_parquet_snapshot()`.
+
+    Parameters:
+    -------------
+    parquet_path: str
+        path to the Parquet file, i.e., `job_status.parquet`
+    columns: list of str or None
+        columns to load; None for all columns. Columns that are not saved are ignored.
+    version: int or None
+        current version of the table in its backend.
+        If provided, and the snapshot was saved from another version, None is returned.
+
+    Returns:
+    -----------
+    df: pd.DataFrame or None
+    """
+    schema = pq.read_schema(parquet_path)
+    metadata = schema.metadata or {}
+    if (version is not None) and \
+            (metadata.get(b"babs_version", b"").decode() != str(version)):
+        return None
+    dict_kind = dict(zip(schema.names,
+                         metadata.get(b"babs_column_kinds", b"").decode().split(",")))
+    if columns is None:
+        columns = schema.names
+    parquet_file = pq.ParquetFile(parquet_path)
+
+    dict_columns = {}
+    for name in columns:
+        if name not in dict_kind:
+            continue
+        # one column at a time, so that at most one column is held twice in memory:
+        column = parquet_file.read(columns=[name]).column(0)
+        kind = dict_kind[name]
+        if kind in ["bool", "int", "float"]:
+            dict_columns[name] = column.to_numpy()
+        elif pa.types.is_dictionary(column.type):   # see `write_parquet_snapshot()`
+            list_values = [np.array([], dtype=object)]
+            for chunk in column.chunks:
+                # distinct strings, plus NaN for null (index -1):
+                values = np.append(chunk.dictionary.to_numpy(zero_copy_only=False), np.nan)
+                indices = chunk.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+                list_values.append(values[indices])
+            dict_columns[name] = np.concatenate(list_values)
+        else:   # 'bool_nan' or 'object'; null -> NaN:
+            values = column.fill_null(False).to_numpy().astype(object) if kind == "bool_nan" \
+                else column.to_numpy(zero_copy_only=False).astype(object, copy=False)
+            values[column.is_null().to_numpy(zero_copy_only=False)] = np.nan
+            dict_columns[name] = values
+        del column
+    return pd.DataFrame(dict_columns, index=pd.RangeIndex(parquet_file.metadata.num_rows))
+
+
+def quote(name):
+    """
+    To quote a column name in SQL.
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_column_kind(series):
+    """
+    This is to get the kind of values in a column of the job status table,
+    so that the column can be restored with the same dtype after saved in SQLite.
+
+    Parameters:
+    -------------
+    series: pd.Series
+        a column of the job status table
+
+    Returns:
+    -------------
+    kind: str
+        'bool': dtype bool, e.g., 'has_submitted';
+        'int': dtype int, e.g., 'job_id';
+        'float': dtype float, including a column with only NaN;
+        'bool_nan': True, False or NaN (dtype object), e.g., 'is_failed';
+        'object': others, e.g., strings with NaN.
+    """
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return "bool"
+    elif pd.api.types.is_integer_dtype(series.dtype):
+        return "int"
+    elif pd.api.types.is_float_dtype(series.dtype):
+        return "float"
+    if pd.api.types.infer_dtype(series, skipna=True) == "boolean":
+        return "bool_nan"
+    return "object"
+
+
+def to_sql_values(series, kind):
+    """
+    This is to convert a column of the job status table into values to save in SQLite.
+    NaN is saved as NULL.
+    """
+    if kind in ["bool", "int"]:
+        return [int(v) for v in series]
+    elif kind == "float":
+        return [None if np.isnan(v) else float(v) for v in series]
+    elif kind == "bool_nan":
+        return [None if pd.isna(v) else int(v) for v in series]
+    else:   # object:
+        list_values = []
+        for v in series:
+            if isinstance(v, (str, int, float)) and not isinstance(v, bool):
+                list_values.append(None if (isinstance(v, float) and np.isnan(v)) else v)
+            elif pd.isna(v):
+                list_values.append(None)
+            elif isinstance(v, np.generic):
+                list_values.append(v.item())
+            else:
+                list_values.append(str(v))
+        return list_values
+
+
+def from_sql_values(list_values, kind):
+    """
+    This is to convert values loaded from SQLite back to a column of the job status table.
+    See `to_sql_values()`.
+    """
+    if kind == "bool":
+        return np.array(list_values, dtype=bool)
+    elif kind == "int":
+        return np.array(list_values, dtype=np.int64)
+    elif kind == "float":
+        return np.array([np.nan if v is None else v for v in list_values], dtype=float)
+    elif kind == "bool_nan":
+        return np.array([np.nan if v is None else bool(v) for v in list_values], dtype=object)
+    else:   # object:
+        return np.array([np.nan if v is None else v for v in list_values], dtype=object)
@@ -0,0 +1,174 @@
+# This is the cached summary of job status, i.e., `analysis/code/job_status_summary.json`,
+#   for `babs-status --cached`.
+# It's written at the end of every `babs-status` (after the job status is checked),
+#   and includes what `babs-status` printed (see `get_job_status_summary()` in `utils.py`)
+#   and when it was written. Printing it doesn't check the job queue, output RIA
+#   or log files, and doesn't even load the job status table, so it's instant.
+# This module only uses built-in modules, so that it's quick to import.
+
+import os
+import os.path as op
+import json
+import time
+from datetime import datetime, timedelta
+
+from babs.constants import MSG_NO_ALERT_IN_LOGS, JOB_STATUS_SUMMARY_PATH_REL
+
+
+def write_job_status_summary(summary_path, dict_summary, if_keywords_alert, events_path):
+    """
+    This is to save the summary of job status, replacing the file atomically.
+
+    Parameters:
+    -------------
+    summary_path: str
+        path to the cached summary, i.e., `job_status_summary.json`
+    dict_summary: dict
+        from `get_job_status_summary()` in `utils.py`
+    if_keywords_alert: bool
+        whether alert keywords were used in this `babs-status`,
+        i.e., whether to print alert messages
+    events_path: str
+        path to the job event log, i.e., `job_status_events.jsonl`.
+        It should be in the same folder as `summary_path`. Its size is saved,
+        to tell if the job status table has been changed since then,
+        as every change of the table is appended to it.
+    """
+    cache = {"time": time.time(),
+             "events_filename": op.basename(events_path),
+             "events_size": op.getsize(events_path) if op.exists(events_path) else None,
+             "if_keywords_alert": if_keywords_alert,
+             "summary": dict_summary}
+    temp_path = summary_path + ".tmp." + str(os.getpid())
+    with open(temp_path, "w") as f:
+        json.dump(cache, f)
+    os.replace(temp_path, summary_path)
+
+
+def read_job_status_summary(summary_path):
+    """
+    This is to load the summary saved by `write_job_status_summary()`.
+
+    Returns:
+    -----------
+    cache: dict or None
+        keys: 'time', 'events_filename', 'events_size', 'if_keywords_alert', 'summary';
+        None if there is no (valid) cached summary
+    """
+    if not op.exists(summary_path):
+        return None
+    try:
+        with open(summary_path) as f:
+            return json.load(f)
+    except ValueError:
+        return None
+
+
+def report_cached_job_status(analysis_path):
+    """
+    This is to print the cached summary of job status, i.e., `babs-status --cached`,
+    including how old it is.
+
+    Parameters:
+    -------------
+    analysis_path: str
+        path to the analysis folder
+    """
+    summary_path = op.join(analysis_path, JOB_STATUS_SUMMARY_PATH_REL)
+    cache = read_job_status_summary(summary_path)
+    if cache is None:
+        raise Exception("There is no cached job status yet."
+                        + " Please run `babs-status` without `--cached` first.")
+
+    age = timedelta(seconds=round(time.time() - cache["time"]))
+    print("Cached job status, checked by `babs-status` at "
+          + datetime.fromtimestamp(cache["time"]).strftime("%Y-%m-%d %H:%M:%S")
+          + " (" + str(age) + " ago).")
+    events_path = op.join(op.dirname(summary_path), cache["events_filename"])
+    events_size = op.getsize(events_path) if op.exists(events_path) else None
+    if events_size != cache["events_size"]:
+        print("The job status table has been changed since then"
+              + " (e.g., by `babs-submit`, or `babs-status` that was interrupted)."
+              + " Run `babs-status` without `--cached` to get the latest job status.")
+
+    print_job_status_summary(cache["summary"], analysis_path, cache["if_keywords_alert"])
+
+
+def print_job_status_summary(dict_summary, analysis_path, if_keywords_alert):
+    """
+    This is to print the summary of job status.
+    This is used by `report_job_status()` in `utils.py`, and `babs-status --cached`.
+
+    Parameters:
+    -------------
+    dict_summary: dict
+        from `get_job_status_summary()` in `utils.py`
+    analysis_path: str
+        Path to the analysis folder.
+        This is used to generate the folder of log files
+    if_keywords_alert: bool
+        whether alert keywords were used (i.e., `keywords_alert` in the YAML file);
+        if so, alert messages of failed jobs are printed
+    """
+    print('\nJob status:')
+
+    total_jobs = dict_summary["num_jobs"]
+    print('There are in total of ' + str(total_jobs) + ' jobs to complete.')
+
+    total_has_submitted = dict_summary["num_submitted"]
+    print(str(total_has_submitted) + " job(s) have been submitted; "
+          + str(dict_summary["num_not_submitted"]) + " job(s) haven't been submitted.")
+
+    if total_has_submitted > 0:    # there is at least one job submitted
+        total_is_done = dict_summary["num_done"]
+        print("Among submitted jobs,")
+        print(str(total_is_done) + ' job(s) are successfully finished;')
+
+        if total_is_done == total_jobs:
+            print("All jobs are completed!")
+        else:
+            print(str(dict_summary["num_pending"]) + ' job(s) are pending;')
+            print(str(dict_summary["num_running"]) + ' job(s) are running;')
+
+            # TODO: add stalled one
+
+            total_is_failed = dict_summary["num_failed"]
+            print(str(total_is_failed) + ' job(s) are failed.')
+
+            # if there is job failed: print more info by categorizing msg:
+            if total_is_failed > 0:
+                # summarize based on `alert_message` column:
+                list_alert_message = dict_summary["alert_messages"]
+                if if_keywords_alert:
+                    print("\nAmong all failed job(s):")
+                    for item in list_alert_message:
+                        print(str(item["count"]) + " job(s) have alert message: '"
+                              + to_str(item["value"]) + "';")
+
+                # if there is 'no_alert' in 'alert_message', check 'job_account' column:
+                if MSG_NO_ALERT_IN_LOGS in [item["value"] for item in list_alert_message]:
+                    list_job_account = dict_summary["job_accounts"]
+                    if all(item["value"] is None for item in list_job_account):
+                        # if so, 'job_account' was not applied yet:
+                        print("\nFor the failed job(s) that don't have alert keyword in log files,"
+                              + " you may use `--job-account` to get more information"
+                              + " about why they are failed."
+                              + " Note that with `--job-account`,"
+                              + " `babs-status` may take longer time.")
+                    else:
+                        print("\nAmong job(s) that are failed"
+                              + " and don't have alert keyword in log files:")
+                        for item in list_job_account:
+                            print(str(item["count"]) + " job(s) have job account of: '"
+                                  + to_str(item["value"]) + "';")
+
+        print("\nAll log files are located in folder: "
+              + op.join(analysis_path, "logs"))
+
+
+def to_str(value):
+    """
+    This is to print a value in the summary; a missing value is printed as 'nan',
+    as in the job status table.
+    """
+    return "nan" if value is None else str(value)
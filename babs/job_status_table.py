@@ -0,0 +1,425 @@
+# This is the compact in-memory representation of the job status table,
+#   used by `babs-submit` and `babs-status` (and kept between cycles of `babs-status --watch`).
+# Compared to the table loaded from `job_status.csv` (generic object-dtype columns):
+#   - string columns (e.g., `sub_id`, `ses_id`, `job_state_code`, `alert_message`)
+#       are categorical, i.e., each distinct string is saved once,
+#       and each job only keeps an integer code;
+#   - `is_failed` (True, False or unknown) is a nullable boolean;
+#   - timestamps (e.g., `time_submitted`) are float, even if none of them is recorded yet;
+#   - `log_filename` is saved as a pattern shared by all jobs,
+#       e.g., 'toy_${sub_id}_${ses_id}.*${job_id}'
+#       (or 'toy_array.*${job_id}.${task_id}' for tasks of array jobs), filled in when needed;
+#   - values are updated in place with `set()`, which keeps the values of the changed rows
+#       before the first change, instead of copying the whole table.
+# To save the table, or to hand it to code that expects the table loaded from `job_status.csv`,
+#   use `to_frame()`.
+
+import re
+import numpy as np
+import pandas as pd
+
+from babs.utils import get_changed_rows
+from babs.constants import JOB_TIMESTAMP_COLUMNS
+
+# placeholders in the patterns of `log_filename`:
+LOG_FILENAME_PLACEHOLDERS = ["${sub_id}", "${ses_id}", "${job_id}", "${task_id}"]
+# columns of True, False or NaN, saved as nullable boolean:
+NULLABLE_BOOLEAN_COLUMNS = ["is_failed"]
+
+
+class JobStatusTable():
+    """
+    This class is the compact in-memory job status table.
+    """
+
+    def __init__(self, df):
+        """
+        Parameters:
+        -------------
+        df: pd.DataFrame
+            the job status table, e.g., loaded by `JobStatusStore.read()`.
+            It is not changed.
+
+        Attributes:
+        -------------
+        df: pd.DataFrame
+            the compact job status table. It's fine to read it directly,
+            except for column `log_filename`, see `to_frame()`;
+            please change it only with `set()`.
+        list_old_rows: list of pd.DataFrame
+            values of rows before they were changed by `set()` for the first time,
+            since the table was loaded or `reset_changes()` was called
+        set_index_touched: set
+            indices of rows that have been changed by `set()`
+        """
+        dict_columns = {}
+        for column in df.columns:
+            dict_columns[column] = to_compact_column(df[column],
+                                                     column in NULLABLE_BOOLEAN_COLUMNS,
+                                                     column in JOB_TIMESTAMP_COLUMNS)
+        self.df = pd.DataFrame(dict_columns, index=df.index)
+        if "log_filename" in self.df.columns:
+            self.df["log_filename"] = to_log_filename_patterns(self.df, df["log_filename"])
+
+        self.list_old_rows = []
+        self.set_index_touched = set()
+
+    def __len__(self):
+        return self.df.shape[0]
+
+    def set(self, index, column, value):
+        """
+        This is to change values of a column, in place.
+
+        Parameters:
+        -------------
+        index: list or pd.Index
+            indices of rows to change
+        column: str
+            the column to change
+        value: scalar or list-like
+            new value(s); NaN for missing values, as in the table from `job_status.csv`.
+            If list-like, it should have the same length as `index`.
+        """
+        index = list(index)
+        if len(index) == 0:
+            return
+        if np.ndim(value) == 0:
+            values = [value] * len(index)
+        else:
+            values = list(value)
+
+        # keep the values before the first change:
+        list_index_new = [i for i in index if i not in self.set_index_touched]
+        if len(list_index_new) > 0:
+            self.list_old_rows.append(self.df.loc[list_index_new].copy())
+            self.set_index_touched.update(list_index_new)
+
+        if column == "log_filename":
+            values = to_log_filename_patterns(self.df.loc[index],
+                                              pd.Series(values, index=index, dtype=object))
+            values = values.astype(object).tolist()
+        series = self.df[column]
+        if pd.api.types.is_categorical_dtype(series.dtype):
+            list_new_categories = pd.Series(values).dropna().unique()
+            list_new_categories = [v for v in list_new_categories
+                                   if v not in series.cat.categories]
+            if len(list_new_categories) > 0:
+                self.df[column] = series.cat.add_categories(list_new_categories)
+        elif series.dtype == "boolean":
+            values = [pd.NA if pd.isna(v) else bool(v) for v in values]
+        self.df.loc[index, column] = values
+
+    def get_changes(self):
+        """
+        This is to get the rows changed by `set()`.
+
+        Returns:
+        -----------
+        list_index_changed: list
+            indices of rows whose values are different from when they were loaded
+            (or since `reset_changes()`), in the order of the table.
+            A row that was set to the same values is not included.
+        df_old_rows: pd.DataFrame
+            values of these rows before the changes, as from `to_frame()`
+        """
+        if len(self.set_index_touched) == 0:
+            return [], self.to_frame([])
+        df_old = pd.concat(self.list_old_rows)
+        list_index = self.df.index[self.df.index.isin(list(self.set_index_touched))].tolist()
+        df_old = frame_from_compact(df_old.loc[list_index])
+        list_index_changed = get_changed_rows(df_old, self.to_frame(list_index))
+        return list_index_changed, df_old.loc[list_index_changed]
+
+    def reset_changes(self):
+        """
+        This is to forget the changes made so far, e.g., after the table has been saved.
+        """
+        self.list_old_rows = []
+        self.set_index_touched = set()
+
+    def to_frame(self, index=None, columns=None):
+        """
+        This is to get the job status table with the same dtypes as loaded from
+        `job_status.csv`, e.g., to save it.
+
+        Parameters:
+        -------------
+        index: list or None
+            indices of rows to get; None for all rows
+        columns: list or None
+            columns to get; None for all columns
+
+        Returns:
+        -----------
+        df: pd.DataFrame
+            a new dataframe
+        """
+        df = self.df
+        if columns is not None:
+            list_columns = list(columns)
+            if "log_filename" in list_columns:   # needed to fill in the patterns:
+                list_columns += [c for c in ["sub_id", "ses_id", "job_id", "task_id"]
+                                 if (c in df.columns) and (c not in list_columns)]
+            df = df[list_columns]
+        if index is not None:
+            df = df.loc[list(index)]
+        df = frame_from_compact(df)
+        if columns is not None:
+            df = df[list(columns)]
+        return df
+
+    def memory_usage(self):
+        """
+        Returns:
+        -----------
+        num_bytes: int
+            total memory used by the compact table, including the categories
+        """
+        return int(self.df.memory_usage(index=True, deep=True).sum())
+
+
+def to_compact_column(series, is_nullable_boolean=False, is_float=False):
+    """
+    This is to convert a column of the job status table from `job_status.csv`
+    into its compact dtype. See `JobStatusTable`.
+    """
+    if is_nullable_boolean:
+        return series.astype(object).astype("boolean")
+    elif is_float:
+        return series.astype(float)
+    elif pd.api.types.is_bool_dtype(series.dtype) or pd.api.types.is_integer_dtype(series.dtype):
+        return series.copy()
+    elif pd.api.types.is_float_dtype(series.dtype):
+        if series.isna().all():   # e.g., `alert_message` before any job is checked
+            return pd.Series(pd.Categorical([np.nan] * len(series)), index=series.index)
+        return series.copy()
+    elif pd.api.types.infer_dtype(series, skipna=True) == "boolean":   # e.g., `is_failed`
+        return series.astype("boolean")
+    else:
+        return to_categorical(series)
+
+
+def to_categorical(series):
+    """
+    This is to convert a column into categorical, with categories in the order of appearance
+    (i.e., they are not sorted, which is slow for many distinct strings, e.g., `sub_id`).
+    """
+    codes, categories = pd.factorize(series.to_numpy())
+    return pd.Series(pd.Categorical.from_codes(codes, categories), index=series.index)
+
+
+def frame_from_compact(df):
+    """
+    This is to convert the compact job status table (or some rows of it)
+    back to the dtypes as loaded from `job_status.csv`.
+    """
+    dict_columns = {}
+    for column in df.columns:
+        series = df[column]
+        if column == "log_filename":
+            series = from_log_filename_patterns(df)
+        if pd.api.types.is_categorical_dtype(series.dtype):
+            codes = series.cat.codes.to_numpy()
+            if (codes == -1).all():
+                dict_columns[column] = np.full(len(codes), np.nan)
+            else:
+                # categories, plus NaN for code -1:
+                values = np.append(series.cat.categories.to_numpy(dtype=object), np.nan)
+                dict_columns[column] = values[codes]
+        elif series.dtype == "boolean":
+            is_na = series.isna().to_numpy()
+            if is_na.all():
+                dict_columns[column] = np.full(len(series), np.nan)
+            elif not is_na.any():
+                dict_columns[column] = series.to_numpy(dtype=bool)
+            else:
+                values = series.to_numpy(dtype=object)
+                values[is_na] = np.nan
+                dict_columns[column] = values
+        else:
+            dict_columns[column] = series.to_numpy(copy=True)
+    return pd.DataFrame(dict_columns, index=df.index)
+
+
+def to_log_filename_patterns(df, series_log_filename):
+    """
+    This is to convert log filenames (e.g., 'toy_sub-01_ses-A.*1234')
+    into categorical patterns (e.g., 'toy_${sub_id}_${ses_id}.*${job_id}').
+    The pattern of the first log filename is tried on all rows at once;
+    rows that don't follow it (if any) get their own patterns.
+
+    Parameters:
+    -------------
+    df: pd.DataFrame
+        the (compact) job status table, or rows of it; columns 'sub_id', ('ses_id',)
+        'job_id' (and 'task_id') are used. Its index should be the same as `series_log_filename`.
+    series_log_filename: pd.Series
+        log filenames; NaN if the job hasn't been submitted
+
+    Returns:
+    -----------
+    patterns: pd.Series of category
+    """
+    log_filename = series_log_filename.astype(object).to_numpy()
+    patterns = np.full(len(log_filename), np.nan, dtype=object)
+    remaining = ~pd.isna(log_filename)
+
+    if remaining.any():
+        # try the pattern of the first log filename on all rows:
+        pattern = get_log_filename_pattern(df.iloc[np.flatnonzero(remaining)[0]],
+                                           log_filename[remaining][0])
+        is_match = fill_log_filename_pattern(pattern, df[remaining]).to_numpy() \
+            == log_filename[remaining]
+        index_match = np.flatnonzero(remaining)[is_match]
+        patterns[index_match] = pattern
+        remaining[index_match] = False
+
+    for i in np.flatnonzero(remaining):   # others, one by one:
+        patterns[i] = get_log_filename_pattern(df.iloc[i], log_filename[i])
+
+    return to_categorical(pd.Series(patterns, index=series_log_filename.index))
+
+
+def get_log_filename_pattern(row, log_filename):
+    """
+    This is to get the pattern of one log filename, see `to_log_filename_patterns()`.
+
+    Parameters:
+    -------------
+    row: pd.Series
+        the row of the job in the job status table
+    log_filename: str
+        log filename of the job
+
+    Returns:
+    -----------
+    pattern: str
+        If the pattern can't be filled in back to `log_filename`,
+        `log_filename` itself is used as the pattern.
+    """
+    pattern = str(log_filename)
+    suffix = ".*" + str(row["job_id"])
+    if ("task_id" in row.index) and (row["task_id"] > 0):   # a task of an array job:
+        if pattern.endswith(suffix + "." + str(row["task_id"])):
+            pattern = pattern[:-len(suffix + "." + str(row["task_id"]))] \
+                + ".*${job_id}.${task_id}"
+    elif pattern.endswith(suffix):
+        pattern = pattern[:-len(suffix)] + ".*${job_id}"
+    pattern = pattern.replace(str(row["sub_id"]), "${sub_id}")
+    if "ses_id" in row.index:
+        pattern = pattern.replace(str(row["ses_id"]), "${ses_id}")
+
+    if fill_log_filename_pattern(pattern, row.to_frame().T).iloc[0] != log_filename:
+        return log_filename
+    return pattern
+
+
+def fill_log_filename_pattern(pattern, df):
+    """
+    This is to fill in the pattern of log filename for rows in `df`, all at once.
+
+    Returns:
+    -----------
+    log_filename: pd.Series of str
+    """
+    log_filename = np.full(df.shape[0], "", dtype=object)
+    for piece in re.split("(" + "|".join(re.escape(p) for p in LOG_FILENAME_PLACEHOLDERS)
+                          + ")", pattern):
+        if piece in LOG_FILENAME_PLACEHOLDERS:
+            log_filename = log_filename + get_str_values(df[piece[2:-1]])
+        elif piece != "":
+            log_filename = log_filename + piece
+    return pd.Series(log_filename, index=df.index, dtype=object)
+
+
+def get_str_values(series):
+    """
+    This is to convert a column into strings, e.g., to fill in the pattern of log filename.
+    For a categorical column, only the categories are converted.
+
+    Returns:
+    -----------
+    values: np.array of str
+    """
+    if pd.api.types.is_categorical_dtype(series.dtype):
+        categories = series.cat.categories
+        if pd.api.types.infer_dtype(categories) != "string":
+            categories = categories.astype(str)
+        categories = np.append(categories.to_numpy(dtype=object), "nan")
+        return categories[series.cat.codes.to_numpy()]
+    return np.array(list(map(str, series.tolist())), dtype=object)
+
+
+def from_log_filename_patterns(df):
+    """
+    This is to fill in the patterns in column 'log_filename' of the compact table
+    (or rows of it), see `to_log_filename_patterns()`.
+
+    Returns:
+    -----------
+    log_filename: pd.Series of object; NaN if there is no log filename
+    """
+    patterns = df["log_filename"]
+    log_filename = pd.Series(np.nan, index=df.index, dtype=object)
+    for pattern in patterns.dropna().unique():
+        is_pattern = (patterns == pattern).to_numpy()
+        log_filename[is_pattern] = fill_log_filename_pattern(pattern, df[is_pattern]).to_numpy()
+    return log_filename
+
+
+def build_job_key_index(df_job, type_session):
+    """
+    This is to build the hash index of the job status table on (sub_id, ses_id),
+    so that a job can be found with one lookup, instead of comparing with all rows.
+
+    Parameters:
+    -------------
+    df_job: pd.DataFrame
+        the job status table, or only its columns 'sub_id' (and 'ses_id', if multi-ses)
+    type_session: str
+        'single-ses' or 'multi-ses'
+
+    Returns:
+    -----------
+    job_key_index: dict
+        key: (sub_id, ses_id), where ses_id is None for single-ses;
+        value: index of the row. If a key is in more than one row, the first one is used.
+    """
+    list_keys = get_job_keys(df_job, type_session)
+    job_key_index = {}
+    for key, i_job in zip(list_keys, df_job.index):
+        job_key_index.setdefault(key, i_job)
+    return job_key_index
+
+
+def find_job_keys(job_key_index, df_job_specific, type_session):
+    """
+    This is to find the rows of requested jobs with the hash index.
+
+    Parameters:
+    -------------
+    job_key_index: dict
+        from `build_job_key_index()`
+    df_job_specific: pd.DataFrame
+        list of requested jobs; columns: 'sub_id' (and 'ses_id', if multi-ses)
+    type_session: str
+        'single-ses' or 'multi-ses'
+
+    Returns:
+    -----------
+    list_index: list
+        index of the row of each requested job; None if it's not in the index
+    """
+    return [job_key_index.get(key) for key in get_job_keys(df_job_specific, type_session)]
+
+
+def get_job_keys(df, type_session):
+    """
+    This is to get the keys of jobs, i.e., (sub_id, ses_id); ses_id is None for single-ses.
+    """
+    if type_session == "single-ses":
+        list_ses = [None] * df.shape[0]
+    elif type_session == "multi-ses":
+        list_ses = df["ses_id"].tolist()
+    return list(zip(df["sub_id"].tolist(), list_ses))
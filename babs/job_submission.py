@@ -0,0 +1,177 @@
+# This is to submit many jobs in parallel, e.g., for `babs-submit` and resubmissions
+#   in `babs-status`, instead of one job submission command (e.g., `qsub`) after another:
+#   - a bounded pool of threads: at most `jobs` submission commands are running at a time;
+#   - a token bucket: at most `rate` submission commands are started per second
+#       (with bursts of up to `burst`), so that the job scheduler won't be flooded,
+#       and the limits can be tuned for each cluster;
+#   - each job is reported (`on_submitted`) as soon as its submission completes,
+#       so the caller can record its job ID right away;
+#   - if a submission failed, no more submissions are started, and the jobs
+#       that have been submitted are still returned, so their job IDs are not lost.
+
+import threading
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from babs.utils import submit_one_job
+from babs.submit_job_template import get_submit_job_template
+
+
+class TokenBucket():
+    """
+    This class limits how many actions can be started per second, across threads.
+    """
+
+    def __init__(self, rate, burst=1):
+        """
+        Parameters:
+        -------------
+        rate: float
+            number of tokens added per second, i.e., the long-term max rate of actions
+        burst: int
+            max number of tokens in the bucket, i.e., max number of actions
+            that can be started at once after a pause
+
+        Attributes:
+        -------------
+        tokens: float
+            number of tokens in the bucket now; it's full at first
+        time_last: float
+            when `tokens` was updated, from `time.monotonic()`
+        """
+        if rate <= 0:
+            raise Exception("The rate of the token bucket should be positive!")
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.time_last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        This is to take one token from the bucket, waiting until there is one.
+        """
+        while True:
+            with self.lock:
+                time_now = time.monotonic()
+                self.tokens = min(self.burst,
+                                  self.tokens + (time_now - self.time_last) * self.rate)
+                self.time_last = time_now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                time_wait = (1 - self.tokens) / self.rate
+            time.sleep(time_wait)
+
+
+def submit_jobs(analysis_path, type_session, list_sub_ses, jobs=1, rate=None, burst=None,
+                flag_print_message=True, on_submitted=None):
+    """
+    This is to submit many jobs, using at most `jobs` threads in parallel,
+    and starting at most `rate` submissions per second.
+
+    Parameters:
+    ----------------
+    analysis_path: str
+        path to the `analysis` folder. One attribute in class `BABS`
+    type_session: str
+        multi-ses or single-ses
+    list_sub_ses: list of tuple
+        each element: (sub, ses) of one job; `ses` is None for single-ses
+    jobs: int
+        max number of jobs to submit in parallel
+    rate: float or None
+        max number of submissions started per second; None for no limit
+    burst: int or None
+        max number of submissions started at once, within the limit of `rate`;
+        None for the same as `jobs`
+    flag_print_message: bool
+        to print a message for each submitted job (True) or not (False).
+        Messages are printed in the order of `list_sub_ses`, after all submissions.
+    on_submitted: callable or None
+        called as `on_submitted(i, result)` in the calling thread,
+        as soon as the submission of `list_sub_ses[i]` completes,
+        where `result` is (job_id, job_id_str, log_filename), see `submit_one_job()`
+
+    Returns:
+    ------------------
+    list_results: list of tuple or None
+        (job_id, job_id_str, log_filename) of each job, in the order of `list_sub_ses`;
+        None if the job was not submitted, i.e., its submission failed,
+        or it was not started after another one failed
+    list_errors: list of str
+        error messages of failed submissions; empty if all were submitted
+    """
+    list_results = [None] * len(list_sub_ses)
+    list_errors = []
+    if len(list_sub_ses) == 0:
+        return list_results, list_errors
+
+    # The compiled job submission template, shared by all threads:
+    template = get_submit_job_template(analysis_path)
+    token_bucket = None
+    if rate is not None:
+        token_bucket = TokenBucket(rate, burst if burst is not None else jobs)
+    event_stop = threading.Event()   # set after a submission failed
+
+    def submit_job(sub_ses):
+        if event_stop.is_set():
+            return None
+        if token_bucket is not None:
+            token_bucket.acquire()
+            if event_stop.is_set():   # in case it failed while waiting
+                return None
+        try:
+            return submit_one_job(analysis_path, type_session, sub_ses[0], sub_ses[1],
+                                  flag_print_message=False, template=template)
+        except (subprocess.CalledProcessError, OSError, IndexError, ValueError) as e:
+            # ^^ e.g., the submission command failed, or its output was unexpected
+            event_stop.set()
+            to_print = "Failed to submit the job for " + sub_ses[0]
+            if sub_ses[1] is not None:
+                to_print += ", " + sub_ses[1]
+            raise Exception(to_print + ": " + str(e))
+
+    def collect(future, i):
+        try:
+            result = future.result()
+        except Exception as e:
+            list_errors.append(str(e))
+            return
+        if result is None:   # not started, as another one failed
+            return
+        list_results[i] = result
+        if on_submitted is not None:
+            on_submitted(i, result)
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        dict_future = {executor.submit(submit_job, sub_ses): i
+                       for i, sub_ses in enumerate(list_sub_ses)}
+        set_collected = set()
+        try:
+            for future in as_completed(dict_future):
+                set_collected.add(future)
+                collect(future, dict_future[future])
+        except BaseException:
+            # e.g., interrupted (Ctrl+C): don't start the remaining ones,
+            #   but still collect the ones being submitted, so their job IDs are not lost:
+            event_stop.set()
+            for future in dict_future:
+                future.cancel()
+            for future, i in dict_future.items():
+                if (future not in set_collected) and (not future.cancelled()):
+                    collect(future, i)
+            raise
+
+    if flag_print_message:
+        for (sub, ses), result in zip(list_sub_ses, list_results):
+            if result is None:
+                continue
+            to_print = "Job for " + sub
+            if ses is not None:
+                to_print += ", " + ses
+            to_print += " has been submitted (job ID: " + result[1] + ")."
+            print(to_print)
+
+    return list_results, list_errors
@@ -0,0 +1,282 @@
+# This is the job submission template, i.e., `analysis/code/submit_job_template.yaml`,
+#   compiled into commands that are ready to be filled in for many jobs,
+#   e.g., in `babs-submit` (including array jobs) and resubmissions in `babs-status`:
+#   - the yaml file is loaded only once per process (again only if it's changed),
+#       see `get_submit_job_template()`;
+#   - each command is split into arguments (as in a shell) before placeholders
+#       (e.g., '${sub_id}') are filled in, so a command is a list of arguments (argv)
+#       to run without a shell, and paths or IDs with spaces are kept as one argument.
+# For details about the template yaml file, see `Container.generate_job_submit_template()`.
+
+import os
+import os.path as op
+import re
+import shlex
+import yaml
+
+# e.g., '${sub_id}':
+PLACEHOLDER_PATTERN = re.compile(r"\$\{(\w+)\}")
+
+
+# Placeholders of the commands, in the order of values given to `CommandTemplate.render()`:
+JOB_PLACEHOLDERS = ("sub_id", "ses_id")
+ARRAY_JOB_PLACEHOLDERS = ("task_range", "task_mapping")
+
+
+def compile_placeholders(text, placeholders):
+    """
+    This is to turn a text with placeholders (e.g., 'toy_${sub_id}_${ses_id}') into
+    a format string with positional fields (e.g., 'toy_{0}_{1}'), for `str.format()`.
+
+    Parameters:
+    -------------
+    text: str
+        the text with placeholders
+    placeholders: tuple of str
+        names of placeholders to fill in, in this order.
+        Other placeholders (e.g., '${ses_id}' for single-ses) are kept as they are.
+
+    Returns:
+    -----------
+    fmt: str or None
+        the format string; None if there is no placeholder to fill in `text`
+    """
+    list_parts = PLACEHOLDER_PATTERN.split(text)
+    # ^^ literal texts and names of placeholders, one after another
+    if not any(part in placeholders for part in list_parts[1::2]):
+        return None
+    fmt = ""
+    for i_part, part in enumerate(list_parts):
+        if (i_part % 2 == 1) and (part in placeholders):   # a placeholder to fill in
+            fmt += "{" + str(placeholders.index(part)) + "}"
+        else:
+            if i_part % 2 == 1:   # a placeholder to keep
+                part = "${" + part + "}"
+            fmt += part.replace("{", "{{").replace("}", "}}")
+    return fmt
+
+
+class CommandTemplate():
+    """
+    This class is one command with placeholders, split into arguments.
+    """
+
+    def __init__(self, cmd, placeholders):
+        """
+        Parameters:
+        -------------
+        cmd: str
+            the command, e.g., 'qsub -N toy_${sub_id} ... participant_job.sh ... ${sub_id}'.
+            It's split into arguments as in a shell, so quoted arguments are kept as one.
+        placeholders: tuple of str
+            names of placeholders to fill in, see `compile_placeholders()`
+
+        Attributes:
+        -------------
+        list_args: list of str
+            the arguments; placeholders are kept as they are
+        list_value: list of tuple
+            (position, index of the value) of arguments that are just a placeholder,
+            e.g., '${sub_id}'
+        list_fmt: list of tuple
+            (position, format string) of other arguments with placeholders
+        """
+        self.list_args = shlex.split(cmd)
+        self.list_value = []
+        self.list_fmt = []
+        for i_arg, arg in enumerate(self.list_args):
+            fmt = compile_placeholders(arg, placeholders)
+            if fmt is None:
+                continue
+            match = re.fullmatch(r"\{(\d+)\}", fmt)
+            if match is not None:
+                self.list_value.append((i_arg, int(match.group(1))))
+            else:
+                self.list_fmt.append((i_arg, fmt))
+
+    def render(self, *values):
+        """
+        This is to fill in the placeholders.
+
+        Parameters:
+        -------------
+        *values: str
+            values of the placeholders, in the order of `placeholders`
+
+        Returns:
+        -----------
+        argv: list of str
+            the command as a list of arguments, e.g., for `subprocess.run()`
+        """
+        argv = self.list_args.copy()
+        for i_arg, i_value in self.list_value:
+            argv[i_arg] = values[i_value]
+        for i_arg, fmt in self.list_fmt:
+            argv[i_arg] = fmt.format(*values)
+        return argv
+
+
+class SubmitJobTemplate():
+    """
+    This class is the compiled job submission template of a BABS project.
+    It's not changed after it's created, so it can be shared by threads.
+    """
+
+    def __init__(self, templates):
+        """
+        Parameters:
+        -------------
+        templates: dict
+            sections in the template yaml file, see `read_submit_job_template()`
+
+        Attributes:
+        -------------
+        cmd: CommandTemplate
+            command to submit one job; placeholders: '${sub_id}' (and '${ses_id}')
+        job_name_fmt: str
+            job name of one job, as a format string
+        array_cmd: CommandTemplate or None
+            command to submit an array job; placeholders: '${task_range}', '${task_mapping}'.
+            None if the BABS project was initialized by an older BABS without array jobs
+        array_job_name: str or None
+            job name of array jobs
+        """
+        self.cmd = CommandTemplate(templates["cmd_template"], JOB_PLACEHOLDERS)
+        job_name_template = templates["job_name_template"]
+        self.job_name_fmt = compile_placeholders(job_name_template, JOB_PLACEHOLDERS)
+        if self.job_name_fmt is None:
+            self.job_name_fmt = job_name_template.replace("{", "{{").replace("}", "}}")
+        if "array_cmd_template" in templates:
+            self.array_cmd = CommandTemplate(templates["array_cmd_template"],
+                                             ARRAY_JOB_PLACEHOLDERS)
+            self.array_job_name = templates["array_job_name"]
+        else:
+            self.array_cmd = None
+            self.array_job_name = None
+
+    def get_job_argv(self, sub, ses=None):
+        """
+        This is to get the command to submit the job of one subject (and session).
+
+        Parameters:
+        -------------
+        sub: str
+            subject ID
+        ses: str or None
+            session ID; None for single-ses
+
+        Returns:
+        -----------
+        argv: list of str
+            the command as a list of arguments
+        job_name: str
+            name of this job, e.g., 'toy_sub-01_ses-A'
+        """
+        if ses is None:
+            ses = "${ses_id}"   # not filled in, as BABS used to do
+        return self.cmd.render(sub, ses), self.job_name_fmt.format(sub, ses)
+
+    def get_jobs_argv(self, list_sub_ses):
+        """
+        This is to get the commands to submit the jobs of many subjects (and sessions).
+
+        Parameters:
+        -------------
+        list_sub_ses: list of tuple
+            each element: (sub, ses) of one job; `ses` is None for single-ses
+
+        Returns:
+        -----------
+        list_argv_job_name: list of tuple
+            (argv, job_name) of each job, see `get_job_argv()`
+        """
+        return [self.get_job_argv(sub, ses) for sub, ses in list_sub_ses]
+
+    def get_array_argv(self, task_range, task_mapping):
+        """
+        This is to get the command to submit an array job.
+
+        Parameters:
+        -------------
+        task_range: str
+            range of task IDs, e.g., '1-1000'
+        task_mapping: str
+            path to the mapping file of task IDs to subjects (and sessions)
+
+        Returns:
+        -----------
+        argv: list of str
+            the command as a list of arguments
+        """
+        if self.array_cmd is None:
+            raise Exception("Submitting array jobs is not supported by this BABS project,"
+                            + " as it was initialized by an older version of BABS."
+                            + " Please submit jobs without `--array`.")
+        return self.array_cmd.render(task_range, task_mapping)
+
+
+def quote_arg(arg):
+    """
+    This is to quote an argument (e.g., a path) when writing a command in the template,
+    only if it's needed to keep it as one argument, e.g., a path with spaces.
+    Other arguments are written as they are, so the template stays readable.
+    """
+    if re.search(r"[\s'\"\\]", arg) is None:
+        return arg
+    return shlex.quote(arg)
+
+
+def read_submit_job_template(analysis_path):
+    """
+    This is to load the job submission template yaml file.
+
+    Parameters:
+    ----------------
+    analysis_path: str
+        path to the `analysis` folder. One attribute in class `BABS`
+
+    Returns:
+    ------------------
+    templates: dict
+        sections in the template yaml file, i.e., 'cmd_template' and 'job_name_template'
+        (and 'array_cmd_template' and 'array_job_name').
+        For details about this template yaml file:
+        see `Container.generate_job_submit_template()`
+    """
+    template_yaml_path = op.join(analysis_path, "code", "submit_job_template.yaml")
+    with open(template_yaml_path, "r") as f:
+        templates = yaml.load(f, Loader=yaml.FullLoader)
+    return templates
+
+
+# Cache of compiled templates loaded in this process, see `get_submit_job_template()`:
+#   key: path to the template yaml file; value: (signature of the file, SubmitJobTemplate)
+CACHE_SUBMIT_JOB_TEMPLATES = {}
+
+
+def get_submit_job_template(analysis_path):
+    """
+    This is to get the compiled job submission template of a BABS project.
+    The template yaml file is only loaded and compiled the first time in this process,
+    or if it's been changed since then.
+
+    Parameters:
+    ----------------
+    analysis_path: str
+        path to the `analysis` folder. One attribute in class `BABS`
+
+    Returns:
+    ------------------
+    template: SubmitJobTemplate
+    """
+    template_yaml_path = op.abspath(op.join(analysis_path, "code",
+                                            "submit_job_template.yaml"))
+    stat = os.stat(template_yaml_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    if template_yaml_path in CACHE_SUBMIT_JOB_TEMPLATES:
+        signature_cached, template = CACHE_SUBMIT_JOB_TEMPLATES[template_yaml_path]
+        if signature_cached == signature:
+            return template
+    template = SubmitJobTemplate(read_submit_job_template(analysis_path))
+    CACHE_SUBMIT_JOB_TEMPLATES[template_yaml_path] = (signature, template)
+    return template
@@ -8,8 +8,10 @@ import pkg_resources
 # from ruamel.yaml import YAML
 import yaml
 import glob
+import json
 import regex
 import copy
+import functools
 import pandas as pd
 import numpy as np
 from filelock import Timeout, FileLock
@@ -17,6 +19,13 @@ import subprocess
 from qstat import qstat  # https://github.com/relleums/qstat
 from datetime import datetime
 import re
+import time
+
+from babs.submit_job_template import get_submit_job_template
+
+# Cache of branches of jobs in output RIA, see `get_output_ria_job_branches()`:
+#   key: `output_ria_data_dir`; value: (signature of refs, dict of branches)
+CACHE_OUTPUT_RIA_REFS = {}
 
 # Disable the behavior of printing messages:
 def blockPrint():
@@ -1176,7 +1185,7 @@ def get_list_sub_ses(input_ds, config, babs):
         return dict_sub_ses
 
 def submit_one_job(analysis_path, type_session, sub, ses=None,
-                   flag_print_message=True):
+                   flag_print_message=True, template=None):
     """
     This is to submit one job.
 
@@ -1192,6 +1201,9 @@ def submit_one_job(analysis_path, type_session, sub, ses=None,
         session id. For type-session == "single-ses", this is None
     flag_print_message: bool
         to print a message (True) or not (False)
+    template: SubmitJobTemplate or None
+        the compiled job submission template, see `submit_job_template.py`.
+        If None, it will be got with `get_submit_job_template()`.
 
     Returns:
     ------------------
@@ -1209,28 +1221,21 @@ def submit_one_job(analysis_path, type_session, sub, ses=None,
     for details about template yaml file.
     """
 
-    # Load the job submission template:
+    # Get the job submission template, only loaded once in this process:
     #   details of this template yaml file: see `Container.generate_job_submit_template()`
-    template_yaml_path = op.join(analysis_path, "code", "submit_job_template.yaml")
-    with open(template_yaml_path, "r") as f:
-        templates = yaml.load(f, Loader=yaml.FullLoader)
-    f.close()
-    # sections in this template yaml file:
-    cmd_template = templates["cmd_template"]
-    job_name_template = templates["job_name_template"]
+    if template is None:
+        template = get_submit_job_template(analysis_path)
 
     if type_session == "single-ses":
-        cmd = cmd_template.replace("${sub_id}", sub)
+        argv, job_name = template.get_job_argv(sub)
         to_print = "Job for " + sub
-        job_name = job_name_template.replace("${sub_id}", sub)
     else:   # multi-ses
-        cmd = cmd_template.replace("${sub_id}", sub).replace("${ses_id}", ses)
+        argv, job_name = template.get_job_argv(sub, ses)
         to_print = "Job for " + sub + ", " + ses
-        job_name = job_name_template.replace("${sub_id}", sub).replace("${ses_id}", ses)
-    # print(cmd)
+    # print(argv)
 
     # run the command, get the job id:
-    proc_cmd = subprocess.run(cmd.split(),   # separate by space
+    proc_cmd = subprocess.run(argv,   # already a list of arguments
                               cwd=analysis_path,
                               stdout=subprocess.PIPE)
     proc_cmd.check_returncode()
@@ -1248,26 +1253,317 @@ def submit_one_job(analysis_path, type_session, sub, ses=None,
 
     return job_id, job_id_str, log_filename
 
+def submit_array_jobs(analysis_path, type_session, list_sub_ses, chunk_size=None,
+                      flag_print_message=True, on_submitted=None):
+    """
+    This is to submit many jobs as tasks of array job(s), e.g., `qsub -t 1-1000` for SGE,
+    instead of one `qsub` per job.
+    A mapping file of task IDs to subjects (and sessions) is saved in folder `analysis/logs`,
+    and each task gets its subject (and session) from it in `participant_job.sh`.
+
+    Parameters:
+    ----------------
+    analysis_path: str
+        path to the `analysis` folder. One attribute in class `BABS`
+    type_session: str
+        multi-ses or single-ses
+    list_sub_ses: list of tuple
+        each element: (sub, ses) of one job; `ses` is None for single-ses.
+        Task IDs are 1, 2, ... in this order.
+    chunk_size: int or None
+        max number of tasks in one array job, e.g., to stay below
+        the max size of an array job on the cluster (`max_aj_tasks` for SGE).
+        If None, all tasks are submitted in one array job.
+    flag_print_message: bool
+        to print a message for each array job (True) or not (False)
+    on_submitted: callable or None
+        called as `on_submitted(i, result)` for each task of an array job,
+        as soon as the array job is submitted, where `result` is the same as
+        `list_results[i]`; as in `submit_jobs()` in `job_submission.py`
+
+    Returns:
+    ------------------
+    list_results: list of tuple or None
+        (job_id, task_id, log_filename) of each job, in the order of `list_sub_ses`.
+        Example of `log_filename`: 'qsi_array.*<jobid>.<taskid>';
+        user needs to replace '*' with 'o', 'e', etc.
+        None if the job was not submitted, i.e., the submission of its array job failed,
+        or it was not started after the one of a previous array job failed
+    list_errors: list of str
+        error message of the failed submission; empty if all were submitted
+
+    Notes:
+    -----------------
+    see `Container.generate_job_submit_template()`
+    for details about template yaml file.
+    """
+    list_results = [None] * len(list_sub_ses)
+    list_errors = []
+    if len(list_sub_ses) == 0:
+        return list_results, list_errors
+
+    template = get_submit_job_template(analysis_path)
+    array_job_name = template.array_job_name
+
+    # The mapping file:
+    #   task IDs start from 1 (SGE); one file for all array jobs of this submission
+    mapping_path = op.join(analysis_path, "logs",
+                           "array_tasks_" + time.strftime("%Y%m%d-%H%M%S") + "_"
+                           + str(os.getpid()) + ".csv")
+
+    # Commands of array jobs, before anything is saved:
+    #   it raises an error if array jobs are not supported by this BABS project
+    if chunk_size is None:
+        chunk_size = len(list_sub_ses)
+    list_task_ranges = [(i_start + 1, min(i_start + chunk_size, len(list_sub_ses)))
+                        for i_start in range(0, len(list_sub_ses), chunk_size)]
+    list_argv = [template.get_array_argv(str(task_first) + "-" + str(task_last),
+                                         mapping_path)
+                 for task_first, task_last in list_task_ranges]
+
+    # Save the mapping file:
+    df_mapping = pd.DataFrame({"task_id": range(1, len(list_sub_ses) + 1),
+                               "sub_id": [sub for sub, _ in list_sub_ses]})
+    if type_session == "multi-ses":
+        df_mapping["ses_id"] = [ses for _, ses in list_sub_ses]
+    os.makedirs(op.dirname(mapping_path), exist_ok=True)
+    df_mapping.to_csv(mapping_path, index=False)
+
+    for (task_first, task_last), argv in zip(list_task_ranges, list_argv):
+        # run the command, get the job id:
+        try:
+            proc_cmd = subprocess.run(argv,   # already a list of arguments
+                                      cwd=analysis_path,
+                                      stdout=subprocess.PIPE)
+            proc_cmd.check_returncode()
+            msg = proc_cmd.stdout.decode('utf-8')
+            # ^^ e.g., Your job-array 2275903.1-1000:1 ("qsi_array") has been submitted
+            job_id_str = msg.split()[2].split(".")[0]   # <- NOTE: this is HARD-CODED!
+            job_id = int(job_id_str)
+        except (subprocess.CalledProcessError, OSError, IndexError, ValueError) as e:
+            # ^^ e.g., the submission command failed, or its output was unexpected;
+            #   tasks of array jobs submitted before are still returned:
+            list_errors.append("Failed to submit the array job of tasks "
+                               + str(task_first) + "-" + str(task_last) + ": " + str(e))
+            break
+
+        for task_id in range(task_first, task_last + 1):
+            list_results[task_id - 1] = (job_id, task_id, array_job_name + ".*"
+                                         + job_id_str + "." + str(task_id))
+            if on_submitted is not None:
+                on_submitted(task_id - 1, list_results[task_id - 1])
+
+        if flag_print_message:
+            print("Array job for " + str(task_last - task_first + 1) + " jobs"
+                  + " (tasks " + str(task_first) + "-" + str(task_last) + ")"
+                  + " has been submitted (job ID: " + job_id_str + ").")
+
+    if flag_print_message:
+        print("The mapping of task IDs to jobs is saved in: " + mapping_path)
+
+    return list_results, list_errors
+
+def get_job_id_str(df_job):
+    """
+    This is to get the IDs of jobs as used by the job scheduler, e.g., in `qstat` and `qdel`.
+
+    Parameters:
+    ----------------
+    df_job: pd.DataFrame
+        the job status table, or rows of it; columns 'job_id' (and 'task_id') are used
+
+    Returns:
+    ------------------
+    job_id_str: pd.Series of str
+        e.g., '1234' for a job; '1234.5' for task 5 of array job 1234 (SGE's notation)
+    """
+    job_id_str = df_job["job_id"].astype(str)
+    if "task_id" in df_job.columns:
+        is_task = (df_job["task_id"] > 0).to_numpy()
+        job_id_str[is_task] = job_id_str[is_task] + "." \
+            + df_job.loc[is_task, "task_id"].astype(str)
+    return job_id_str
+
+def kill_jobs(list_job_id_str, chunk_size=500):
+    """
+    This is to kill (delete) jobs from the queue,
+    with one job deletion command (e.g., `qdel` for SGE) for many jobs.
+    If the command fails for some of the jobs (e.g., a job has just finished),
+    the others in the same command are still killed, so this does not raise an error:
+    a warning is thrown, and the jobs that may still be in the queue are returned.
+
+    Parameters:
+    ----------------
+    list_job_id_str: list of str
+        IDs of the jobs to kill, see `get_job_id_str()`
+    chunk_size: int
+        max number of job IDs in one command, to keep the command line short.
+
+    Returns:
+    ----------------
+    list_job_id_str_failed: list of str
+        IDs of the jobs that failed to be killed and may still be in the queue.
+        Jobs that are not in the queue anymore are not included.
+    """
+    list_job_id_str_failed = []
+    for i_start in range(0, len(list_job_id_str), chunk_size):
+        list_chunk = list_job_id_str[i_start:i_start + chunk_size]
+        try:
+            proc_kill = subprocess.run(["qdel"] + list_chunk,
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as e:
+            warnings.warn("Failed to kill job(s) " + ", ".join(list_chunk) + ": " + str(e))
+            list_job_id_str_failed += list_chunk
+            continue
+        if proc_kill.returncode == 0:
+            continue
+
+        msg = proc_kill.stdout.decode("utf-8", errors="replace") + "\n" \
+            + proc_kill.stderr.decode("utf-8", errors="replace")
+        list_failed = get_kill_failed_job_ids(list_chunk, msg)
+        warnings.warn("`qdel` returned an error (exit code " + str(proc_kill.returncode) + ")"
+                      + " when killing " + str(len(list_chunk)) + " job(s)."
+                      + (" Job(s) that may still be in the queue: " + ", ".join(list_failed) + "."
+                         if len(list_failed) > 0 else "")
+                      + " Message: " + msg.strip())
+        list_job_id_str_failed += list_failed
+
+    return list_job_id_str_failed
+
+def get_kill_failed_job_ids(list_job_id_str, msg):
+    """
+    This is to find the jobs that failed to be killed from the message of `qdel`,
+    when it returned an error. Examples of its messages for SGE:
+    'user has deleted job 1000' and 'user has registered the job 1001 for deletion'
+    (killed); 'denied: job "1002" does not exist' (not in the queue anymore, e.g., finished);
+    others, e.g., 'user is not owner of job 1003', mean the job may still be in the queue.
+
+    Parameters:
+    ----------------
+    list_job_id_str: list of str
+        IDs of the jobs in this `qdel` command
+    msg: str
+        stdout and stderr of the `qdel` command
+
+    Returns:
+    ----------------
+    list_job_id_str_failed: list of str
+        IDs of the jobs that failed to be killed and may still be in the queue;
+        jobs not mentioned in `msg` are considered killed
+    """
+    list_job_id_str_failed = []
+    list_lines = msg.splitlines()
+    for job_id_str in list_job_id_str:
+        pattern = re.compile(r"(?<![0-9.])" + re.escape(job_id_str) + r"(?![0-9]|\.[0-9])")
+        for line in list_lines:
+            if pattern.search(line) is None:
+                continue
+            line = line.lower()
+            if ("does not exist" in line) or ("deleted" in line) \
+                    or ("registered" in line) or ("deletion" in line):
+                continue   # killed, or not in the queue
+            list_job_id_str_failed.append(job_id_str)
+            break
+
+    return list_job_id_str_failed
+
+def resolve_job_status_conflicts(df_job_updated, df_old_rows, df_job_saved,
+                                 list_index_conflict, type_session):
+    """
+    This is to handle the rows of the job status dataframe whose changes
+    were not saved by `JobStatusStore.commit()`, e.g., because another process
+    (`babs-submit` or `babs-status`) has changed these rows in the meantime.
+    If this process has (re)submitted a job for such a row, the job is killed,
+    as its job ID was not saved, i.e., it's a duplicate of the job submitted by the other
+    process, or it would not be tracked. Other changes of these rows are just dropped,
+    and will be made again by next `babs-status`.
+
+    Parameters:
+    --------------
+    df_job_updated: pd.DataFrame
+        job status dataframe with changes made by this process
+    df_old_rows: pd.DataFrame
+        values of changed rows before the changes, e.g., from `JobStatusTable.get_changes()`
+    df_job_saved: pd.DataFrame or None
+        job status dataframe saved by `JobStatusStore.commit()`;
+        None if nothing was saved
+    list_index_conflict: list
+        indices of rows whose changes were not (all) saved
+    type_session: str
+        "single-ses" or "multi-ses"
+    """
+    list_job_id_kill = []
+    list_name_skipped = []
+    for i_job in list_index_conflict:
+        name = df_job_updated.at[i_job, "sub_id"]
+        if type_session == "multi-ses":
+            name += ", " + df_job_updated.at[i_job, "ses_id"]
+        job_id = df_job_updated.at[i_job, "job_id"]
+        if (job_id != df_old_rows.at[i_job, "job_id"]) and \
+                ((df_job_saved is None) or (job_id != df_job_saved.at[i_job, "job_id"])):
+            list_job_id_kill.append(get_job_id_str(df_job_updated.loc[[i_job]]).iloc[0])
+            # ^^ for a task of an array job, only kill this task
+        else:
+            list_name_skipped.append(name)
+
+    if len(list_job_id_kill) > 0:
+        warnings.warn("The job status of " + str(len(list_job_id_kill)) + " job(s) submitted"
+                      + " in this run could not be saved, e.g., these jobs were also submitted"
+                      + " by another process in the meantime."
+                      + " These jobs will be killed: " + ", ".join(list_job_id_kill))
+        list_job_id_not_killed = kill_jobs(list_job_id_kill)
+        if len(list_job_id_not_killed) > 0:
+            warnings.warn("These jobs could not be killed, and they are not tracked"
+                          + " in the job status table; please kill them manually: "
+                          + ", ".join(list_job_id_not_killed))
+    if len(list_name_skipped) > 0:
+        warnings.warn("Changes of job status for " + str(len(list_name_skipped))
+                      + " job(s) were not saved, e.g., they were changed by another process"
+                      + " in the meantime; please run `babs-status` again. Job(s): "
+                      + "; ".join(list_name_skipped[:10])
+                      + (" ..." if len(list_name_skipped) > 10 else ""))
+
 def create_job_status_csv(babs):
     """
-    This is to create a CSV file of `job_status`.
+    This is to create the job status table, i.e., `job_status.csv`
+    (or `job_status.sqlite`, depending on `babs.job_status_backend`).
     This should be used by `babs-submit` and `babs-status`.
 
+    If the backend is not 'csv' but there is an existing `job_status.csv`
+    (e.g., the backend of an existing project was changed), it will be migrated.
+
     Parameters:
     ------------
     babs: class `BABS`
         information about a BABS project.
     """
 
-    if op.exists(babs.job_status_path_abs) is False:
+    if (babs.job_status_backend != "csv") and (not babs.job_status_store.exists()) \
+            and op.exists(babs.job_status_path_abs):
+        # Migrate from the existing `job_status.csv`, using lock:
+        lock = FileLock(babs.job_status_store.lock_path)
+        try:
+            with lock.acquire(timeout=5):
+                print("Migrating the job status table from " + babs.job_status_path_abs
+                      + " to " + babs.job_status_store.path + " ...")
+                babs.job_status_store.migrate_from_csv()
+        except Timeout:   # after waiting for time defined in `timeout`:
+            # if another instance also uses locks, and is currently running,
+            #   there will be a timeout error
+            print("Another instance of this application currently holds the lock.")
+
+    if babs.job_status_store.exists() is False:
         # Generate the table:
         # read the subject list as a panda df:
         df_sub = pd.read_csv(babs.list_sub_path_abs)
         df_job = df_sub.copy()    # deep copy of pandas df
+        input_size = df_job.pop("input_size") if "input_size" in df_job.columns else None
+        # ^^ estimated size of input data of each job, see `job_order.py`; added below
 
         # add columns:
         df_job["has_submitted"] = False
         df_job["job_id"] = -1    # int
+        df_job["task_id"] = -1    # int; task ID if it's a task of an array job
         df_job["job_state_category"] = np.nan
         df_job["job_state_code"] = np.nan
         df_job["duration"] = np.nan
@@ -1279,25 +1575,52 @@ def create_job_status_csv(babs):
         df_job["last_line_o_file"] = np.nan
         df_job["alert_message"] = np.nan
         df_job["job_account"] = np.nan
+        if input_size is not None:
+            df_job["input_size"] = input_size.astype(float)
+        add_missing_job_status_columns(df_job)
 
         # TODO: add different kinds of error
 
         # These `NaN` will be saved as empty strings (i.e., nothing between two ",")
         #   but when pandas read this csv, the NaN will show up in the df
 
-        # Save the df as csv file, using lock:
-        lock_path = babs.job_status_path_abs + ".lock"
+        # Save the df, using lock:
+        lock_path = babs.job_status_store.lock_path
         lock = FileLock(lock_path)
 
         try:
             with lock.acquire(timeout=5):
-                df_job.to_csv(babs.job_status_path_abs, index=False)
+                babs.job_status_store.write(df_job)
         except Timeout:   # after waiting for time defined in `timeout`:
             # if another instance also uses locks, and is currently running,
             #   there will be a timeout error
             print("Another instance of this application currently holds the lock.")
 
 
+def add_missing_job_status_columns(df_job):
+    """
+    This is to add the columns introduced in later versions of BABS
+    to the job status table, if they are not there yet,
+    i.e., the table was created before these columns were introduced:
+    - 'task_id': -1, i.e., not a task of an array job
+    - timestamps, see `JOB_TIMESTAMP_COLUMNS` in `constants.py`: NaN
+    - 'input_size': NaN, i.e., unknown, see `job_order.py`
+
+    Parameters:
+    ------------
+    df_job: pd.DataFrame
+        the job status table; it will be updated in place
+    """
+    from .constants import JOB_TIMESTAMP_COLUMNS
+
+    if "task_id" not in df_job.columns:
+        df_job["task_id"] = -1   # int
+    for col in JOB_TIMESTAMP_COLUMNS:
+        if col not in df_job.columns:
+            df_job[col] = np.nan   # float
+    if "input_size" not in df_job.columns:
+        df_job["input_size"] = np.nan   # float
+
 def read_job_status_csv(csv_path):
     """
     This is to read the CSV file of `job_status`.
@@ -1314,11 +1637,52 @@ def read_job_status_csv(csv_path):
     """
     df = pd.read_csv(csv_path,
                      dtype={"job_id": 'int',
+                            "task_id": 'int',
                             'has_submitted': 'bool',
-                            'is_done': 'bool'
+                            'is_done': 'bool',
+                            "input_size": 'float'
                             })
     return df
 
+def write_job_status_csv(df, csv_path):
+    """
+    This is to save the dataframe of job status into `job_status.csv`.
+    The file is replaced atomically, so other processes reading it
+    won't see a partially written file.
+
+    Parameters:
+    ------------
+    df: pandas dataframe
+        dataframe of job status
+    csv_path: str
+        path to the `job_status.csv`
+    """
+    temp_path = csv_path + ".tmp." + str(os.getpid())
+    df.to_csv(temp_path, index=False)
+    os.replace(temp_path, csv_path)
+
+def get_changed_rows(df_old, df_new):
+    """
+    This is to find the rows in the job status dataframe that have been changed,
+    so that only these rows need to be saved.
+
+    Parameters:
+    ------------
+    df_old: pandas dataframe
+        the dataframe of job status before changes
+    df_new: pandas dataframe
+        the dataframe of job status after changes; it should have the same index as `df_old`
+
+    Returns:
+    ------------
+    list_index_changed: list
+        indices of rows that are different between `df_old` and `df_new`;
+        NaN is considered equal to NaN.
+    """
+    df_old = df_old.reindex(columns=df_new.columns)
+    is_different = (df_old != df_new) & ~(df_old.isna() & df_new.isna())
+    return df_new.index[is_different.any(axis=1)].tolist()
+
 def report_job_status(df, analysis_path, config_keywords_alert):
     """
     This is to report the job status
@@ -1327,102 +1691,88 @@ def report_job_status(df, analysis_path, config_keywords_alert):
     Parameters:
     -------------
     df: pandas dataframe
-        loaded dataframe from `job_status.csv`
+        loaded dataframe from `job_status.csv`.
+        Only columns in `JOB_STATUS_REPORT_COLUMNS` in `constants.py` are needed,
+        e.g., from `JobStatusStore.read_columns()`.
     analysis_path: str
         Path to the analysis folder.
         This is used to generate the folder of log files
     config_keywords_alert: dict or None
         From `get_config_keywords_alert()`
         This is used to determine if to report `alert_message` column
-    """
 
-    from .constants import MSG_NO_ALERT_IN_LOGS
+    Returns:
+    -------------
+    dict_summary: dict
+        the summary that was printed, see `get_job_status_summary()`
+    """
+    from .job_status_summary import print_job_status_summary
 
-    print('\nJob status:')
+    dict_summary = get_job_status_summary(df)
+    print_job_status_summary(dict_summary, analysis_path, config_keywords_alert is not None)
+    return dict_summary
 
-    total_jobs = df.shape[0]
-    print('There are in total of ' + str(total_jobs) + ' jobs to complete.')
+def get_job_status_summary(df):
+    """
+    This is to summarize the job status, for all jobs at once,
+    e.g., for `babs-status --json`. It has the same totals as printed by
+    `report_job_status()`, plus the number of jobs in each state and histograms of messages.
 
-    total_has_submitted = int(df["has_submitted"].sum())
-    print(str(total_has_submitted) + " job(s) have been submitted; "
-          + str(total_jobs - total_has_submitted) + " job(s) haven't been submitted.")
+    Parameters:
+    -------------
+    df: pd.DataFrame
+        the job status table. Only columns in `JOB_STATUS_REPORT_COLUMNS`
+        in `constants.py` are needed.
 
-    if total_has_submitted > 0:    # there is at least one job submitted
-        total_is_done = int(df["is_done"].sum())
-        print("Among submitted jobs,")
-        print(str(total_is_done) + ' job(s) are successfully finished;')
+    Returns:
+    -------------
+    dict_summary: dict
+        - 'num_jobs', 'num_submitted', 'num_not_submitted', 'num_done', 'num_pending',
+            'num_running', 'num_failed': as in `report_job_status()`
+        - 'states': number of jobs in each state, see `JOB_STATES` in `job_selection.py`
+        - 'alert_messages': histogram of `alert_message` of failed jobs
+        - 'alert_messages_all': histogram of `alert_message` of all jobs that have one
+        - 'job_accounts': histogram of `job_account` of failed jobs
+            without alert keyword in log files
+        Each histogram is a list of dict with keys 'value' (None for missing value)
+        and 'count', sorted by count (descending).
+    """
+    from .constants import MSG_NO_ALERT_IN_LOGS
+    from .job_selection import JOB_STATES, get_job_states
+
+    is_failed = (df["is_failed"] == True).to_numpy()   # noqa: E712; NaN is False
+    num_submitted = int(df["has_submitted"].sum())
+    states = get_job_states(df).value_counts()
+
+    dict_summary = {"num_jobs": int(df.shape[0]),
+                    "num_submitted": num_submitted,
+                    "num_not_submitted": int(df.shape[0]) - num_submitted,
+                    "num_done": int(df["is_done"].sum()),
+                    "num_pending": int((df["job_state_category"] == "pending").sum()),
+                    "num_running": int((df["job_state_category"] == "running").sum()),
+                    "num_failed": int(is_failed.sum()),
+                    "states": {state: int(states.get(state, 0)) for state in JOB_STATES},
+                    "alert_messages": get_histogram(df.loc[is_failed, "alert_message"]),
+                    "alert_messages_all": get_histogram(df["alert_message"].dropna())}
+    is_failed_no_alert = is_failed & (df["alert_message"] == MSG_NO_ALERT_IN_LOGS).to_numpy()
+    dict_summary["job_accounts"] = get_histogram(df.loc[is_failed_no_alert, "job_account"])
+    return dict_summary
+
+def get_histogram(series):
+    """
+    This is to count each distinct value, see `get_job_status_summary()`.
+    Missing values are counted as None.
 
-        if total_is_done == total_jobs:
-            print("All jobs are completed!")
-        else:
-            total_pending = int((df['job_state_category'] == 'pending').sum())
-            print(str(total_pending) + ' job(s) are pending;')
-
-            total_pending = int((df['job_state_category'] == 'running').sum())
-            print(str(total_pending) + ' job(s) are running;')
-
-            # TODO: add stalled one
-
-            total_is_failed = int(df["is_failed"].sum())
-            print(str(total_is_failed) + ' job(s) are failed.')
-
-            # if there is job failed: print more info by categorizing msg:
-            if total_is_failed > 0:
-                if config_keywords_alert is not None:
-                    print("\nAmong all failed job(s):")
-                # get the list of jobs that 'is_failed=True':
-                list_index_job_failed = df.index[df["is_failed"] == True].tolist()
-                # ^^ notice that df["is_failed"] contains np.nan, so can only get in this way
-
-                # summarize based on `alert_message` column:
-                
-                all_alert_message = df["alert_message"][list_index_job_failed].tolist()
-                unique_list_alert_message = list(set(all_alert_message))
-                # unique_list_alert_message.sort()   # sort and update the list itself
-                # TODO: before `.sort()` ^^, change `np.nan` to string 'nan'!
-
-                if config_keywords_alert is not None:
-                    for unique_alert_msg in unique_list_alert_message:
-                        # count:
-                        temp_count = all_alert_message.count(unique_alert_msg)
-                        print(str(temp_count) + " job(s) have alert message: '"
-                              + str(unique_alert_msg) + "';")
-
-                # if there is 'no_alert' in 'alert_message', check 'job_account' column:
-                if MSG_NO_ALERT_IN_LOGS in unique_list_alert_message:
-                    list_index_job_failed_no_alert = \
-                        (df["is_failed"] == True) & (df["alert_message"] == MSG_NO_ALERT_IN_LOGS)
-
-                    # because there could be 'np.nan' in the df, and pd.series -> tolist()
-                    #   becomes [nan] which is not str(np.nan) or np.nan..., i.e., not detectable,
-                    #   so we need to check that first...
-                    pdseries = df["job_account"][list_index_job_failed_no_alert]
-                    # check if all selected are np.nan:
-                    if all(pd.isna(pdseries)):
-                        # if so, 'job_account' was not applied yet:
-                        print("\nFor the failed job(s) that don't have alert keyword in log files,"
-                              + " you may use `--job-account` to get more information"
-                              + " about why they are failed."
-                              + " Note that with `--job-account`, `babs-status` may take longer time.")
-                    else:
-                        all_job_account = pdseries.tolist()
-                        # ^^ only limit to jobs failed & no alert keywords in log files
-                        unique_list_job_account = list(set(all_job_account))
-                        # unique_list_job_account.sort()   # sort and update the list itself
-                        # TODO: before `.sort()` ^^, change `np.nan` to string 'nan'!
-
-                        print("\nAmong job(s) that are failed"
-                              + " and don't have alert keyword in log files:")
-                        for unique_job_account in unique_list_job_account:
-                            # count:
-                            temp_count = all_job_account.count(unique_job_account)
-                            print(str(temp_count) + " job(s) have job account of: '"
-                                  + str(unique_job_account) + "';")
-                            # ^^ str(unique_job_account) is in case it is `np.nan`,
-                            #   though should not be possible to be `np.nan`
-
-        print("\nAll log files are located in folder: "
-              + op.join(analysis_path, "logs"))
+    Returns:
+    -------------
+    list_counts: list of dict
+        'value' and 'count' of each distinct value, sorted by count (descending),
+        then by value
+    """
+    counts = series.astype(object).value_counts(dropna=False)
+    list_counts = [{"value": None if pd.isna(value) else value, "count": int(count)}
+                   for value, count in counts.items()]
+    return sorted(list_counts, key=lambda x: (-x["count"], str(x["value"])))
 
 def request_all_job_status():
     """
@@ -1455,8 +1805,19 @@ def request_all_job_status():
     if (not queue_info) & (not job_info):   # both are `[]`
         pass  # don't set the index
     else:
+        if "tasks" in df.columns:
+            # tasks of array jobs: one row per task, with ID '<job ID>.<task ID>',
+            #   e.g., running tasks are listed one by one,
+            #   but pending tasks of an array job are listed together, e.g., '2-1000:1'
+            df["list_task_id"] = [get_sge_task_ids(tasks) for tasks in df["tasks"]]
+            df = df.explode("list_task_id")
+            is_task = df["list_task_id"].notna()
+            df.loc[is_task, "JB_job_number"] = df.loc[is_task, "JB_job_number"] + "." \
+                + df.loc[is_task, "list_task_id"].astype(str)
+            df = df.drop(columns=["list_task_id"])
         df = df.set_index('JB_job_number')   # set a column as index
-        # index `JB_job_number`: job ID (data type: str)
+        # index `JB_job_number`: job ID (data type: str),
+        #   or '<job ID>.<task ID>' for a task of an array job, see `get_job_id_str()`
         # column `@state`: 'running' or 'pending'
         # column `state`: 'r', 'qw', etc
         # column `JAT_start_time`: start time of running
@@ -1464,6 +1825,481 @@ def request_all_job_status():
 
     return df
 
+def get_sge_task_ids(tasks):
+    """
+    This is to get the task IDs from field `tasks` of an array job in `qstat` (SGE).
+
+    Parameters:
+    --------------
+    tasks: str or NaN
+        e.g., '5' for a running task, '2-1000:1' or '1,3,5-9:2' for pending tasks;
+        NaN if the job is not an array job
+
+    Returns:
+    --------------
+    list_task_id: list of int or None
+        None if the job is not an array job
+    """
+    if not isinstance(tasks, str):
+        return None
+    list_task_id = []
+    for item in tasks.split(","):
+        # e.g., '5-9:2': from 5 to 9, with step of 2:
+        task_range, _, step = item.partition(":")
+        first, _, last = task_range.partition("-")
+        if last == "":
+            last = first
+        list_task_id += list(range(int(first), int(last) + 1, int(step or 1)))
+    return list_task_id
+
+def parse_job_branchname(branchname):
+    """
+    This is to parse the name of a job's branch in output RIA.
+
+    Parameters:
+    --------------
+    branchname: str
+        e.g., 'job-00000-sub-01' for single-ses; 'job-00000-sub-01-ses-B' for multi-ses
+
+    Returns:
+    --------------
+    key: tuple or None
+        (sub_id, ses_id, job_id), e.g., ('sub-01', 'ses-B', 0);
+        `ses_id` is None for single-ses.
+        If `branchname` is not a job's branch, returns None.
+    """
+    if branchname[0:4] != "job-":
+        return None
+    temp = branchname.split("-", 2)   # ['job', '00000', 'sub-01-ses-B']
+    if (len(temp) != 3) or (not temp[1].isdigit()) or (temp[2][0:4] != "sub-"):
+        return None
+    job_id = int(temp[1])
+    if "-ses-" in temp[2]:
+        sub, ses = temp[2].split("-ses-", 1)
+        ses = "ses-" + ses
+    else:
+        sub = temp[2]
+        ses = None
+
+    return (sub, ses, job_id)
+
+def install_output_ria_push_journal(output_ria_data_dir):
+    """
+    This is to install a `post-receive` hook in output RIA's bare repository,
+    which appends a record of each pushed branch to a journal file,
+    i.e., `OUTPUT_RIA_PUSH_JOURNAL` in `constants.py`.
+    `babs-status` reads this journal incrementally to find finished jobs,
+    instead of listing all branches in output RIA.
+
+    Parameters:
+    --------------
+    output_ria_data_dir: str
+        Path to the output RIA's data directory, i.e., the bare repository.
+        See attribute `output_ria_data_dir` of class `BABS`.
+
+    Notes:
+    --------------
+    Each record in the journal is one line: '<refname> <new commit> <unix timestamp>',
+    e.g., 'refs/heads/job-00000-sub-01 <sha> 1672531200'.
+    A deleted branch has a commit of all zeros.
+    """
+    from .constants import OUTPUT_RIA_PUSH_JOURNAL
+
+    hook_path = op.join(output_ria_data_dir, "hooks", "post-receive")
+    if op.exists(hook_path):
+        warnings.warn("There is already a `post-receive` hook in output RIA: " + hook_path
+                      + " . BABS won't install its hook for the journal of pushes;"
+                      + " `babs-status` will list the branches in output RIA instead.")
+        return
+
+    if not op.exists(op.dirname(hook_path)):
+        os.makedirs(op.dirname(hook_path))
+    with open(hook_path, "w") as f:
+        f.write("#!/bin/sh\n")
+        f.write("# Installed by BABS: record each pushed branch in the journal"
+                + " for `babs-status`.\n")
+        f.write("# Each line: <refname> <new commit> <unix timestamp>\n")
+        f.write("while read oldrev newrev refname; do\n")
+        f.write('    echo "$refname $newrev $(date +%s)"\n')
+        f.write('done >> "${GIT_DIR:-.}/' + OUTPUT_RIA_PUSH_JOURNAL + '"\n')
+    os.chmod(hook_path, 0o755)   # executable
+
+    # Create the journal, so that `babs-status` knows the hook has been installed:
+    journal_path = op.join(output_ria_data_dir, OUTPUT_RIA_PUSH_JOURNAL)
+    open(journal_path, "a").close()
+
+def read_output_ria_push_journal(output_ria_data_dir, journal_cache_path):
+    """
+    This is to get the branches of jobs in output RIA from the journal of pushes
+    (see `install_output_ria_push_journal()`). Only records appended since previous call
+    are read; the position in the journal and the branches are saved in a cache file.
+
+    Parameters:
+    --------------
+    output_ria_data_dir: str
+        Path to the output RIA's data directory, i.e., the bare repository.
+    journal_cache_path: str
+        Path to the cache file, i.e., `output_ria_journal_cache.json`
+
+    Returns:
+    --------------
+    dict_branches: dict or None
+        See `get_output_ria_job_branches()`.
+        None if there is no journal in output RIA (e.g., the hook was not installed).
+    """
+    from .constants import OUTPUT_RIA_PUSH_JOURNAL
+
+    journal_path = op.join(output_ria_data_dir, OUTPUT_RIA_PUSH_JOURNAL)
+    if not op.exists(journal_path):
+        return None
+
+    # Load the position in the journal and the branches got from previous call:
+    journal_cache = {}
+    if op.exists(journal_cache_path):
+        try:
+            with open(journal_cache_path, "r") as f:
+                journal_cache = json.load(f)
+        except ValueError:   # e.g., incomplete file; read the journal from the beginning
+            journal_cache = {}
+    offset = journal_cache.get("offset", 0)
+    dict_branch_commit = journal_cache.get("branches", {})   # key: branch; value: commit
+
+    if os.stat(journal_path).st_size < offset:
+        # the journal is shorter than before, i.e., it's a new one; read from the beginning:
+        offset = 0
+        dict_branch_commit = {}
+
+    with open(journal_path, "rb") as f:
+        f.seek(offset)
+        new_records = f.read()
+    # only read complete lines; the last line may be still being written:
+    new_records = new_records[:new_records.rfind(b"\n") + 1]
+
+    if len(new_records) > 0:
+        for line in new_records.decode("utf-8").splitlines():
+            temp = line.split()
+            if (len(temp) < 2) or (temp[0][0:11] != "refs/heads/"):
+                continue
+            branchname = temp[0][11:]
+            if temp[1].strip("0") == "":   # deleted
+                dict_branch_commit.pop(branchname, None)
+            else:
+                dict_branch_commit[branchname] = temp[1]
+
+        journal_cache = {"offset": offset + len(new_records),
+                         "branches": dict_branch_commit}
+        temp_path = journal_cache_path + ".tmp." + str(os.getpid())
+        with open(temp_path, "w") as f:
+            json.dump(journal_cache, f)
+        os.replace(temp_path, journal_cache_path)
+
+    dict_branches = {}
+    for branchname in dict_branch_commit:
+        key = parse_job_branchname(branchname)
+        if key is not None:
+            dict_branches[key] = branchname
+
+    return dict_branches
+
+def get_output_ria_job_branches(output_ria_data_dir, journal_cache_path=None):
+    """
+    This is to get the branches of jobs in output RIA.
+
+    If the journal of pushes exists in output RIA (see `install_output_ria_push_journal()`)
+    and `journal_cache_path` is provided, only new records in the journal are read,
+    see `read_output_ria_push_journal()`.
+    Otherwise, `packed-refs` and `refs/heads/job-*` are read directly from the bare repository,
+    instead of calling `git branch -a`.
+    The result is cached in `CACHE_OUTPUT_RIA_REFS`, and is only re-read
+    when the modification time of `packed-refs` or `refs/heads` changes.
+
+    Parameters:
+    --------------
+    output_ria_data_dir: str
+        Path to the output RIA's data directory, i.e., the bare repository.
+        See attribute `output_ria_data_dir` of class `BABS`.
+    journal_cache_path: str or None
+        Path to the cache of reading the journal, i.e., `output_ria_journal_cache.json`.
+        If None, the journal won't be used.
+
+    Returns:
+    --------------
+    dict_branches: dict
+        key: (sub_id, ses_id, job_id), see `parse_job_branchname()`
+        value: name of the branch, e.g., 'job-00000-sub-01-ses-B'
+    """
+    if journal_cache_path is not None:
+        dict_branches = read_output_ria_push_journal(output_ria_data_dir, journal_cache_path)
+        if dict_branches is not None:
+            return dict_branches
+
+    packed_refs_path = op.join(output_ria_data_dir, "packed-refs")
+    refs_heads_path = op.join(output_ria_data_dir, "refs", "heads")
+
+    # Signature of the refs: if unchanged, use the cached one:
+    signature = []
+    for the_path in [packed_refs_path, refs_heads_path]:
+        if op.exists(the_path):
+            signature.append(os.stat(the_path).st_mtime_ns)
+        else:
+            signature.append(None)
+    signature = tuple(signature)
+
+    if output_ria_data_dir in CACHE_OUTPUT_RIA_REFS:
+        cached_signature, cached_dict_branches = CACHE_OUTPUT_RIA_REFS[output_ria_data_dir]
+        if cached_signature == signature:
+            return cached_dict_branches
+
+    list_branchnames = []
+    # Branches packed by `git pack-refs` or `git gc`:
+    if op.exists(packed_refs_path):
+        with open(packed_refs_path, "r") as f:
+            for line in f:
+                # e.g., '<sha> refs/heads/job-00000-sub-01'
+                # skip comments ('# pack-refs with: ...') and peeled tags ('^<sha>'):
+                if line[0:1] in ["#", "^"]:
+                    continue
+                temp = line.split()
+                if (len(temp) == 2) and (temp[1][0:11] == "refs/heads/"):
+                    list_branchnames.append(temp[1][11:])
+    # Loose branches, e.g., just pushed by jobs:
+    if op.exists(refs_heads_path):
+        with os.scandir(refs_heads_path) as it:
+            for entry in it:
+                if entry.name[0:4] == "job-":
+                    list_branchnames.append(entry.name)
+
+    dict_branches = {}
+    for branchname in list_branchnames:
+        key = parse_job_branchname(branchname)
+        if key is not None:
+            dict_branches[key] = branchname
+
+    CACHE_OUTPUT_RIA_REFS[output_ria_data_dir] = (signature, dict_branches)
+
+    return dict_branches
+
+def get_if_job_requested(df_job, df_job_specific, type_session, list_index_requested=None):
+    """
+    This is to check which jobs in `df_job` are requested in `df_job_specific`,
+    e.g., by `babs-status --resubmit-job`.
+
+    Parameters:
+    --------------
+    df_job: pd.DataFrame
+        job status dataframe, or a sub-set of it.
+    df_job_specific: pd.DataFrame or None
+        list of requested jobs; columns: 'sub_id' (and 'ses_id', if multi-ses)
+    type_session: str
+        "single-ses" or "multi-ses"
+    list_index_requested: list or None
+        indices of the requested jobs in the full job status dataframe,
+        e.g., from `BABS.find_jobs()`. If provided, it's used instead of
+        comparing (sub_id, ses_id) of `df_job` and `df_job_specific`.
+
+    Returns:
+    --------------
+    if_requested: pd.Series of bool
+        index is the same as `df_job`.
+        If `df_job_specific` is None, all elements are False.
+    """
+    if df_job_specific is None:
+        return pd.Series(False, index=df_job.index)
+
+    if list_index_requested is not None:
+        return pd.Series(df_job.index.isin(list_index_requested), index=df_job.index)
+
+    if type_session == "single-ses":
+        if_requested = df_job["sub_id"].isin(df_job_specific["sub_id"])
+    elif type_session == "multi-ses":
+        # compare (sub_id, ses_id) pairs with a hash-based lookup:
+        keys_job = pd.MultiIndex.from_frame(df_job[["sub_id", "ses_id"]])
+        keys_specific = pd.MultiIndex.from_frame(df_job_specific[["sub_id", "ses_id"]])
+        if_requested = pd.Series(keys_job.isin(keys_specific), index=df_job.index)
+
+    return if_requested
+
+def plan_job_status_actions(df_job, df_all_job_status, dict_branches, type_session,
+                            flags_resubmit, df_resubmit_job_specific=None, reckless=False,
+                            list_index_requested=None):
+    """
+    This is to decide what to do for each submitted job in `babs-status`,
+    by joining the job status dataframe, the snapshot of the job queue,
+    and the branches in output RIA, for all jobs at once.
+
+    Parameters:
+    --------------
+    df_job: pd.DataFrame
+        job status dataframe loaded from `job_status.csv`
+    df_all_job_status: pd.DataFrame
+        All jobs' status in the queue, from `request_all_job_status()`
+    dict_branches: dict
+        branches of jobs in output RIA, keyed by (sub_id, ses_id, job_id);
+        got from `get_output_ria_job_branches()`
+    type_session: str
+        "single-ses" or "multi-ses"
+    flags_resubmit: list
+        Under what condition to perform job resubmit.
+        Element choices are: 'failed', 'pending', 'stalled'.
+    df_resubmit_job_specific: pd.DataFrame or None
+        list of specified job(s) to resubmit, requested by `--resubmit-job`
+    reckless: bool
+        Whether to resubmit jobs listed in `df_resubmit_job_specific`,
+        even they're done or running.
+    list_index_requested: list or None
+        indices of jobs in `df_resubmit_job_specific` in `df_job`,
+        e.g., from `BABS.find_jobs()`; see `get_if_job_requested()`
+
+    Returns:
+    --------------
+    df_plan: pd.DataFrame
+        One row per submitted job; index is the same as in `df_job`.
+        Columns:
+        - action: what to do for this job; see `ACTION_*` in `constants.py`
+        - reason: why the job will be resubmitted, used in printed messages;
+            '' if not to resubmit
+        - if_warn_reckless: resubmit was requested for this done or running job,
+            but `--reckless` was not specified, so BABS won't resubmit it
+        - state_category: column '@state' in the job queue, e.g., 'running' or 'pending'
+        - state_code: column 'state' in the job queue, e.g., 'r', 'qw', 'eqw'
+        - start_time: column 'JAT_start_time' in the job queue
+    """
+    from .constants import (ACTION_MARK_DONE, ACTION_UPDATE_STATE, ACTION_NO_CHANGE,
+                            ACTION_MARK_FAILED, ACTION_RESUBMIT, ACTION_KILL_RESUBMIT)
+
+    df_submitted = df_job[df_job["has_submitted"]]
+
+    # Whether each job was done in previous round, or has a branch in output RIA now:
+    is_done_before = df_submitted["is_done"]
+    if type_session == "multi-ses":
+        list_ses = df_submitted["ses_id"]
+    elif type_session == "single-ses":
+        list_ses = [None] * df_submitted.shape[0]
+    has_branch = pd.Series([key in dict_branches for key in
+                            zip(df_submitted["sub_id"], list_ses, df_submitted["job_id"])],
+                           index=df_submitted.index, dtype=bool)
+
+    # Whether resubmission of each job is requested by `--resubmit-job`:
+    if_request = get_if_job_requested(df_submitted, df_resubmit_job_specific, type_session,
+                                      list_index_requested)
+
+    # Look up each job in the snapshot of the job queue:
+    #   if the queue is empty, `df_all_job_status` does not have any column
+    df_queue = df_all_job_status.reindex(columns=["@state", "state", "JAT_start_time"])
+    job_id_str = get_job_id_str(df_submitted)
+    in_queue = job_id_str.isin(df_queue.index)
+    state_category = job_id_str.map(df_queue["@state"])
+    state_code = job_id_str.map(df_queue["state"])
+    start_time = job_id_str.map(df_queue["JAT_start_time"])
+
+    is_running = in_queue & (state_code == "r")
+    is_pending = in_queue & (state_code == "qw")
+    is_stalled = in_queue & (state_code == "eqw")
+
+    # Jobs that have been submitted but not successful yet:
+    is_done_now = ~is_done_before & has_branch
+    is_in_queue = ~is_done_before & ~has_branch & in_queue
+    is_out_queue = ~is_done_before & ~has_branch & ~in_queue   # probably failed
+
+    # Conditions of resubmission:
+    kill_running = is_in_queue & is_running & if_request & reckless
+    kill_pending = is_in_queue & is_pending & (("pending" in flags_resubmit) | if_request)
+    kill_stalled = is_in_queue & is_stalled & (("stalled" in flags_resubmit) | if_request)
+    resubmit_failed = is_out_queue & (("failed" in flags_resubmit) | if_request)
+    resubmit_done = is_done_before & if_request & reckless
+    # ^^ a done job is usually out of the queue, so it's only killed if it's still in the queue:
+    kill_done = resubmit_done & in_queue
+
+    action = pd.Series(ACTION_NO_CHANGE, index=df_submitted.index, dtype=object)
+    action[is_done_now] = ACTION_MARK_DONE
+    action[is_in_queue & (is_running | is_pending | is_stalled)] = ACTION_UPDATE_STATE
+    # ^^ for other states in the queue (e.g., 't'), nothing to update
+    action[is_out_queue] = ACTION_MARK_FAILED
+    action[resubmit_failed | (resubmit_done & ~in_queue)] = ACTION_RESUBMIT
+    # ^^ no need to kill, as it's out of the queue
+    action[kill_running | kill_pending | kill_stalled | kill_done] = ACTION_KILL_RESUBMIT
+
+    reason = pd.Series("", index=df_submitted.index, dtype=object)
+    reason[kill_running] = "although it was running," \
+        + " resubmit for this job was requested and `--reckless` was specified."
+    reason[kill_pending] = "as it was pending and resubmit was requested."
+    reason[kill_stalled] = "as it was stalled and resubmit was requested."
+    reason[resubmit_failed] = "as it is failed and resubmit was requested."
+    reason[resubmit_done] = "although it is done," \
+        + " resubmit for this job was requested and `--reckless` was specified."
+
+    if_warn_reckless = if_request & (not reckless) & ((is_in_queue & is_running) | is_done_before)
+
+    df_plan = pd.DataFrame({"action": action,
+                            "reason": reason,
+                            "if_warn_reckless": if_warn_reckless,
+                            "state_category": state_category,
+                            "state_code": state_code,
+                            "start_time": start_time})
+
+    return df_plan
+
+def apply_job_status_plan(job_table, df_plan, time_now=None):
+    """
+    This is to apply actions in `df_plan` that only change the job status table,
+    i.e., `ACTION_MARK_DONE`, `ACTION_UPDATE_STATE` and `ACTION_MARK_FAILED`,
+    for all jobs at once, including the timestamps of these changes
+    (see `JOB_TIMESTAMP_COLUMNS` in `constants.py`).
+    Resubmissions and log-derived fields are handled by `BABS.babs_status()`.
+
+    Parameters:
+    --------------
+    job_table: JobStatusTable
+        the compact job status table to update (see `job_status_table.py`);
+        it will be updated in place
+    df_plan: pd.DataFrame
+        got from `plan_job_status_actions()`
+    time_now: float or None
+        unix timestamp of this check of job status; if None, current time is used
+    """
+    from .constants import ACTION_MARK_DONE, ACTION_UPDATE_STATE, ACTION_MARK_FAILED
+
+    cols_state = ["job_state_category", "job_state_code", "duration"]
+    if time_now is None:
+        time_now = round(time.time(), 3)
+
+    # Found the branch:
+    index_done = df_plan.index[df_plan["action"] == ACTION_MARK_DONE]
+    job_table.set(index_done, "is_done", True)
+    for col in cols_state:
+        job_table.set(index_done, col, np.nan)
+    #   ROADMAP: ^^ get duration via `qacct`
+    #       (though qacct may not be accurate)
+    job_table.set(index_done, "is_failed", False)
+    job_table.set(index_done, "time_finished", time_now)
+
+    # Still in the queue:
+    index_update = df_plan.index[df_plan["action"] == ACTION_UPDATE_STATE]
+    job_table.set(index_update, "job_state_category",
+                  df_plan.loc[index_update, "state_category"])
+    job_table.set(index_update, "job_state_code", df_plan.loc[index_update, "state_code"])
+    # get the duration of running jobs:
+    index_running = index_update[df_plan.loc[index_update, "state_code"] == "r"]
+    if len(index_running) > 0:
+        job_table.set(index_running, "duration",
+                      calcu_runtime(df_plan.loc[index_running, "start_time"]))
+        # record when the job started, if it's the first time it's seen running:
+        index_started = index_running[
+            job_table.df.loc[index_running, "time_started"].isna().to_numpy()]
+        time_started = get_start_timestamps(df_plan.loc[index_started, "start_time"],
+                                            time_now)
+        job_table.set(index_started, "time_started", time_started.fillna(time_now))
+
+    # Did not find in the queue, probably error:
+    index_failed = df_plan.index[df_plan["action"] == ACTION_MARK_FAILED]
+    job_table.set(index_failed, "is_failed", True)
+    for col in cols_state:
+        job_table.set(index_failed, col, np.nan)
+    # ROADMAP: ^^ get duration via `qacct`
+    # only record when the job was found failed for the first time:
+    index_failed = index_failed[job_table.df.loc[index_failed, "time_failed"].isna().to_numpy()]
+    job_table.set(index_failed, "time_failed", time_now)
+
 def request_job_status(job_id):
     """
     This is to determine the job status
@@ -1491,16 +2327,18 @@ def calcu_runtime(start_time_str):
 
     Parameters:
     -----------------
-    start_time_str: str
+    start_time_str: str or pd.Series of str
         The value in column 'JAT_start_time' for a specific job.
         Can be got via `df.at['2820901', 'JAT_start_time']`
         Example on CUBIC: ''
+        If it's a pd.Series (e.g., `df['JAT_start_time']`), durations of all jobs
+        will be calculated at once.
 
     TODO: add type_system
 
     Returns:
     -----------------
-    duration_time_str: str
+    duration_time_str: str or pd.Series of str
         Duration time of running.
         Format: '0:00:05.050744' (i.e., ~5sec), '2 days, 0:00:00'
     """
@@ -1510,6 +2348,14 @@ def calcu_runtime(start_time_str):
     # format_duration_time = "%Hh%Mm%Ss"  # '0h0m0s'
 
     d_now = datetime.now()
+
+    if isinstance(start_time_str, pd.Series):
+        # parse all start times at once, instead of `strptime` per job:
+        duration_time = d_now - pd.to_datetime(start_time_str, format=format_job_status)
+        # use the same format as `str(datetime.timedelta)`, e.g., '0:08:40.158985':
+        duration_time_str = duration_time.map(lambda x: str(x.to_pytimedelta()))
+        return duration_time_str
+
     duration_time = d_now - datetime.strptime(start_time_str, format_job_status)
     # ^^ str(duration_time): format: '0:08:40.158985'  # first is hour
     duration_time_str = str(duration_time)
@@ -1518,6 +2364,34 @@ def calcu_runtime(start_time_str):
 
     return duration_time_str
 
+def get_start_timestamps(start_time_str, time_now=None):
+    """
+    This is to convert the start time of running jobs into unix timestamps,
+    for all jobs at once.
+
+    Parameters:
+    -----------------
+    start_time_str: pd.Series of str
+        Values in column 'JAT_start_time' of the jobs, in local time,
+        e.g., '2023-01-01T12:00:00'
+    time_now: float or None
+        current unix timestamp; if None, `time.time()` is used
+
+    Returns:
+    -----------------
+    timestamps: pd.Series of float
+        unix timestamps; NaN if the start time can't be parsed
+    """
+    format_job_status = '%Y-%m-%dT%H:%M:%S'  # format in `qstat`
+    if time_now is None:
+        time_now = time.time()
+
+    start_time = pd.to_datetime(start_time_str, format=format_job_status, errors="coerce")
+    # local time -> unix timestamp, via the time elapsed since the start:
+    d_now = pd.Timestamp(datetime.fromtimestamp(time_now))
+    elapsed = (d_now - start_time).dt.total_seconds()
+    return (time_now - elapsed).round(3)
+
 def get_last_line(fn):
     """
     This is to get the last line of a text file, e.g., `*.o*` file
@@ -1530,22 +2404,152 @@ def get_last_line(fn):
     Returns:
     --------------------
     last_line: str or np.nan (if the log file haven't existed yet, or no valid line yet)
-        last line of the text file.
+        last non-empty line of the text file.
+
+    Notes:
+    --------------------
+    The result is cached by `read_last_line()` based on the size and modification time
+    of the file, so that an unchanged file won't be opened again.
     """
 
-    if op.exists(fn):
-        with open(fn, 'r') as f:
-            all_lines = f.readlines()
-            if len(all_lines) > 0:    # at least one line in the file:
-                last_line = all_lines[-1]
-                # remove spaces at the beginning or the end; remove '\n':
-                last_line = last_line.strip().replace("\n", "")
-            else:
-                last_line = np.nan
-    else:   # e.g., `qw` pending
-        last_line = np.nan
+    try:
+        stat_result = os.stat(fn)
+    except FileNotFoundError:   # e.g., `qw` pending
+        return np.nan
 
-    return last_line
+    return read_last_line(fn, stat_result.st_size, stat_result.st_mtime_ns)
+
+@functools.lru_cache(maxsize=1024)
+def read_last_line(fn, size, mtime_ns, block_size=8192):
+    """
+    This is to read the last non-empty line of a text file,
+    by reading blocks backwards from the end of the file,
+    instead of reading the whole file.
+    Please use `get_last_line()` instead of calling this directly.
+
+    Parameters:
+    --------------------
+    fn: str
+        path to the text file.
+    size: int
+        size of the file in bytes. Only the first `size` bytes will be read.
+    mtime_ns: int
+        modification time of the file in ns. Only used as part of the cache key.
+    block_size: int
+        number of bytes to read each time.
+
+    Returns:
+    --------------------
+    last_line: str or np.nan (if no valid line yet)
+        last non-empty line of the text file, with spaces at the beginning or the end removed.
+        Same as reading the file in text mode, '\r' is also treated as the end of a line;
+        a partially written line (without '\n' at the end) is counted as a line.
+    """
+    with open(fn, "rb") as f:
+        tail = b""
+        position = size
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            tail = f.read(read_size) + tail
+            lines = re.split(rb"[\r\n]", tail)
+            if position > 0:
+                # the first one may be only part of a line, unless it's the beginning of the file:
+                lines = lines[1:]
+            for line in reversed(lines):
+                last_line = line.decode("utf-8", errors="replace").strip()
+                if len(last_line) > 0:
+                    return last_line
+
+    return np.nan
+
+def get_log_files_signature(log_fn):
+    """
+    This is to get the signature of a job's log files,
+    i.e., the size and modification time of `.o` and `.e` files.
+    If the signature does not change, the log files have not changed.
+
+    Parameters:
+    -----------------
+    log_fn: str
+        Absolute path to a job's log files. It should have `*` to be replaced with `o` or `e`
+        Example: /path/to/analysis/logs/toy_sub-0000.*11111
+
+    Returns:
+    -----------------
+    signature: list
+        [signature of `.o` file, signature of `.e` file];
+        each is [size in bytes, modification time in ns], or None if the file does not exist.
+    """
+    signature = []
+    for one_char in ["o", "e"]:
+        try:
+            stat_result = os.stat(log_fn.replace("*", one_char))
+            signature.append([stat_result.st_size, stat_result.st_mtime_ns])
+        except FileNotFoundError:   # e.g., `qw` pending
+            signature.append(None)
+
+    return signature
+
+def read_log_files_cache(cache_path, config_keywords_alert):
+    """
+    This is to read the cache of log files saved by the previous `babs-status`.
+
+    Parameters:
+    -----------------
+    cache_path: str
+        path to the cache file, i.e., `job_status_log_cache.json`
+    config_keywords_alert: dict or None
+        From `get_config_keywords_alert()`.
+        If it's different from the one used when saving the cache,
+        the cache is not valid anymore, as `alert_message` needs to be updated.
+
+    Returns:
+    -----------------
+    dict_log_cache: dict
+        key: log filename of a job, e.g., 'toy_sub-0000.*11111';
+        value: dict; 'signature' is got from `get_log_files_signature()`.
+        If there is no (valid) cache, it's an empty dict.
+    """
+    if not op.exists(cache_path):
+        return {}
+
+    try:
+        with open(cache_path, "r") as f:
+            log_cache = json.load(f)
+    except ValueError:   # e.g., incomplete file; just don't use it
+        warnings.warn("Cannot read the cache of log files: " + cache_path
+                      + " . All log files will be checked.")
+        return {}
+
+    # `config_keywords_alert` has been saved in json, so compare after a roundtrip:
+    if log_cache.get("config_keywords_alert") != \
+            json.loads(json.dumps(config_keywords_alert)):
+        return {}
+
+    return log_cache.get("jobs", {})
+
+def write_log_files_cache(cache_path, config_keywords_alert, dict_log_cache):
+    """
+    This is to save the cache of log files, which will be used in next `babs-status`.
+    The file is replaced atomically.
+
+    Parameters:
+    -----------------
+    cache_path: str
+        path to the cache file, i.e., `job_status_log_cache.json`
+    config_keywords_alert: dict or None
+        From `get_config_keywords_alert()`.
+    dict_log_cache: dict
+        See `read_log_files_cache()`.
+    """
+    log_cache = {"config_keywords_alert": config_keywords_alert,
+                 "jobs": dict_log_cache}
+    temp_path = cache_path + ".tmp." + str(os.getpid())
+    with open(temp_path, "w") as f:
+        json.dump(log_cache, f)
+    os.replace(temp_path, cache_path)
 
 def get_config_keywords_alert(container_config_yaml_file):
     """
@@ -1600,7 +2604,117 @@ def get_config_keywords_alert(container_config_yaml_file):
 
     return config_keywords_alert
 
-def get_alert_message_in_log_files(config_keywords_alert, log_fn):
+def search_alert_keywords(text, keywords):
+    """
+    This is to find the alert keyword in a piece of log file.
+    Only the first line that contains any keyword is considered;
+    if there are several keywords in that line, the one listed first
+    in `keywords` is returned.
+
+    Parameters:
+    -----------------
+    text: str
+        text from a log file, consisting of lines
+    keywords: tuple of str
+        alert keywords of this kind of log file
+
+    Returns:
+    -----------------
+    keyword: str or None
+        the alert keyword found; None if not found.
+    """
+    # Find the first occurrence of any keyword:
+    #   `str.find()` of each keyword is much faster than one alternation regex (`a|b|c`)
+    #   in python's `re`, and the text is still only searched until the first match.
+    index_first = -1
+    for keyword in keywords:
+        end = len(text) if index_first < 0 else index_first + len(keyword)
+        index = text.find(keyword, 0, end)
+        if (index >= 0) and ((index_first < 0) or (index < index_first)):
+            index_first = index
+    if index_first < 0:
+        return None
+
+    # get the line where the first match is:
+    line_start = max(text.rfind("\n", 0, index_first),
+                     text.rfind("\r", 0, index_first)) + 1
+    line_end = len(text)
+    for end_of_line in ["\n", "\r"]:
+        temp = text.find(end_of_line, index_first)
+        if temp >= 0:
+            line_end = min(line_end, temp)
+    line = text[line_start:line_end]
+
+    # Loop across the keywords for this kind of log file:
+    for keyword in keywords:
+        if keyword in line:   # found:
+            return keyword
+
+def scan_log_file_for_alert(fn, keywords, scan_state, block_size=1048576):
+    """
+    This is to search alert keywords in a log file, starting from where
+    previous scan stopped, so that only newly appended lines are read.
+
+    Parameters:
+    -----------------
+    fn: str
+        path to the log file, which should exist
+    keywords: tuple of str
+        alert keywords of this kind of log file
+    scan_state: dict
+        checkpoint of previous scan of this log file; it will be updated in place.
+        'offset': number of bytes that have been scanned (only complete lines);
+        'found': the alert keyword found, or None.
+        Use an empty dict if this log file has not been scanned yet.
+    block_size: int
+        number of bytes to read each time.
+
+    Returns:
+    -----------------
+    keyword: str or None
+        the alert keyword found in this log file; None if not found.
+    """
+    if scan_state.get("found") is not None:
+        # the first alert keyword in a log file won't change as the file grows:
+        return scan_state["found"]
+
+    offset = scan_state.get("offset", 0)
+    if os.stat(fn).st_size < offset:
+        # the file is shorter than before, i.e., it's a new file; scan from the beginning:
+        offset = 0
+
+    found = None
+    with open(fn, "rb") as f:
+        f.seek(offset)
+        remainder = b""
+        while found is None:
+            block = f.read(block_size)
+            if len(block) == 0:   # end of the file
+                break
+            block = remainder + block
+            # only scan complete lines:
+            index_end_of_line = max(block.rfind(b"\n"), block.rfind(b"\r"))
+            if index_end_of_line < 0:
+                remainder = block
+                continue
+            remainder = block[index_end_of_line + 1:]
+            block = block[:index_end_of_line + 1]
+            found = search_alert_keywords(block.decode("utf-8", errors="replace"), keywords)
+            if found is None:
+                offset += len(block)
+
+        if (found is None) and (len(remainder) > 0):
+            # the last line is still being written; scan it, but don't move the offset,
+            #   so that this line will be scanned again next time:
+            found = search_alert_keywords(remainder.decode("utf-8", errors="replace"),
+                                          keywords)
+
+    scan_state["offset"] = offset
+    scan_state["found"] = found
+
+    return found
+
+def get_alert_message_in_log_files(config_keywords_alert, log_fn, dict_scan_state=None):
     """
     This is to get any alert message in log files of a job.
 
@@ -1612,6 +2726,10 @@ def get_alert_message_in_log_files(config_keywords_alert, log_fn):
     log_fn: str
         Absolute path to a job's log files. It should have `*` to be replaced with `o` or `e`
         Example: /path/to/analysis/logs/toy_sub-0000.*11111
+    dict_scan_state: dict or None
+        checkpoints of previous scans of this job's log files, see `scan_log_file_for_alert()`.
+        key: 'o_file' or 'e_file'. It will be updated in place.
+        If None, log files will be scanned from the beginning.
 
     Returns:
     ----------------
@@ -1633,6 +2751,11 @@ def get_alert_message_in_log_files(config_keywords_alert, log_fn):
     An edge case (not a bug): On cubic cluster, some info will be printed to '.e'
     before '.o' have any printed messages. So 'alert_message' column may say 'BABS: No alert'
     but 'last_line_o_file' is still 'NaN'
+
+    Each block of a log file is read once, and searched for all keywords
+    (see `search_alert_keywords()`);
+    the `.o` file is prior to `.e` file if listed first in `keywords_alert`,
+    and within a log file, the keyword in the earliest line is reported.
     """
 
     from .constants import MSG_NO_ALERT_IN_LOGS
@@ -1640,6 +2763,9 @@ def get_alert_message_in_log_files(config_keywords_alert, log_fn):
     if_valid_alert_msg = True    # by default, `alert_message` is valid (i.e., not np.nan)
     # this is to avoid check `np.isnan(alert_message)`, as `np.isnan(str)` causes error.
 
+    if dict_scan_state is None:
+        dict_scan_state = {}
+
     if config_keywords_alert is None:
         alert_message = np.nan
         if_valid_alert_msg = False
@@ -1648,34 +2774,24 @@ def get_alert_message_in_log_files(config_keywords_alert, log_fn):
         e_fn = log_fn.replace("*", 'e')
 
         if op.exists(o_fn) or op.exists(e_fn):   # either exists:
-            found_keyword = False
             alert_message = msg_no_alert
 
             for key in config_keywords_alert:  # as it's dict, keys cannot be duplicated
-                if key == "o_file" or "e_file":
-                    one_char = key[0]   # 'o' or 'e'
-                    # the log file to look into:
-                    fn = log_fn.replace("*", one_char)
-
-                    if op.exists(fn):
-                        with open(fn) as f:
-                            # Loop across lines, from the beginning of the file:
-                            for line in f:
-                                # Loop across the keywords for this kind of log file:
-                                for keyword in config_keywords_alert[key]:
-                                    if keyword in line:   # found:
-                                        found_keyword = True
-                                        alert_message = "." + one_char + " file: " + keyword
-                                        # e.g., '.o file: <keyword>'
-                                        break  # no need to search next keyword
-
-                                if found_keyword:
-                                    break    # no need to go to next line
-                    # if the log file does not exist, probably due to pending
-                    #   not to do anything
-
-                if found_keyword:
-                    break   # no need to go to next log file
+                one_char = key[0]   # 'o' or 'e'
+                # the log file to look into:
+                fn = log_fn.replace("*", one_char)
+
+                if op.exists(fn):
+                    if key not in dict_scan_state:
+                        dict_scan_state[key] = {}
+                    found_keyword = scan_log_file_for_alert(
+                        fn, tuple(config_keywords_alert[key]), dict_scan_state[key])
+                    if found_keyword is not None:
+                        alert_message = "." + one_char + " file: " + found_keyword
+                        # e.g., '.o file: <keyword>'
+                        break   # no need to go to next log file
+                # if the log file does not exist, probably due to pending
+                #   not to do anything
 
         else:    # neither o_fn nor e_fn exists yet:
             alert_message = np.nan
@@ -1689,6 +2805,59 @@ def get_alert_message_in_log_files(config_keywords_alert, log_fn):
 
     return alert_message, if_no_alert_in_log
 
+def inspect_job_log_files(log_fn, config_keywords_alert, log_cache,
+                          last_line_o_file, alert_message):
+    """
+    This is to inspect the log files of one job for `babs-status`,
+    i.e., get the last line of `.o` file and any alert message in log files.
+    It does not change any shared state, so it can be run for many jobs in parallel.
+
+    Parameters:
+    -----------------
+    log_fn: str
+        Absolute path to a job's log files. It should have `*` to be replaced with `o` or `e`
+        Example: /path/to/analysis/logs/toy_sub-0000.*11111
+    config_keywords_alert: dict or None
+        section 'keywords_alert' in container config yaml file
+    log_cache: dict
+        cache of this job's log files from previous `babs-status`,
+        see `read_log_files_cache()`; use an empty dict if not cached.
+    last_line_o_file: str or np.nan
+        column 'last_line_o_file' of this job in previous `babs-status`
+    alert_message: str or np.nan
+        column 'alert_message' of this job in previous `babs-status`
+
+    Returns:
+    -----------------
+    dict_result: dict
+        'last_line_o_file', 'alert_message', 'if_no_alert_in_log':
+            updated values of this job;
+            if the log files did not change, values from previous `babs-status` are kept;
+        'log_cache': updated cache of this job's log files.
+    """
+    from .constants import MSG_NO_ALERT_IN_LOGS
+
+    signature = get_log_files_signature(log_fn)
+    # checkpoints of scanning alert keywords in log files; copy, not to change the input:
+    dict_scan_state = copy.deepcopy(log_cache.get("alert_scan", {}))
+
+    if log_cache.get("signature") != signature:
+        # log files have changed since previous `babs-status`:
+        last_line_o_file = get_last_line(log_fn.replace(".*", ".o"))
+        # Check if any alert keywords in log files for this job:
+        #   only newly appended lines since previous scan will be read
+        alert_message, _ = get_alert_message_in_log_files(config_keywords_alert, log_fn,
+                                                          dict_scan_state)
+        # ^^ the function will handle even if `config_keywords_alert=None`
+
+    if_no_alert_in_log = pd.isna(alert_message) or (alert_message == MSG_NO_ALERT_IN_LOGS)
+
+    return {"last_line_o_file": last_line_o_file,
+            "alert_message": alert_message,
+            "if_no_alert_in_log": if_no_alert_in_log,
+            "log_cache": {"signature": signature,
+                          "alert_scan": dict_scan_state}}
+
 def get_username():
     """
     This is to get the current username.
@@ -1718,7 +2887,8 @@ def check_job_account(job_id_str, job_name, username_lowercase):
     Parameters:
     ------------
     job_id_str: str
-        string version of ID of the job
+        string version of ID of the job, see `get_job_id_str()`,
+        e.g., '1234', or '1234.5' for task 5 of array job 1234
     job_name: str
         Name of the job
     username_lowercase: str
@@ -1730,9 +2900,9 @@ def check_job_account(job_id_str, job_name, username_lowercase):
         The message got from `qacct` field `failed`, if that's not 0
         - If `qacct` was successful:
             - If field 'failed' in `qacct` was not 0: use string from that field
-            - If it's 0 (no error): use `msg_no_alert_qacct_failed`
+            - If it's 0 (no error): use `MSG_NO_ALERT_QACCT_FAILED` in `constants.py`
         - If `qacct` was NOT successful:
-            - use `msg_failed_to_call_qacct`
+            - use `MSG_FAILED_TO_CALL_QACCT` in `constants.py`
 
     Notes:
     ----------
@@ -1740,15 +2910,18 @@ def check_job_account(job_id_str, job_name, username_lowercase):
     jobs under qw, r, etc, or does not exist (not submitted);
     Also, the current username should be the same one as that used for job submission.
     """
-    msg_no_alert_qacct_failed = "qacct: no alert message in field 'failed'"
-    msg_failed_to_call_qacct = "BABS: failed to call 'qacct'"
+    from .constants import MSG_FAILED_TO_CALL_QACCT
+    msg_failed_to_call_qacct = MSG_FAILED_TO_CALL_QACCT
 
     if_valid_qacct_failed = True   # by default, it is valid, i.e., not np.nan
     # this is to avoid check `np.isnan(<variable_name>)`, as `np.isnan(str)` causes error.
 
+    job_number, _, task_id = job_id_str.partition(".")
+    cmd = ["qacct", "-o", username_lowercase, "-j", job_number]
+    if task_id != "":   # a task of an array job:
+        cmd += ["-t", task_id]
     proc_qacct = subprocess.run(
-        ["qacct", "-o", username_lowercase,
-         "-j", job_id_str],
+        cmd,
         stdout=subprocess.PIPE
     )
     try:
@@ -1760,11 +2933,17 @@ def check_job_account(job_id_str, job_name, username_lowercase):
         if len(list_qacct_failed) > 1:   # more than one job were found:
             # determine which is the job we want:
             list_jobnames = re.findall(r'(?:jobname)(.*?)(?:\n)', msg)
+            qacct_failed = None
             for i_temp, temp_jobname in enumerate(list_jobnames):
                 if job_name == temp_jobname.replace(" ", ""):  # remove spaces:
                     # ^^ the job name we want to find:
                     qacct_failed = list_qacct_failed[i_temp]
                     break
+            if qacct_failed is None:   # none of them is the job we want:
+                warnings.warn("Error when `qacct` for job " + job_id_str
+                              + ", " + job_name)
+                if_valid_qacct_failed = False
+                msg_toreturn = msg_failed_to_call_qacct
         elif len(list_qacct_failed) == 1:
             qacct_failed = list_qacct_failed[0]
         else:
@@ -1776,12 +2955,7 @@ def check_job_account(job_id_str, job_name, username_lowercase):
 
         if if_valid_qacct_failed:
             # example: '       0    '
-            qacct_failed = qacct_failed.strip()    # remove the spaces at the beginning and the end
-
-            if qacct_failed != "0":   # field `failed` is not '0', i.e., was not success:
-                msg_toreturn = "qacct: failed: " + qacct_failed
-            else:
-                msg_toreturn = msg_no_alert_qacct_failed
+            msg_toreturn = get_msg_job_account(qacct_failed)
 
     except subprocess.CalledProcessError:   # if `proc_qacct.check_returncode()` failed:
         # if the job is still in queue (qw or r etc), this will throw out an error:
@@ -1794,3 +2968,185 @@ def check_job_account(job_id_str, job_name, username_lowercase):
         msg_toreturn = msg_failed_to_call_qacct
 
     return msg_toreturn
+
+def parse_qacct_records(lines):
+    """
+    This is to parse the output of `qacct -j` (SGE) record by record,
+    without loading the whole output into memory.
+
+    Parameters:
+    ------------
+    lines: iterable of str
+        lines of the output of `qacct`, e.g., `proc.stdout` of `subprocess.Popen`
+
+    Yields:
+    ------------
+    record: dict
+        one job's accounting record, e.g., {'jobname': 'toy_sub-0000', 'jobnumber': '11111',
+        'failed': '37  : qmaster enforced h_rt, h_cpu, or h_vmem limit', ...}
+        Values are stripped.
+    """
+    record = {}
+    for line in lines:
+        if line.startswith("====="):   # separator between records
+            if len(record) > 0:
+                yield record
+            record = {}
+            continue
+        temp = line.strip().split(None, 1)
+        if len(temp) == 0:
+            continue
+        record[temp[0]] = temp[1].strip() if len(temp) > 1 else ""
+    if len(record) > 0:
+        yield record
+
+def get_msg_job_account(qacct_failed):
+    """
+    This is to get the message of job account from field `failed` of `qacct`.
+
+    Parameters:
+    ------------
+    qacct_failed: str
+        field `failed` of `qacct`, e.g., '0',
+        or '37  : qmaster enforced h_rt, h_cpu, or h_vmem limit'
+
+    Returns:
+    ------------
+    msg_toreturn: str
+        See `check_job_account()`.
+    """
+    from .constants import MSG_NO_ALERT_QACCT_FAILED
+
+    qacct_failed = qacct_failed.strip()    # remove the spaces at the beginning and the end
+    if qacct_failed != "0":   # field `failed` is not '0', i.e., was not success:
+        return "qacct: failed: " + qacct_failed
+    else:
+        return MSG_NO_ALERT_QACCT_FAILED
+
+def read_job_account_cache(cache_path):
+    """
+    This is to read the cache of job account saved by previous `babs-status --job-account`.
+
+    Parameters:
+    ------------
+    cache_path: str
+        path to the cache file, i.e., `job_account_cache.json`
+
+    Returns:
+    ------------
+    dict_job_account_cache: dict
+        key: job ID (str);
+        value: dict of 'job_name' and 'job_account' (message from `get_msg_job_account()`).
+        If there is no (valid) cache, it's an empty dict.
+    """
+    if not op.exists(cache_path):
+        return {}
+
+    try:
+        with open(cache_path, "r") as f:
+            return json.load(f)
+    except ValueError:   # e.g., incomplete file; just don't use it
+        warnings.warn("Cannot read the cache of job account: " + cache_path
+                      + " . Job account will be requested for all jobs.")
+        return {}
+
+def write_job_account_cache(cache_path, dict_job_account_cache):
+    """
+    This is to save the cache of job account. The file is replaced atomically.
+
+    Parameters:
+    ------------
+    cache_path: str
+        path to the cache file, i.e., `job_account_cache.json`
+    dict_job_account_cache: dict
+        See `read_job_account_cache()`.
+    """
+    temp_path = cache_path + ".tmp." + str(os.getpid())
+    with open(temp_path, "w") as f:
+        json.dump(dict_job_account_cache, f)
+    os.replace(temp_path, cache_path)
+
+def check_job_account_bulk(dict_job_name, username_lowercase, cache_path):
+    """
+    This is to get information for many finished jobs at once,
+    by calling job account command (e.g., `qacct` for SGE) only once.
+
+    Finished jobs' accounting won't change, so results are saved in a cache file,
+    and jobs that are already in the cache won't be requested again.
+
+    Parameters:
+    ------------
+    dict_job_name: dict
+        key: job ID (str), see `get_job_id_str()`; value: name of the job
+    username_lowercase: str
+        username that these jobs were requested to run
+    cache_path: str
+        path to the cache file, i.e., `job_account_cache.json`
+
+    Returns:
+    ------------
+    dict_job_account: dict
+        key: job ID (str); value: message of job account, see `check_job_account()`
+
+    Notes:
+    ----------
+    All accounting records of the user are requested in one `qacct` call,
+    limited to the jobs whose names start with the common prefix of these jobs' names
+    (e.g., `qacct -o <username> -j 'toy_sub-*'`), and the output is parsed record by record.
+    If that `qacct` call failed, or for jobs not found in its output,
+    `check_job_account()` is called for each job, as before.
+    """
+    from .constants import MSG_FAILED_TO_CALL_QACCT
+
+    dict_job_account_cache = read_job_account_cache(cache_path)
+    dict_job_account = {}
+
+    # Jobs already in the cache:
+    #   job ID may be reused by the cluster, so also check the job name:
+    for job_id_str, job_name in dict_job_name.items():
+        if job_id_str in dict_job_account_cache:
+            if dict_job_account_cache[job_id_str]["job_name"] == job_name:
+                dict_job_account[job_id_str] = \
+                    dict_job_account_cache[job_id_str]["job_account"]
+    dict_job_name_todo = {job_id_str: job_name
+                          for job_id_str, job_name in dict_job_name.items()
+                          if job_id_str not in dict_job_account}
+
+    if len(dict_job_name_todo) > 0:
+        # Request job account of all these jobs at once:
+        cmd = ["qacct", "-o", username_lowercase, "-j"]
+        prefix_job_name = op.commonprefix(list(dict_job_name_todo.values()))
+        if len(prefix_job_name) > 0:
+            cmd.append(prefix_job_name + "*")   # e.g., 'toy_sub-*'
+        dict_qacct_failed = {}   # key: job ID; value: list of (job name, field `failed`)
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True) as proc_qacct:
+            for record in parse_qacct_records(proc_qacct.stdout):
+                job_id_str = record.get("jobnumber")
+                if (job_id_str is not None) and \
+                        (record.get("taskid", "undefined") != "undefined"):
+                    # a task of an array job, see `get_job_id_str()`:
+                    job_id_str += "." + record["taskid"]
+                if (job_id_str in dict_job_name_todo) and ("failed" in record):
+                    dict_qacct_failed.setdefault(job_id_str, []).append(
+                        (record.get("jobname"), record["failed"]))
+
+        for job_id_str, job_name in dict_job_name_todo.items():
+            list_records = dict_qacct_failed.get(job_id_str, [])
+            if len(list_records) > 1:   # more than one job were found:
+                # determine which is the job we want:
+                list_records = [x for x in list_records if x[0] == job_name]
+            if len(list_records) > 0:
+                msg_job_account = get_msg_job_account(list_records[0][1])
+                dict_job_account_cache[job_id_str] = {"job_name": job_name,
+                                                      "job_account": msg_job_account}
+            else:   # not found; request this job alone:
+                msg_job_account = check_job_account(job_id_str, job_name, username_lowercase)
+                if msg_job_account != MSG_FAILED_TO_CALL_QACCT:
+                    dict_job_account_cache[job_id_str] = {"job_name": job_name,
+                                                          "job_account": msg_job_account}
+            dict_job_account[job_id_str] = msg_job_account
+
+        write_job_account_cache(cache_path, dict_job_account_cache)
+
+    return dict_job_account
@@ -0,0 +1,89 @@
+# This is to benchmark how long `babs-status` takes to reconcile the job status
+#   of a large BABS project, i.e., `plan_job_status_actions()` + `apply_job_status_plan()`.
+# A synthetic job status dataframe, job queue and branches in output RIA are used,
+#   so no cluster or BABS project is needed.
+# Usage:
+#   $ python benchmark_babs_status.py [<number of jobs>]
+
+import sys
+import os
+import os.path as op
+import time
+import numpy as np
+import pandas as pd
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+sys.path.append(op.dirname(__location__))   # print(sys.path)
+from babs.utils import (plan_job_status_actions,   # noqa: E402
+                        apply_job_status_plan,
+                        add_missing_job_status_columns)
+from babs.job_status_table import JobStatusTable   # noqa: E402
+
+
+def generate_synthetic_project(num_jobs, seed=0):
+    """
+    Generate a synthetic multi-ses job status dataframe, snapshot of the job queue,
+    and branches in output RIA.
+    """
+    rng = np.random.default_rng(seed)
+
+    df_job = pd.DataFrame({
+        "sub_id": ["sub-" + str(i // 2).zfill(6) for i in range(num_jobs)],
+        "ses_id": ["ses-" + "AB"[i % 2] for i in range(num_jobs)]})
+    df_job["has_submitted"] = rng.random(num_jobs) < 0.9
+    df_job["job_id"] = np.where(df_job["has_submitted"], np.arange(num_jobs) + 1000000, -1)
+    df_job["job_state_category"] = np.nan
+    df_job["job_state_code"] = np.nan
+    df_job["duration"] = np.nan
+    df_job["is_done"] = df_job["has_submitted"] & (rng.random(num_jobs) < 0.5)
+    df_job["is_failed"] = np.nan
+    df_job["log_filename"] = np.nan
+    df_job["last_line_o_file"] = np.nan
+    df_job["alert_message"] = np.nan
+    df_job["job_account"] = np.nan
+    add_missing_job_status_columns(df_job)
+
+    # what happened to the jobs that are not done yet:
+    to_check = df_job["has_submitted"] & ~df_job["is_done"]
+    kind = pd.Series(rng.choice(["branch", "r", "qw", "eqw", "failed"], num_jobs),
+                     index=df_job.index)
+
+    # branches in output RIA: jobs done in previous round, plus newly finished ones:
+    has_branch = df_job["is_done"] | (to_check & (kind == "branch"))
+    dict_branches = {}
+    for sub, ses, job_id in zip(df_job["sub_id"][has_branch], df_job["ses_id"][has_branch],
+                                df_job["job_id"][has_branch]):
+        dict_branches[(sub, ses, job_id)] = "job-" + str(job_id) + "-" + sub + "-" + ses
+
+    # the job queue:
+    in_queue = to_check & kind.isin(["r", "qw", "eqw"])
+    df_all_job_status = pd.DataFrame({
+        "JB_job_number": df_job["job_id"][in_queue].astype(str),
+        "@state": np.where(kind[in_queue] == "r", "running", "pending"),
+        "state": kind[in_queue],
+        "JAT_start_time": np.where(kind[in_queue] == "r", "2023-01-01T00:00:00", None)})
+    df_all_job_status = df_all_job_status.set_index("JB_job_number")
+
+    return df_job, df_all_job_status, dict_branches
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        list_num_jobs = [int(sys.argv[1])]
+    else:
+        list_num_jobs = [1000, 10000, 100000]
+
+    for num_jobs in list_num_jobs:
+        df_job, df_all_job_status, dict_branches = generate_synthetic_project(num_jobs)
+
+        time_start = time.perf_counter()
+        df_plan = plan_job_status_actions(df_job, df_all_job_status, dict_branches,
+                                          "multi-ses", ["pending"])
+        time_plan = time.perf_counter()
+        apply_job_status_plan(JobStatusTable(df_job), df_plan)
+        time_apply = time.perf_counter()
+
+        print(str(num_jobs) + " jobs: "
+              + "plan: " + "{:.3f}".format(time_plan - time_start) + " sec; "
+              + "apply: " + "{:.3f}".format(time_apply - time_plan) + " sec; "
+              + "actions: " + str(df_plan["action"].value_counts().to_dict()))
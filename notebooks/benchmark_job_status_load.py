@@ -0,0 +1,153 @@
+# This is to benchmark loading the job status table from `job_status.csv`
+#   vs. from the Parquet snapshot `job_status.parquet` (needs `pyarrow`),
+#   including loading only the columns needed by `report_job_status()`.
+# A synthetic job status table is used, so no cluster or BABS project is needed.
+# Each load runs in a new process, so that its peak memory (RSS) can be measured;
+#   the reported peak RSS is the increase from the process after importing packages.
+# Usage:
+#   $ python benchmark_job_status_load.py [<number of jobs>]
+
+import sys
+import os
+import os.path as op
+import time
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+sys.path.append(op.dirname(__location__))   # print(sys.path)
+from babs.utils import (read_job_status_csv,   # noqa: E402
+                        write_job_status_csv)
+from babs.constants import JOB_STATUS_REPORT_COLUMNS   # noqa: E402
+import babs.job_status_store   # noqa: E402
+from babs.job_status_store import (write_parquet_snapshot,   # noqa: E402
+                                   read_parquet_snapshot)
+
+
+def generate_synthetic_table(num_jobs, seed=0):
+    """
+    Generate a synthetic multi-ses job status dataframe, in the middle of a run:
+    most jobs are done, some are running or pending, and some failed with alert messages.
+    """
+    rng = np.random.default_rng(seed)
+    kind = rng.choice(["done", "running", "pending", "failed", "not_submitted"],
+                      num_jobs, p=[0.6, 0.1, 0.1, 0.1, 0.1])
+    submitted = kind != "not_submitted"
+    job_id = np.where(submitted, np.arange(num_jobs) + 1000000, -1)
+    sub_id = np.array(["sub-" + str(i // 2).zfill(7) for i in range(num_jobs)], dtype=object)
+    ses_id = np.array(["ses-" + "AB"[i % 2] for i in range(num_jobs)], dtype=object)
+
+    df_job = pd.DataFrame({"sub_id": sub_id, "ses_id": ses_id})
+    df_job["has_submitted"] = submitted
+    df_job["job_id"] = job_id
+    df_job["job_state_category"] = np.where(
+        kind == "running", "running", np.where(kind == "pending", "pending", None))
+    df_job["job_state_code"] = np.where(
+        kind == "running", "r", np.where(kind == "pending", "qw", None))
+    df_job["duration"] = np.where(kind == "running", "0:12:34.567890", None)
+    df_job["is_done"] = kind == "done"
+    df_job["is_failed"] = np.where(submitted & (kind != "done"), kind == "failed", None)
+    df_job["log_filename"] = np.where(
+        submitted, "toy_" + sub_id + "_" + ses_id + ".*" + job_id.astype(str), None)
+    df_job["last_line_o_file"] = np.where(
+        submitted, "fMRIPrep finished successfully! Please check the output for details.",
+        None)
+    df_job["alert_message"] = np.where(
+        kind == "failed",
+        rng.choice(["stdout file: Cannot allocate memory",
+                    "stderr file: Killed",
+                    "BABS: No alert keyword found in log files."], num_jobs),
+        None)
+    df_job["job_account"] = np.where(
+        kind == "failed", "qacct: failed: 37  : qmaster enforced h_rt, h_cpu, or h_vmem limit",
+        None)
+    # timestamps of the current attempt, submitted within one day:
+    time_submitted = (1.7e9 + rng.uniform(0, 86400, num_jobs)).round(3)
+    time_started = (time_submitted + rng.exponential(600, num_jobs)).round(3)
+    time_ended = (time_started + rng.gamma(4, 900, num_jobs)).round(3)
+    df_job["time_submitted"] = np.where(submitted, time_submitted, np.nan)
+    df_job["time_started"] = np.where(np.isin(kind, ["running", "done", "failed"]),
+                                      time_started, np.nan)
+    df_job["time_finished"] = np.where(kind == "done", time_ended, np.nan)
+    df_job["time_failed"] = np.where(kind == "failed", time_ended, np.nan)
+    # as in `job_status.csv`, missing values are NaN:
+    df_job = df_job.where(pd.notna(df_job), np.nan)
+    return df_job
+
+
+def load(how, path):
+    """
+    Load the job status table in one of the ways to compare.
+    """
+    if how == "csv":
+        return read_job_status_csv(path)
+    elif how == "csv_report_columns":
+        return read_job_status_csv(path)[JOB_STATUS_REPORT_COLUMNS]
+    elif how == "parquet":
+        return read_parquet_snapshot(path)
+    elif how == "parquet_report_columns":
+        return read_parquet_snapshot(path, JOB_STATUS_REPORT_COLUMNS)
+
+
+def measure_in_subprocess(how, path):
+    """
+    Load the table in a new process; return the time used (sec) and the increase of peak RSS (MB).
+    """
+    proc = subprocess.run([sys.executable, __file__, "--load", how, path],
+                          stdout=subprocess.PIPE, check=True)
+    time_used, peak_rss_mb = proc.stdout.decode().split()
+    return float(time_used), float(peak_rss_mb)
+
+
+def get_peak_rss_mb():
+    # peak RSS of this process (Linux only); `VmHWM` is in kB.
+    #   `ru_maxrss` is not used, as it's kept across `exec` from the parent process.
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+
+if __name__ == "__main__":
+    if (len(sys.argv) > 1) and (sys.argv[1] == "--load"):   # in the subprocess:
+        how, path = sys.argv[2], sys.argv[3]
+        peak_rss_before = get_peak_rss_mb()
+        time_start = time.perf_counter()
+        df = load(how, path)
+        time_used = time.perf_counter() - time_start
+        print(str(time_used) + " " + str(get_peak_rss_mb() - peak_rss_before))
+        sys.exit(0)
+
+    if len(sys.argv) > 1:
+        list_num_jobs = [int(sys.argv[1])]
+    else:
+        list_num_jobs = [10000, 100000, 1000000]
+
+    list_how = ["csv", "csv_report_columns"]
+    if babs.job_status_store.pa is not None:
+        list_how += ["parquet", "parquet_report_columns"]
+    else:
+        print("`pyarrow` is not installed; only loading from CSV is benchmarked.")
+
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = op.join(folder, "job_status.csv")
+        parquet_path = op.join(folder, "job_status.parquet")
+        for num_jobs in list_num_jobs:
+            df_job = generate_synthetic_table(num_jobs)
+            write_job_status_csv(df_job, csv_path)
+            if babs.job_status_store.pa is not None:
+                write_parquet_snapshot(read_job_status_csv(csv_path), parquet_path, 0)
+                # the snapshot should give the same table as the CSV:
+                pd.testing.assert_frame_equal(read_job_status_csv(csv_path),
+                                              read_parquet_snapshot(parquet_path))
+
+            print(str(num_jobs) + " jobs: CSV " + "{:.1f}".format(op.getsize(csv_path) / 1e6)
+                  + " MB" + ("; Parquet " + "{:.1f}".format(op.getsize(parquet_path) / 1e6)
+                             + " MB" if op.exists(parquet_path) else ""))
+            for how in list_how:
+                time_used, peak_rss_mb = measure_in_subprocess(
+                    how, parquet_path if how.startswith("parquet") else csv_path)
+                print("    " + how.ljust(24) + "{:8.3f}".format(time_used) + " sec;"
+                      + " peak RSS +" + "{:.1f}".format(peak_rss_mb) + " MB")
@@ -0,0 +1,45 @@
+# This is to benchmark the memory used by the job status table in `babs-status`:
+#   the table as loaded from `job_status.csv` vs. the compact `JobStatusTable`,
+#   and the time to convert between them.
+# A synthetic job status table is used (see `benchmark_job_status_load.py`),
+#   so no cluster or BABS project is needed.
+# Usage:
+#   $ python benchmark_job_status_memory.py [<number of jobs>]
+
+import sys
+import os
+import os.path as op
+import time
+import pandas as pd
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+sys.path.append(op.dirname(__location__))   # print(sys.path)
+sys.path.append(__location__)
+from babs.job_status_table import JobStatusTable   # noqa: E402
+from benchmark_job_status_load import generate_synthetic_table   # noqa: E402
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        list_num_jobs = [int(sys.argv[1])]
+    else:
+        list_num_jobs = [10000, 100000, 1000000]
+
+    for num_jobs in list_num_jobs:
+        df_job = generate_synthetic_table(num_jobs)
+        num_bytes_df = int(df_job.memory_usage(index=True, deep=True).sum())
+
+        time_start = time.perf_counter()
+        job_table = JobStatusTable(df_job)
+        time_compact = time.perf_counter()
+        df_back = job_table.to_frame()
+        time_back = time.perf_counter()
+        # the compact table should give the same table back:
+        pd.testing.assert_frame_equal(df_job, df_back)
+
+        print(str(num_jobs) + " jobs: "
+              + "dataframe " + "{:.1f}".format(num_bytes_df / num_jobs) + " bytes/job; "
+              + "JobStatusTable " + "{:.1f}".format(job_table.memory_usage() / num_jobs)
+              + " bytes/job; "
+              + "to compact: " + "{:.3f}".format(time_compact - time_start) + " sec; "
+              + "back: " + "{:.3f}".format(time_back - time_compact) + " sec")
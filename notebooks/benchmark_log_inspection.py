@@ -0,0 +1,95 @@
+# This is to benchmark how long `babs-status` takes to inspect jobs' log files
+#   (last line of `.o` file + alert keywords) with different number of threads (`--jobs`).
+# A synthetic log directory is generated, so no cluster or BABS project is needed.
+# To mimic a network file system (e.g., Lustre, NFS), where each stat/open takes
+#   milliseconds, a latency can be added to each inspection of a job's log files.
+# Usage:
+#   $ python benchmark_log_inspection.py [<number of jobs>] [<latency in ms>]
+
+import sys
+import os
+import os.path as op
+import time
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+sys.path.append(op.dirname(__location__))   # print(sys.path)
+import babs.utils   # noqa: E402
+from babs.utils import inspect_job_log_files   # noqa: E402
+
+KEYWORDS_ALERT = {"o_file": ["Excessive topologic defect", "Cannot allocate memory"],
+                  "e_file": ["Exception", "Traceback", "Killed"]}
+
+
+def generate_synthetic_logs(folder, num_jobs, seed=0):
+    """
+    Generate `.o` and `.e` log files of `num_jobs` jobs in `folder`.
+    Returns the list of log filenames (with `*`).
+    """
+    rng = np.random.default_rng(seed)
+    list_log_filename = []
+    for i_job in range(num_jobs):
+        log_filename = "toy_sub-" + str(i_job).zfill(6) + ".*" + str(1000000 + i_job)
+        with open(op.join(folder, log_filename.replace("*", "o")), "w") as f:
+            for i_line in range(rng.integers(100, 2000)):
+                f.write("line " + str(i_line) + " of the output of the BIDS App\n")
+            f.write("SUCCESS\n")
+        with open(op.join(folder, log_filename.replace("*", "e")), "w") as f:
+            for i_line in range(rng.integers(10, 200)):
+                f.write("warning " + str(i_line) + "\n")
+            if rng.random() < 0.1:
+                f.write("Killed\n")
+        list_log_filename.append(log_filename)
+    return list_log_filename
+
+
+def add_latency(latency_sec):
+    """
+    Add a latency to each stat of a job's log files, to mimic a network file system.
+    """
+    get_log_files_signature = babs.utils.get_log_files_signature
+
+    def get_log_files_signature_slow(log_fn):
+        time.sleep(latency_sec)
+        return get_log_files_signature(log_fn)
+
+    babs.utils.get_log_files_signature = get_log_files_signature_slow
+
+
+def inspect_all(folder, list_log_filename, jobs):
+    """
+    Inspect log files of all jobs with `jobs` threads, as in `babs-status`
+    (without cache from previous `babs-status`).
+    """
+    def inspect_one_job(log_filename):
+        return inspect_job_log_files(op.join(folder, log_filename), KEYWORDS_ALERT, {},
+                                     np.nan, np.nan)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(inspect_one_job, list_log_filename))
+
+
+if __name__ == "__main__":
+    num_jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    if latency_ms > 0:
+        add_latency(latency_ms / 1000)
+
+    with tempfile.TemporaryDirectory() as folder:
+        list_log_filename = generate_synthetic_logs(folder, num_jobs)
+        print(str(num_jobs) + " jobs; latency: " + str(latency_ms) + " ms per job")
+
+        list_results_1 = None
+        for jobs in [1, 8, 32]:
+            babs.utils.read_last_line.cache_clear()
+            time_start = time.perf_counter()
+            list_results = inspect_all(folder, list_log_filename, jobs)
+            time_used = time.perf_counter() - time_start
+            print("--jobs " + str(jobs) + ": " + "{:.3f}".format(time_used) + " sec")
+
+            # results should not depend on number of threads:
+            if list_results_1 is None:
+                list_results_1 = list_results
+            assert list_results == list_results_1
@@ -0,0 +1,96 @@
+# This is to benchmark how long it takes to get the job submission commands of many jobs
+#   from the job submission template (`analysis/code/submit_job_template.yaml`):
+#   - "yaml per job": the template yaml file is loaded for every job, and the command
+#       is filled in with `str.replace()` and split with `str.split()` (as BABS used to do);
+#   - "replace + split": the same, but the yaml file is only loaded once;
+#   - "compiled": with `SubmitJobTemplate` (see `submit_job_template.py`),
+#       which is loaded and compiled only once per process.
+# Only the commands are rendered; no job is submitted, so no cluster is needed.
+# Usage:
+#   $ python benchmark_submit_job_template.py [<number of commands>]
+
+import sys
+import os
+import os.path as op
+import time
+import tempfile
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+sys.path.append(op.dirname(__location__))   # print(sys.path)
+from babs.submit_job_template import (read_submit_job_template,   # noqa: E402
+                                      get_submit_job_template)
+
+MAX_YAML_PER_JOB = 2000   # the slowest way is only timed for this many commands
+NUM_REPEATS = 3
+
+
+def write_template(analysis_path):
+    """
+    Write a template yaml file of a multi-ses BABS project, as by `babs-init`.
+    """
+    os.makedirs(op.join(analysis_path, "code"))
+    cmd = "qsub -cwd -v DSLOCKFILE=" + analysis_path + "/.SGE_datalad_lock" \
+        + " -N toy_${sub_id}_${ses_id}" \
+        + " -e " + analysis_path + "/logs -o " + analysis_path + "/logs " \
+        + analysis_path + "/code/participant_job.sh" \
+        + " ria+file:///path/to/input_ria#0123-4567" \
+        + " /path/to/output_ria/012/34567 ${sub_id} ${ses_id} cbica_tmpdir"
+    with open(op.join(analysis_path, "code", "submit_job_template.yaml"), "w") as f:
+        f.write("cmd_template: '" + cmd + "'\n")
+        f.write("job_name_template: 'toy_${sub_id}_${ses_id}'\n")
+
+
+def render_yaml_per_job(analysis_path, list_sub_ses):
+    list_argv = []
+    for sub, ses in list_sub_ses:
+        templates = read_submit_job_template(analysis_path)
+        cmd = templates["cmd_template"].replace("${sub_id}", sub).replace("${ses_id}", ses)
+        job_name = templates["job_name_template"].replace("${sub_id}", sub) \
+            .replace("${ses_id}", ses)
+        list_argv.append((cmd.split(), job_name))
+    return list_argv
+
+
+def render_replace_split(analysis_path, list_sub_ses):
+    templates = read_submit_job_template(analysis_path)
+    list_argv = []
+    for sub, ses in list_sub_ses:
+        cmd = templates["cmd_template"].replace("${sub_id}", sub).replace("${ses_id}", ses)
+        job_name = templates["job_name_template"].replace("${sub_id}", sub) \
+            .replace("${ses_id}", ses)
+        list_argv.append((cmd.split(), job_name))
+    return list_argv
+
+
+def render_compiled(analysis_path, list_sub_ses):
+    return get_submit_job_template(analysis_path).get_jobs_argv(list_sub_ses)
+
+
+if __name__ == "__main__":
+    num_cmds = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    list_sub_ses = [("sub-" + str(i // 2).zfill(6), "ses-" + "AB"[i % 2])
+                    for i in range(num_cmds)]
+
+    with tempfile.TemporaryDirectory() as analysis_path:
+        write_template(analysis_path)
+        print("Rendering " + str(num_cmds) + " job submission commands:")
+        list_expected = None
+        for name, func, n in [("yaml per job", render_yaml_per_job,
+                               min(num_cmds, MAX_YAML_PER_JOB)),
+                              ("replace + split", render_replace_split, num_cmds),
+                              ("compiled", render_compiled, num_cmds)]:
+            time_elapsed = None
+            for i_repeat in range(NUM_REPEATS):   # the best of several runs
+                time_start = time.perf_counter()
+                list_argv = func(analysis_path, list_sub_ses[:n])
+                time_one = time.perf_counter() - time_start
+                time_elapsed = time_one if time_elapsed is None else min(time_elapsed, time_one)
+            if list_expected is None:
+                list_expected = list_argv
+            # same commands, for the paths without spaces here:
+            assert list_argv[:len(list_expected)] == list_expected[:len(list_argv)]
+            print("  " + name.ljust(16) + ": "
+                  + str(round(time_elapsed / n * 1e6, 2)) + " us per command; "
+                  + str(round(time_elapsed / n * num_cmds, 3)) + " s for "
+                  + str(num_cmds) + " commands"
+                  + ("" if n == num_cmds else " (extrapolated from " + str(n) + ")"))
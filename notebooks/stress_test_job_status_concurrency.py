@@ -0,0 +1,259 @@
+# This is a stress test of updating the job status table from several processes
+#   at the same time, as `babs-submit` and `babs-status` do, i.e., reading the table
+#   without the lock, changing it, and saving the changes with `JobStatusStore.commit()`.
+# No cluster or BABS project is needed: a synthetic job status table is used,
+#   and submitting a job just takes a new job ID (after some delay).
+# Processes:
+#   - "submit": repeatedly submits several not-submitted jobs (overlapping with other
+#       "submit" processes on purpose), like `babs-submit`;
+#   - "status": repeatedly marks jobs as done, failed, or running, updates alert messages,
+#       and resubmits some failed jobs, like `babs-status --resubmit failed`;
+#   - "reader": repeatedly loads the table without the lock, like `babs-status --json`,
+#       and records the longest time of one load.
+# At the end, it checks that:
+#   - every job ID in the table was submitted, and was not killed as a duplicate;
+#   - every submitted job that was not killed is (or was, before being resubmitted)
+#       in the table, i.e., no job is lost, and no job ID is in more than one row;
+#   - the table replayed from the event log is the same as the saved table.
+# Usage:
+#   $ python stress_test_job_status_concurrency.py [<backend> [<number of jobs>]]
+#   backend: 'csv' (default), 'sqlite' or 'events'
+
+import sys
+import os
+import os.path as op
+import time
+import json
+import random
+import tempfile
+import multiprocessing
+import numpy as np
+import pandas as pd
+
+__location__ = os.path.realpath(os.path.join(os.getcwd(), os.path.dirname(__file__)))
+sys.path.append(op.dirname(__location__))   # print(sys.path)
+from babs.job_status_store import get_job_status_store   # noqa: E402
+from babs.job_status_table import JobStatusTable   # noqa: E402
+from babs.job_status_events import materialize_job_status   # noqa: E402
+
+NUM_SUBMIT = 3
+NUM_STATUS = 3
+NUM_READER = 2
+NUM_ROUNDS = 15   # of each "submit" and "status" process
+
+
+def create_table(backend, analysis_path, num_jobs):
+    """
+    Create a job status table of a multi-ses project, as `create_job_status_csv()` does.
+    """
+    df_job = pd.DataFrame({"sub_id": ["sub-" + str(i // 2).zfill(5) for i in range(num_jobs)],
+                           "ses_id": ["ses-" + "AB"[i % 2] for i in range(num_jobs)]})
+    df_job["has_submitted"] = False
+    df_job["job_id"] = -1
+    for column in ["job_state_category", "job_state_code", "duration"]:
+        df_job[column] = np.nan
+    df_job["is_done"] = False
+    for column in ["is_failed", "log_filename", "last_line_o_file", "alert_message",
+                   "job_account"]:
+        df_job[column] = np.nan
+    get_job_status_store(backend, analysis_path).write(df_job)
+
+
+def submit_rows(job_table, list_index, get_job_id):
+    """
+    "Submit" jobs of these rows, as `babs-submit` (and resubmission in `babs-status`) do.
+    """
+    time.sleep(random.uniform(0.01, 0.05) * len(list_index))   # e.g., `qsub`
+    list_job_id = [get_job_id() for _ in list_index]
+    df = job_table.df
+    list_log_filename = ["toy_" + df.at[i, "sub_id"] + "_" + df.at[i, "ses_id"]
+                         + ".*" + str(job_id) for i, job_id in zip(list_index, list_job_id)]
+    job_table.set(list_index, "job_id", list_job_id)
+    job_table.set(list_index, "log_filename", list_log_filename)
+    job_table.set(list_index, "has_submitted", True)
+    job_table.set(list_index, "is_done", False)
+    for column in ["job_state_category", "job_state_code", "duration", "is_failed",
+                   "last_line_o_file", "alert_message", "job_account"]:
+        job_table.set(list_index, column, np.nan)
+    return list_job_id
+
+
+def commit(store, job_table, version, list_job_id_submitted, folder, name):
+    """
+    Save the changes, and record job IDs submitted, saved, and killed as duplicates.
+    """
+    list_index_changed, df_old_rows = job_table.get_changes()
+    df_updated = job_table.to_frame()
+    df_saved, _, list_index_conflict = store.commit(df_updated, list_index_changed,
+                                                    df_old_rows, version)
+    list_job_id_killed = []
+    for i_job in list_index_conflict:
+        job_id = df_updated.at[i_job, "job_id"]
+        if (job_id != df_old_rows.at[i_job, "job_id"]) and \
+                (job_id != df_saved.at[i_job, "job_id"]):
+            list_job_id_killed.append(int(job_id))
+    with open(op.join(folder, name + ".jsonl"), "a") as f:
+        f.write(json.dumps({"submitted": [int(x) for x in list_job_id_submitted],
+                            "killed": list_job_id_killed,
+                            "is_merged": df_saved is not df_updated,
+                            "num_conflicts": len(list_index_conflict)}) + "\n")
+
+
+def run_submit(backend, analysis_path, folder, i_process):
+    random.seed(i_process)
+    store = get_job_status_store(backend, analysis_path)
+    counter = [0]
+
+    def get_job_id():
+        counter[0] += 1
+        return (i_process + 1) * 1000000 + counter[0]
+
+    for _ in range(NUM_ROUNDS):
+        df_job, version = store.read_with_version()
+        job_table = JobStatusTable(df_job)
+        index_todo = df_job.index[~df_job["has_submitted"]].tolist()[:random.randint(1, 8)]
+        list_job_id = submit_rows(job_table, index_todo, get_job_id)
+        commit(store, job_table, version, list_job_id, folder, "submit_" + str(i_process))
+
+
+def run_status(backend, analysis_path, folder, i_process):
+    random.seed(100 + i_process)
+    store = get_job_status_store(backend, analysis_path)
+    counter = [0]
+
+    def get_job_id():
+        counter[0] += 1
+        return (100 + i_process) * 1000000 + counter[0]
+
+    for _ in range(NUM_ROUNDS):
+        df_job, version = store.read_with_version()
+        job_table = JobStatusTable(df_job)
+        df = job_table.df
+        index_active = df.index[df["has_submitted"] & ~df["is_done"]].tolist()
+        random.shuffle(index_active)
+        index_active = index_active[:20]
+        n = len(index_active) // 4
+        index_done = index_active[:n]
+        index_failed = index_active[n:2 * n]
+        index_running = index_active[2 * n:3 * n]
+        index_resubmit = index_active[3 * n:3 * n + 2]
+
+        job_table.set(index_done, "is_done", True)
+        job_table.set(index_done, "is_failed", False)
+        job_table.set(index_failed, "is_failed", True)
+        job_table.set(index_failed, "alert_message", "stderr file: Killed")
+        job_table.set(index_running, "job_state_category", "running")
+        job_table.set(index_running, "job_state_code", "r")
+        job_table.set(index_running, "duration", "0:0" + str(random.randint(0, 9)) + ":00")
+        time.sleep(random.uniform(0.05, 0.2))   # e.g., inspecting log files
+        list_job_id = submit_rows(job_table, index_resubmit, get_job_id)
+        commit(store, job_table, version, list_job_id, folder, "status_" + str(i_process))
+
+
+def run_reader(backend, analysis_path, folder, i_process, event_stop):
+    store = get_job_status_store(backend, analysis_path)
+    list_time = []
+    num_rows = None
+    while not event_stop.is_set():
+        time_start = time.perf_counter()
+        df_job = store.read()
+        list_time.append(time.perf_counter() - time_start)
+        if num_rows is None:
+            num_rows = df_job.shape[0]
+        assert df_job.shape[0] == num_rows, "The reader saw a partially saved table"
+        time.sleep(0.01)
+    with open(op.join(folder, "reader_" + str(i_process) + ".json"), "w") as f:
+        json.dump({"num_reads": len(list_time), "max_time": max(list_time)}, f)
+
+
+def check(backend, analysis_path, folder):
+    store = get_job_status_store(backend, analysis_path)
+    df_job = store.read()
+
+    set_submitted = set()
+    set_killed = set()
+    num_commits = 0
+    num_merged = 0
+    num_conflicts = 0
+    for fn in sorted(os.listdir(folder)):
+        if fn.endswith(".jsonl"):
+            with open(op.join(folder, fn)) as f:
+                for line in f:
+                    record = json.loads(line)
+                    set_submitted.update(record["submitted"])
+                    set_killed.update(record["killed"])
+                    num_commits += 1
+                    num_merged += record["is_merged"]
+                    num_conflicts += record["num_conflicts"]
+
+    # all job IDs ever saved in the table, from the event log:
+    set_ever_saved = set()
+    with open(store.events_path) as f:
+        for line in f:
+            event = json.loads(line)
+            if "values" in event and "job_id" in event["values"]:
+                set_ever_saved.add(event["values"]["job_id"])
+    set_ever_saved.discard(-1)
+
+    list_job_id = df_job.loc[df_job["has_submitted"], "job_id"].tolist()
+    assert len(list_job_id) == len(set(list_job_id)), "A job ID is in more than one row"
+    assert set(list_job_id) <= (set_submitted - set_killed), \
+        "A job ID in the table was not submitted, or was killed as a duplicate"
+    assert set_ever_saved == (set_submitted - set_killed), \
+        "Some submitted jobs are lost, or killed jobs were saved"
+    df_replayed = materialize_job_status(store.events_path, store.snapshot_path)
+    pd.testing.assert_frame_equal(df_job.reset_index(drop=True),
+                                  df_replayed.reset_index(drop=True), check_dtype=False)
+
+    print("commits: " + str(num_commits) + "; merged with other processes' changes: "
+          + str(num_merged) + "; rows with conflicts: " + str(num_conflicts)
+          + "; jobs submitted: " + str(len(set_submitted))
+          + "; killed as duplicates: " + str(len(set_killed))
+          + "; jobs submitted in the table: " + str(len(list_job_id)))
+    for fn in sorted(os.listdir(folder)):
+        if fn.startswith("reader_"):
+            with open(op.join(folder, fn)) as f:
+                record = json.load(f)
+            print(fn[:-len(".json")] + ": " + str(record["num_reads"]) + " reads; longest: "
+                  + "{:.3f}".format(record["max_time"]) + " sec")
+
+
+if __name__ == "__main__":
+    backend = sys.argv[1] if len(sys.argv) > 1 else "csv"
+    num_jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with tempfile.TemporaryDirectory() as folder:
+        analysis_path = op.join(folder, "analysis")
+        os.makedirs(op.join(analysis_path, "code"))
+        records_path = op.join(folder, "records")
+        os.makedirs(records_path)
+        create_table(backend, analysis_path, num_jobs)
+
+        event_stop = multiprocessing.Event()
+        list_readers = [multiprocessing.Process(
+            target=run_reader, args=(backend, analysis_path, records_path, i, event_stop))
+            for i in range(NUM_READER)]
+        list_writers = [multiprocessing.Process(
+            target=run_submit, args=(backend, analysis_path, records_path, i))
+            for i in range(NUM_SUBMIT)]
+        list_writers += [multiprocessing.Process(
+            target=run_status, args=(backend, analysis_path, records_path, i))
+            for i in range(NUM_STATUS)]
+
+        time_start = time.perf_counter()
+        for p in list_readers + list_writers:
+            p.start()
+        for p in list_writers:
+            p.join()
+        event_stop.set()
+        for p in list_readers:
+            p.join()
+        assert all(p.exitcode == 0 for p in list_readers + list_writers), \
+            "Some processes failed"
+
+        print(backend + ", " + str(num_jobs) + " jobs; "
+              + str(NUM_SUBMIT) + " submit, " + str(NUM_STATUS) + " status and "
+              + str(NUM_READER) + " reader processes: "
+              + "{:.1f}".format(time.perf_counter() - time_start) + " sec")
+        check(backend, analysis_path, records_path)
+        print("OK")